@@ -11,6 +11,7 @@ from PySide6.QtCore import Signal, Slot
 
 from COTdataclasses import GPSDatum, KeyFrame, SessionData
 from tools.handler import GPSDataHandler, SessionHandler, KeyFrameHandler
+from tools.profiling import section
 
 class AbstractBaseWidget(ABC):
     """ abstract base class for every widget that is utilized """
@@ -21,10 +22,14 @@ class AbstractBaseWidget(ABC):
         self._gpsdata_handler = gpsdata_handler
         self._keyframe_handler = keyframe_handler
 
-        self._gpsdata_handler.gpsdatum_requested.connect(
+        # connections to signals of the handlers, removed by release
+        self._connections = []
+        self._connect(
+            self._gpsdata_handler.gpsdatum_requested,
             self._react_to_gpsdatum_change
         )
-        self._keyframe_handler.keyframe_requested.connect(
+        self._connect(
+            self._keyframe_handler.keyframe_requested,
             self._react_to_keyframe_change
         )
 
@@ -41,6 +46,19 @@ class AbstractBaseWidget(ABC):
         """ wrapper for widgets close method """
         return self._widget.close()
 
+    def release(self):
+        """ closes the window and disconnects it from the handlers, e.g. before it is created again for new data """
+        self.close()
+        for signal, slot in self._connections:
+            signal.disconnect(slot)
+        self._connections = []
+        self._widget.deleteLater()
+
+    def _connect(self, signal: Signal, slot):
+        """ connects slot to a signal of a handler, the connection is removed by release """
+        signal.connect(slot)
+        self._connections.append((signal, slot))
+
     @abstractmethod
     def _setup_ui(self):
         """ _func for ui setup  """
@@ -68,11 +86,13 @@ class AbstractBaseWidget(ABC):
 
     @Slot(GPSDatum)
     def _react_to_gpsdatum_change(self, gpsdatum: GPSDatum):
-        keyframe = self._keyframe_handler.from_gpsdatum(gpsdatum)
-        if keyframe is not None:
-            self.react_to_keyframe_change(keyframe)
-        else:
-            self.react_to_gpsdatum_change(gpsdatum)
+        # time spent per widget for every requested gps datum
+        with section(f"gpsdatum_requested:{type(self).__name__}"):
+            keyframe = self._keyframe_handler.from_gpsdatum(gpsdatum)
+            if keyframe is not None:
+                self.react_to_keyframe_change(keyframe)
+            else:
+                self.react_to_gpsdatum_change(gpsdatum)
     
     @abstractmethod
     def react_to_gpsdatum_change(self, gpsdatum: GPSDatum):
@@ -18,14 +18,16 @@ class SessionData:
     image_width: int
     image_height: int
     creation_date: datetime = datetime.now()
+    # frames per second of the video, 0 if unknown
+    video_fps: float = 0
 
 @dataclass
 class GPSDatum:
     """ data container containing data as to the header of the given csv files """
     # actual time of recording
     timeid: time
-    # time in seconds from start
-    timestamp: int
+    # time in seconds from start, with the hundredths of the time id
+    timestamp: float
     # coordinates as decimal degrees
     latitude: float
     longitude: float
@@ -41,6 +43,7 @@ class GPSDatum:
     def __eq__(self, other):
         if not isinstance(other, GPSDatum):
             return NotImplemented
+        # timestamps of a track are unique, repeated fixes are dropped while parsing
         return self.timestamp == other.timestamp
 
 @dataclass
@@ -0,0 +1,165 @@
+""" headless batch processing of keyframes, calibrates cameras without the Qt GUI
+
+Reads gps data, extracts the frames of all keyframes from the video and determines their camera
+parameters in a worker pool. Results are written in the same format as the data views save button.
+
+The keyframe file is a csv with the header
+    timestamp,ax,ay,bx,by,cx,cy,dx,dy
+where timestamp is in seconds from the start of the gps data and a to d are the four image points.
+Keyframe images are extracted to a directory next to the output. With --birdseye the video after
+every keyframe is rectified onto the ground plane with its calibration and written there as well.
+Frames are read from the fastest frame source for the access, e.g. a store of extracted frames
+written by tools.framesource.
+
+Example, run from the train directory:
+    python batch.py --video spring.mp4 --gps ../data/gps_spring.csv --keyframes spring_points.csv \\
+        --output spring_keyframes.csv --frames spring_frames
+"""
+
+import os
+import csv
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from COTdataclasses import GPSDatum, KeyFrame, ImagePointContainer
+from tools.handler import GPSDataHandler, write_keyframes_csv
+from tools.cache import GPSDataCache
+from tools.math import determine_camera_parameters, frame_number_at
+from tools.birdseye import BirdsEyeView, rectify_segment
+from tools.framesource import FrameSource, available_frame_sources, select_frame_source
+
+
+# frame sources opened per worker process, keyed by path
+_frame_sources = {}
+
+
+def _frame_source(video_path: str, step: int = None, frame_numbers=None) -> FrameSource:
+    """ fastest frame source of the video for reading frame_numbers step apart, see tools.framesource """
+    if video_path not in _frame_sources:
+        _frame_sources[video_path] = available_frame_sources(video_path)
+    sources = _frame_sources[video_path]
+    return select_frame_source(sources, step, frame_numbers) or sources[0]
+
+
+def read_keyframe_file(path: str) -> list:
+    """ reads keyframe file, returns a list of (timestamp, ImagePointContainer) """
+    keyframes = []
+    with open(path, "r", encoding="ascii", newline="") as file:
+        for row in csv.DictReader(file):
+            try:
+                image_points = ImagePointContainer(
+                    *[[int(row[f"{point}x"]), int(row[f"{point}y"])] for point in "abcd"]
+                )
+                keyframes.append((float(row["timestamp"]), image_points))
+            except (KeyError, ValueError) as exception:
+                print(f"{exception}: Keyframe {row} could not be converted.")
+    return keyframes
+
+
+def write_birdseye_segment(frame_source: FrameSource, keyframe: KeyFrame, first_frame: int,
+                           seconds: float, path: str) -> None:
+    """ writes the bird's-eye view of seconds of video from first_frame, calibrated by keyframe """
+    width, height = frame_source.native_resolution
+    fps = frame_source.fps
+    view = BirdsEyeView.from_keyframe(keyframe, width, height)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, view.output_size)
+    for _, rectified in rectify_segment(frame_source, view, first_frame, first_frame + int(seconds * fps)):
+        writer.write(rectified)
+    writer.release()
+
+
+def process_keyframe(video_path: str, gpsdatum: GPSDatum, image_points: ImagePointContainer,
+                     track_gauge: int, frames_dir: str, birdseye_seconds: float = 0) -> KeyFrame:
+    """ extracts the frame of a keyframe and determines its camera parameters, runs in a worker process """
+    # same frame the video player shows for this gps datum
+    fps = _frame_source(video_path).fps
+    frame_number = frame_number_at(fps, gpsdatum.timestamp)
+    frame = _frame_source(video_path, None, frame_number).read(frame_number)
+    ret = frame is not None
+    if ret:
+        cv2.imwrite(os.path.join(frames_dir, f"{gpsdatum.timestamp}_{frame_number}.png"), frame)
+    else:
+        print(f"Frame {frame_number} of {video_path} could not be read.")
+
+    keyframe = KeyFrame(gpsdatum, None, image_points, None, None)
+    keyframe.intrinsics, keyframe.extrinsics = determine_camera_parameters(keyframe, track_gauge)
+
+    if ret and birdseye_seconds > 0:
+        try:
+            segment = range(frame_number, frame_number + int(birdseye_seconds * fps))
+            write_birdseye_segment(
+                _frame_source(video_path, 1, segment), keyframe, frame_number, birdseye_seconds,
+                os.path.join(frames_dir, f"{gpsdatum.timestamp}_{frame_number}_birdseye.avi")
+            )
+        except ValueError as exception:
+            print(f"{exception} No bird's-eye view of keyframe at {gpsdatum.timestamp}s is written.")
+    return keyframe
+
+
+def run(video_path: str, gps_path: str, keyframe_path: str, output_path: str,
+        frames_dir: str = None, track_gauge: int = 1435, workers: int = None, use_cache: bool = True,
+        birdseye_seconds: float = 0) -> list:
+    """ processes all keyframes of one recording, returns the calibrated keyframes """
+    gpsdata_handler = GPSDataHandler(GPSDataCache() if use_cache else None)
+    gpsdata_handler.read_csv_data(gps_path)
+
+    if frames_dir is None:
+        frames_dir = os.path.splitext(output_path)[0] + "_frames"
+    os.makedirs(frames_dir, exist_ok=True)
+
+    jobs = [
+        (gpsdata_handler.closest_datum_by_timestamp(timestamp), image_points)
+        for timestamp, image_points in read_keyframe_file(keyframe_path)
+    ]
+
+    keyframes = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                process_keyframe, video_path, gpsdatum, image_points, track_gauge, frames_dir, birdseye_seconds
+            )
+            for gpsdatum, image_points in jobs
+        ]
+        for future, (gpsdatum, _) in zip(futures, jobs):
+            try:
+                keyframes.append(future.result())
+            except (ValueError, ZeroDivisionError) as exception:
+                # degenerate image points
+                print(f"{exception}: Keyframe at {gpsdatum.timestamp}s could not be calibrated.")
+
+    write_keyframes_csv(output_path, keyframes)
+    return keyframes
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True, help="video file")
+    parser.add_argument("--gps", required=True, help="gps csv file")
+    parser.add_argument("--keyframes", required=True, help="csv with timestamps and image points")
+    parser.add_argument("--output", required=True, help="csv the calibrated keyframes are written to")
+    parser.add_argument(
+        "--frames", default=None, help="directory keyframe images are extracted to, defaults to <output>_frames"
+    )
+    parser.add_argument("--gauge", type=int, default=1435, help="track gauge in mm")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the gps file")
+    parser.add_argument(
+        "--birdseye", type=float, default=0, metavar="SECONDS",
+        help="write the bird's-eye view of this many seconds of video after every keyframe"
+    )
+    args = parser.parse_args(argv)
+
+    keyframes = run(
+        args.video, args.gps, args.keyframes, args.output,
+        args.frames, args.gauge, args.workers, not args.no_cache, args.birdseye
+    )
+    print(f"{len(keyframes)} keyframes written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
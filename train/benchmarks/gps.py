@@ -0,0 +1,179 @@
+""" Benchmarks of gps ingestion, gradient, lookup and calibration hot paths
+
+Runs on the bundled data/gps_*.csv files and on synthetic tracks, that are created by
+interpolating data/gps_spring.csv to 1x, 10x and 100x the number of samples. All bundled
+tracks are also loaded together and aligned by distance, see MultiTrackHandler.
+
+Run from the train directory:
+    python -m benchmarks.gps [--scales 1 10 100] [--repeat 3] [--output results.json] [--compare old.json]
+"""
+
+import os
+import glob
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+from COTdataclasses import KeyFrame, ImagePointContainer
+from tools.handler import GPSDataHandler, KeyFrameHandler, MultiTrackHandler, tid_to_seconds, seconds_to_tid
+from tools.derived import DERIVED_COLUMNS
+from tools.math import determine_camera_parameters, distance_between_geo_coordinates
+from benchmarks import harness
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+
+# image points as clicked in a frame of the spring recording
+IMAGE_POINTS = [[905, 940], [904, 1046], [1198, 1044], [1146, 939]]
+
+
+def write_synthetic_track(source_path: str, scale: int, path: str) -> None:
+    """ writes a track with scale times the samples of the source by linear interpolation between rows
+
+    Interpolated samples get hundredths of seconds in their time id, so scale must be at most 100.
+    """
+    gpsdata = GPSDataHandler()
+    gpsdata.read_csv_data(source_path)
+    columns = gpsdata.to_columns()
+
+    rows = np.arange(len(gpsdata) * scale) / scale
+    source_rows = np.arange(len(gpsdata))
+    base_rows = rows.astype(np.int64)
+
+    # values in the integer units of the csv format
+    table = np.column_stack([
+        seconds_to_tid(np.interp(rows, source_rows, tid_to_seconds(columns["tid"]))),
+        np.round(np.interp(rows, source_rows, columns["latitude"]) * 10**5),
+        np.round(np.interp(rows, source_rows, columns["longitude"]) * 10**5),
+        np.round(np.interp(rows, source_rows, columns["speed"]) * 10**2),
+        columns["course"][base_rows],
+        np.round(np.interp(rows, source_rows, columns["altitude"]) * 10**2)
+    ]).astype(np.int64)
+
+    np.savetxt(path, table, fmt="%d", delimiter=",", header="tid,lat,lon,speed,course,alt", comments="")
+
+
+def benchmark_track(name: str, path: str, repeat: int, rng: random.Random) -> dict:
+    """ benchmarks all per-track functions on the track at path """
+    results = {}
+
+    results[f"read_csv_data[{name}]"] = harness.measure(
+        lambda: GPSDataHandler().read_csv_data(path), repeat=repeat, number=1
+    )
+
+    gpsdata = GPSDataHandler()
+    gpsdata.read_csv_data(path)
+
+    results[f"add_gradient[{name}]"] = harness.measure(gpsdata.add_gradient, repeat=repeat, number=1)
+
+    # all derived columns computed from scratch, as after a change of every gps column
+    def derived_columns():
+        gpsdata._touch(*GPSDataHandler.column_names)
+        for derived_name in DERIVED_COLUMNS:
+            gpsdata.derived(derived_name)
+
+    results[f"derived_columns[{name}]"] = harness.measure(derived_columns, repeat=repeat, number=1)
+
+    last_timestamp = gpsdata[-1].timestamp
+    results[f"closest_datum_by_timestamp[{name}]"] = harness.measure(
+        lambda: gpsdata.closest_datum_by_timestamp(rng.uniform(0, last_timestamp)), repeat=repeat
+    )
+
+    # random samples of the track displaced by up to about 200 m
+    columns = gpsdata.columns
+
+    def index_by_coordinate():
+        row = rng.randrange(len(gpsdata))
+        gpsdata.index_by_coordinate(
+            columns["latitude"][row] + rng.uniform(-0.002, 0.002),
+            columns["longitude"][row] + rng.uniform(-0.004, 0.004)
+        )
+
+    results[f"index_by_coordinate[{name}]"] = harness.measure(
+        index_by_coordinate, repeat=repeat, setup=lambda: gpsdata.spatial_index
+    )
+
+    # 20 keyframes spread over the track, queried with random gps data
+    keyframe_handler = KeyFrameHandler()
+    for index in range(0, len(gpsdata), max(len(gpsdata) // 20, 1)):
+        keyframe_handler.add_keyframe(KeyFrame(gpsdata[index], None, None, None, None))
+    results[f"KeyFrameHandler.from_gpsdatum[{name}]"] = harness.measure(
+        lambda: keyframe_handler.from_gpsdatum(gpsdata[rng.randrange(len(gpsdata))]), repeat=repeat
+    )
+
+    return results
+
+
+def benchmark_track_independent(repeat: int) -> dict:
+    """ benchmarks functions whose cost does not depend on a track """
+    keyframe = KeyFrame(None, None, ImagePointContainer(*IMAGE_POINTS), None, None)
+
+    return {
+        "determine_camera_parameters": harness.measure(
+            lambda: determine_camera_parameters(keyframe, 1435), repeat=repeat
+        ),
+        "distance_between_geo_coordinates": harness.measure(
+            lambda: distance_between_geo_coordinates(63.43686, 10.40079, 63.43703, 10.40428), repeat=repeat
+        )
+    }
+
+
+def benchmark_seasons(paths: list, repeat: int, rng: random.Random) -> dict:
+    """ benchmarks loading and aligning the bundled tracks and lookups by distance in all of them """
+    file_paths = {os.path.splitext(os.path.basename(path))[0]: path for path in paths}
+    results = {}
+
+    results["MultiTrackHandler.load"] = harness.measure(
+        lambda: MultiTrackHandler().load(file_paths), repeat=repeat, number=1
+    )
+
+    tracks = MultiTrackHandler()
+    tracks.load(file_paths)
+    last_distance = tracks.distances[tracks.reference][-1]
+    results["MultiTrackHandler.rows_at_distance"] = harness.measure(
+        lambda: tracks.rows_at_distance(rng.uniform(0, last_distance)), repeat=repeat
+    )
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="*", default=[1, 10, 100], help="sizes of synthetic tracks")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random lookups")
+    parser.add_argument("--output", default=None, help="json file, defaults to benchmark_results/gps_<revision>.json")
+    parser.add_argument("--compare", default=None, help="json file of an earlier run")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = benchmark_track_independent(args.repeat)
+
+    paths = sorted(glob.glob(os.path.join(DATA_DIRECTORY, "gps_*.csv")))
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        print(f"benchmarking {name}")
+        results.update(benchmark_track(name, path, args.repeat, rng))
+
+    print("benchmarking all tracks aligned by distance")
+    results.update(benchmark_seasons(paths, args.repeat, rng))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scales:
+            name = f"synthetic_x{scale}"
+            path = os.path.join(directory, f"{name}.csv")
+            print(f"benchmarking {name}")
+            write_synthetic_track(os.path.join(DATA_DIRECTORY, "gps_spring.csv"), scale, path)
+            results.update(benchmark_track(name, path, args.repeat, rng))
+
+    harness.print_table(results)
+    path = harness.record("gps", results, args.output, scales=args.scales, repeat=args.repeat, seed=args.seed)
+    print(f"results written to {path}")
+
+    if args.compare is not None:
+        harness.compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+""" Shared helpers of all benchmarks: timing, statistics and json records
+
+Records contain the git revision, so results of different commits can be compared with
+    python -m benchmarks.<suite> --compare benchmark_results/<suite>_<revision>.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from datetime import datetime
+from statistics import mean, median
+
+# default directory for records, relative to the working directory
+RESULTS_DIRECTORY = "benchmark_results"
+
+
+def git_revision() -> str:
+    """ short hash of the checked out commit, 'unknown' outside of a git repository """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(values: list, fraction: float) -> float:
+    """ percentile with linear interpolation, fraction between 0 and 1 """
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(samples: list) -> dict:
+    """ statistics of samples in seconds """
+    return {
+        "min": min(samples),
+        "median": median(samples),
+        "mean": mean(samples),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99),
+        "max": max(samples),
+        "samples": len(samples)
+    }
+
+
+def measure(function, repeat: int = 5, number: int = None, setup=None) -> dict:
+    """ times function and returns statistics of the time per call in seconds
+
+    function is called number times per sample, if number is None it is chosen so that a sample
+    takes at least 0.2 seconds. setup is called before every sample and not timed.
+    """
+    if number is None:
+        number = 1
+        while True:
+            if setup is not None:
+                setup()
+            t_start = time.perf_counter()
+            for _ in range(number):
+                function()
+            if time.perf_counter() - t_start >= 0.2:
+                break
+            number *= 10
+
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t_start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - t_start) / number)
+
+    statistics = summarize(samples)
+    statistics["number"] = number
+    return statistics
+
+
+def measure_each(function, count: int) -> dict:
+    """ times count single calls of function, for latency distributions of calls that differ """
+    samples = []
+    for _ in range(count):
+        t_start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - t_start)
+    return summarize(samples)
+
+
+def record(suite: str, results: dict, path: str = None, **parameters) -> str:
+    """ writes results with metadata to json and returns the path """
+    revision = git_revision()
+    if path is None:
+        path = os.path.join(RESULTS_DIRECTORY, f"{suite}_{revision}.json")
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "w", encoding="ascii") as file:
+        json.dump({
+            "suite": suite,
+            "revision": revision,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "parameters": parameters,
+            "results": results
+        }, file, indent=4)
+    return path
+
+
+def print_table(results: dict, key: str = "median") -> None:
+    """ prints min, chosen statistic, p95 and p99 of all results in milliseconds """
+    print(f"{'benchmark':<50}{'min [ms]':>12}{key + ' [ms]':>14}{'p95 [ms]':>12}{'p99 [ms]':>12}")
+    for name, statistics in results.items():
+        print(
+            f"{name:<50}{statistics['min'] * 1000:>12.4f}{statistics[key] * 1000:>14.4f}"
+            f"{statistics['p95'] * 1000:>12.4f}{statistics['p99'] * 1000:>12.4f}"
+        )
+
+
+def compare(baseline_path: str, results: dict, key: str = "median", threshold: float = 1.1) -> list:
+    """ prints the ratio of results to a recorded baseline, returns names of regressions beyond threshold """
+    with open(baseline_path, "r", encoding="ascii") as file:
+        baseline = json.load(file)
+
+    print(f"\ncompared to {baseline['revision']} ({baseline['date']})")
+    print(f"{'benchmark':<50}{'ratio':>10}")
+
+    regressions = []
+    for name, statistics in results.items():
+        if name not in baseline["results"]:
+            continue
+        ratio = statistics[key] / baseline["results"][name][key]
+        marker = ""
+        if ratio > threshold:
+            marker = "  slower"
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            marker = "  faster"
+        print(f"{name:<50}{ratio:>10.3f}{marker}")
+    return regressions
@@ -0,0 +1,120 @@
+""" Time-to-first-window benchmark of the main application
+
+Starts the application in fresh interpreters and measures the time until the main window
+is shown. Optionally imports a session and measures the time until the video player is shown.
+
+Run from the train directory:
+    python -m benchmarks.startup [--runs 10] [--gps ../data/gps_spring.csv --video video.mp4] [--compare old.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks import harness
+
+# executed in a fresh interpreter, prints timings as json
+_STARTUP_SCRIPT = """
+import sys, time, json
+t_start = time.perf_counter()
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QTimer
+
+app = QApplication(sys.argv)
+t_app = time.perf_counter()
+
+import main
+t_import = time.perf_counter()
+
+window = main.MainWindow()
+window.show()
+t_shown = time.perf_counter()
+
+timings = {}
+
+def first_window_drawn():
+    timings["first_window"] = time.perf_counter() - t_start
+    gps_path, video_path = sys.argv[1:3]
+    if not gps_path:
+        app.quit()
+        return
+    t_import_clicked = time.perf_counter()
+    window._filepicker.gps_data_path = gps_path
+    window._filepicker.video_path = video_path
+    window._filepicker.import_button_clicked()
+
+    def wait_for_videoplayer():
+        if "videoplayer" in window.active_windows:
+            timings["import_to_videoplayer"] = time.perf_counter() - t_import_clicked
+            app.quit()
+        else:
+            QTimer.singleShot(1, wait_for_videoplayer)
+    wait_for_videoplayer()
+
+QTimer.singleShot(0, first_window_drawn)
+app.exec()
+
+timings.update({
+    "qapplication": t_app - t_start,
+    "import_main": t_import - t_app,
+    "construct_main_window": t_shown - t_import,
+})
+print(json.dumps(timings))
+"""
+
+
+def run_once(gps_path: str = "", video_path: str = "") -> dict:
+    """ starts the application once and returns its timings in seconds """
+    environment = dict(os.environ)
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+    # application modules are imported from the train directory
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__))), environment.get("PYTHONPATH", "")]
+    )
+
+    # run in a temporary directory, so the session file of the application is not overwritten
+    with tempfile.TemporaryDirectory() as working_directory:
+        t_start = time.perf_counter()
+        result = subprocess.run(
+            [
+                sys.executable, "-c", _STARTUP_SCRIPT,
+                os.path.abspath(gps_path) if gps_path else "",
+                os.path.abspath(video_path) if video_path else ""
+            ],
+            capture_output=True, text=True, env=environment, cwd=working_directory, check=True
+        )
+        process_time = time.perf_counter() - t_start
+
+    # the last line contains the timings, everything before is output of the application
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process"] = process_time
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--gps", default="", help="gps csv to import after startup")
+    parser.add_argument("--video", default="", help="video to import after startup")
+    parser.add_argument("--output", default=None, help="json file, defaults to benchmark_results/startup_<revision>.json")
+    parser.add_argument("--compare", default=None, help="json file of an earlier run")
+    args = parser.parse_args()
+
+    runs = [run_once(args.gps, args.video) for _ in range(args.runs)]
+    results = {name: harness.summarize([run[name] for run in runs]) for name in runs[0]}
+
+    harness.print_table(results)
+    path = harness.record("startup", results, args.output, runs=args.runs, gps=args.gps, video=args.video)
+    print(f"results written to {path}")
+
+    if args.compare is not None:
+        harness.compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
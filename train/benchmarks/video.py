@@ -0,0 +1,235 @@
+""" Headless benchmark of video decoding, seeking and frame conversion of COTVideoPlayer
+
+Synthetic test videos are written with OpenCVs VideoWriter for every combination of codec,
+resolution and GOP size. For every video the latency of the following access patterns is measured:
+
+    random_seek     read a random frame
+    sequential      read the next frame
+    gps_step        read the frame one second ahead, like playback of the video player
+    convert         COTVideoPlayer.convert_cv_img_to_q_pixmap of a decoded frame
+    birdseye        BirdsEyeView.rectify of a decoded frame, with cached remap tables
+
+Frames are read through every frame source of tools.framesource selected with --sources into a
+preallocated buffer, like the frame pool of the player. The read patterns are measured for the
+OpenCV source under their name and for the other sources as pattern[source:video], their
+medians are what the read_cost estimates of the sources are taken from. The FFmpeg pipe is
+measured if ffmpeg is available, stores of extracted frames hold one frame per second.
+
+H.264 is not available in every OpenCV build, MPEG-4 is used instead and reported as codec then.
+
+Run from the train directory:
+    python -m benchmarks.video [--resolutions 640x360 1920x1080] [--gops 12 250] [--sources opencv memmap]
+        [--compare old.json]
+"""
+
+import os
+import random
+import argparse
+import tempfile
+
+import cv2
+import numpy as np
+
+from benchmarks import harness
+from COTdataclasses import IntrinsicCameraParameters, ExtrinsicCameraParameters
+from tools.birdseye import BirdsEyeView, ground_to_image_homography
+from tools.framesource import FrameSource, OpenCVFrameSource, available_frame_sources, frame_store_directory, write_frame_store
+
+# frame sources that can be measured, jpg is the store of images
+SOURCES = ["opencv", "ffmpeg", "memmap", "jpg"]
+
+# codec name, fourccs in order of preference and file extension
+CODECS = {
+    "h264": (["avc1", "H264", "mp4v"], "mp4"),
+    "mjpeg": (["MJPG"], "avi")
+}
+
+
+def write_synthetic_video(path: str, codec: str, width: int, height: int, gop: int,
+                          frame_count: int, fps: float = 25) -> str:
+    """ writes a video with moving content and returns the fourcc that was used, None if no fourcc worked """
+    fourccs, _ = CODECS[codec]
+
+    # the key frame interval can only be set in newer OpenCV versions
+    parameters = []
+    if hasattr(cv2, "VIDEOWRITER_PROP_KEY_INTERVAL"):
+        parameters = [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, gop]
+
+    for fourcc in fourccs:
+        writer = cv2.VideoWriter(path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height), parameters)
+        if writer.isOpened():
+            break
+    else:
+        return None
+
+    # horizontal gradient that moves every frame with some noise, so frames differ like in a real video
+    rng = np.random.default_rng(0)
+    gradient = np.tile(np.linspace(0, 255, width, dtype=np.float32), (height, 1))
+    for i in range(frame_count):
+        frame = np.roll(gradient, 4 * i, axis=1)
+        frame = np.clip(frame + rng.normal(0, 8, frame.shape), 0, 255).astype(np.uint8)
+        frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        cv2.putText(frame, str(i), (20, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 255), 3)
+        writer.write(frame)
+
+    writer.release()
+    return fourcc
+
+
+def synthetic_birdseye(width: int, height: int) -> BirdsEyeView:
+    """ view of 8 m by 35 m of ground ahead of a camera looking 12 degrees down from 4 m height """
+    homography = ground_to_image_homography(
+        IntrinsicCameraParameters(width, 4000 / np.sin(np.radians(12))),
+        ExtrinsicCameraParameters(0, 12, 0, 0, 0, 0),
+        (width / 2, height / 2)
+    )
+    scale = 35000 / 960
+    return BirdsEyeView(homography, (width, height), (40000, 4000), (0, -scale), (-scale, 0), (int(8000 / scale), 960))
+
+
+def benchmark_frame_source(name: str, frame_source: FrameSource, count: int, rng: random.Random) -> dict:
+    """ latencies of the read access patterns of one frame source, reading into one buffer like the player
+
+    Stores only hold some frames, their patterns read the stored frames and sequential is left out.
+    """
+    frame_numbers = getattr(frame_source, "frame_numbers", None)
+    if frame_numbers is None:
+        frame_numbers = np.arange(frame_source.frame_count)
+    frame_numbers = frame_numbers.tolist()
+    width, height = frame_source.native_resolution
+    buffer = np.empty((height, width, 3), dtype=np.uint8)
+    results = {}
+
+    results[f"random_seek[{name}]"] = harness.measure_each(
+        lambda: frame_source.read(rng.choice(frame_numbers), buffer), count
+    )
+
+    if frame_source.contains(range(frame_source.frame_count)):
+        position = [0]
+
+        def sequential():
+            position[0] = (position[0] + 1) % frame_source.frame_count
+            frame_source.read(position[0], buffer)
+
+        results[f"sequential[{name}]"] = harness.measure_each(sequential, count)
+
+    position = [0]
+    step = round(frame_source.fps)
+
+    def gps_step():
+        position[0] = (position[0] + step) % (frame_numbers[-1] + 1)
+        if not frame_source.contains(position[0]):
+            position[0] = frame_numbers[0]
+        frame_source.read(position[0], buffer)
+
+    results[f"gps_step[{name}]"] = harness.measure_each(gps_step, count)
+    return results
+
+
+def benchmark_video(name: str, path: str, count: int, rng: random.Random, video_player, sources: list) -> dict:
+    """ latencies of all access patterns of one video with every available frame source in sources
+
+    The OpenCV source keeps the names of the patterns, other sources are reported as pattern[source:video].
+    Stores are written with one frame per second, the frames of gps rows.
+    """
+    video_source = OpenCVFrameSource(path)
+    if any(source in sources for source in ("memmap", "jpg")):
+        stored = np.arange(0, video_source.frame_count, round(video_source.fps))
+        for store_format in ("memmap", "jpg"):
+            if store_format in sources:
+                write_frame_store(video_source, frame_store_directory(path), stored, store_format)
+
+    results = {}
+    for frame_source in available_frame_sources(path, video_source):
+        if frame_source.name not in sources and not (frame_source.name == "images" and "jpg" in sources):
+            frame_source.close()
+            continue
+        label = name if frame_source is video_source else f"{frame_source.name}:{name}"
+        with frame_source:
+            results.update(benchmark_frame_source(label, frame_source, count, rng))
+            if frame_source is video_source:
+                frame = video_source.read(0)
+                results[f"convert[{name}]"] = harness.measure_each(
+                    lambda: video_player.convert_cv_img_to_q_pixmap(frame), count
+                )
+
+                birdseye = synthetic_birdseye(frame.shape[1], frame.shape[0])
+                birdseye.maps()
+                rectified = birdseye.rectify(frame)
+                results[f"birdseye[{name}]"] = harness.measure_each(lambda: birdseye.rectify(frame, rectified), count)
+    return results
+
+
+def create_video_player():
+    """ COTVideoPlayer on an offscreen QApplication with a single gps datum for its overlay """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    from imgwidgets.videoplayer import COTVideoPlayer
+    from tools.handler import GPSDataHandler
+
+    application = QApplication.instance() or QApplication([])
+
+    gpsdata = GPSDataHandler()
+    gpsdata.from_columns({
+        "tid": np.array([5380000]), "timestamp": np.array([0]), "latitude": np.array([63.43686]),
+        "longitude": np.array([10.40079]), "speed": np.array([0.0]), "course": np.array([0]),
+        "altitude": np.array([9.6]), "gradient": np.array([0.0])
+    }, "")
+
+    video_player = COTVideoPlayer()
+    video_player.gpsdata = gpsdata
+    return application, video_player
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--codecs", nargs="*", default=list(CODECS), choices=list(CODECS))
+    parser.add_argument("--resolutions", nargs="*", default=["640x360", "1280x720", "1920x1080"])
+    parser.add_argument("--gops", type=int, nargs="*", default=[12, 50, 250], help="key frame intervals")
+    parser.add_argument("--frames", type=int, default=500, help="frames per synthetic video")
+    parser.add_argument("--count", type=int, default=200, help="measured calls per access pattern")
+    parser.add_argument("--sources", nargs="*", default=SOURCES, choices=SOURCES, help="frame sources to read with")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="json file, defaults to benchmark_results/video_<revision>.json")
+    parser.add_argument("--compare", default=None, help="json file of an earlier run")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # the application has to live as long as the video player
+    _application, video_player = create_video_player()
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for codec in args.codecs:
+            _, extension = CODECS[codec]
+            # every frame of mjpeg is a key frame, the interval does not matter
+            gops = args.gops if codec != "mjpeg" else [1]
+
+            for resolution in args.resolutions:
+                width, height = [int(value) for value in resolution.split("x")]
+                for gop in gops:
+                    path = os.path.join(directory, f"{codec}_{resolution}_{gop}.{extension}")
+                    fourcc = write_synthetic_video(path, codec, width, height, gop, args.frames)
+                    if fourcc is None:
+                        print(f"{codec} can not be written with this OpenCV build, skipped")
+                        break
+
+                    name = f"{fourcc.strip()}_{resolution}_gop{gop}"
+                    print(f"benchmarking {name}")
+                    results.update(benchmark_video(name, path, args.count, rng, video_player, args.sources))
+
+    harness.print_table(results)
+    path = harness.record(
+        "video", results, args.output,
+        codecs=args.codecs, resolutions=args.resolutions, gops=args.gops,
+        frames=args.frames, count=args.count, seed=args.seed, sources=args.sources,
+        key_interval_supported=hasattr(cv2, "VIDEOWRITER_PROP_KEY_INTERVAL")
+    )
+    print(f"results written to {path}")
+
+    if args.compare is not None:
+        harness.compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
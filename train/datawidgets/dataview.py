@@ -56,6 +56,9 @@ class DataViewWidget(AbstractBaseWidget):
 
         self.table.setSizeAdjustPolicy(QAbstractScrollArea.AdjustToContents)
 
+        # camera parameters of the current frame, interpolated between the calibrated keyframes
+        self.calibration_label = QLabel("No calibrated keyframe yet")
+
         # create save button and connect it to session handlers save function
         save_button = QPushButton("Save")
         save_button.clicked.connect(
@@ -66,19 +69,36 @@ class DataViewWidget(AbstractBaseWidget):
         layout = QVBoxLayout()
         layout.addLayout(self.general_data_layout)
         layout.addWidget(self.table)
+        layout.addWidget(self.calibration_label)
         layout.addWidget(save_button)
 
         self._widget.setLayout(layout)
     
     def react_to_keyframe_change(self, keyframe: KeyFrame):
         self.update_table(keyframe)
+        self.update_calibration_label(keyframe.gps)
 
     def react_to_gpsdatum_change(self, gpsdatum: GPSDatum):
-        """ do nothing """
+        self.update_calibration_label(gpsdatum)
 
 
     ################################## Implementation of class methods ###########################################
 
+    def update_calibration_label(self, gpsdatum: GPSDatum) -> None:
+        """ shows the camera parameters interpolated at a gps datum """
+        calibration = self._keyframe_handler.calibration
+        if calibration is None or calibration.keyframe_count() == 0:
+            return
+
+        intrinsics, extrinsics = calibration.parameters_at(
+            self._gpsdata_handler.index_by_timestamp(gpsdatum.timestamp)
+        )
+        self.calibration_label.setText(
+            f"Interpolated at {gpsdatum.timestamp:.2f}s: "
+            f"Swing {extrinsics.swing:.4f}, Tilt {extrinsics.tilt:.4f}, Pan {extrinsics.pan:.4f}, "
+            f"Height {extrinsics.z_offset:.4f}, Focal Length {intrinsics.focal_length:.4f}"
+        )
+
     def update_table(self, keyframe: KeyFrame) -> None:
         """ updates the data table """
         col = 0
@@ -93,7 +113,7 @@ class DataViewWidget(AbstractBaseWidget):
                 # get the timestamp
                 item: QTableWidgetItem = self.table.item(0, col)
                 # if timestamp is already in the table, update the row
-                if keyframe.gps.timestamp == int(item.text()):
+                if keyframe.gps.timestamp == float(item.text()):
                     break
             else:
                 # happens anyway, but for clarification
@@ -4,7 +4,7 @@ import os
 
 from PySide6.QtCore import Signal, Slot
 from PySide6.QtWidgets import QVBoxLayout, QWidget, QFileDialog,\
-                              QLabel, QPushButton, QMenuBar
+                              QLabel, QPushButton, QMenuBar, QProgressBar, QCheckBox
 from PySide6.QtGui import QAction
 
 from tools.handler import SessionHandler
@@ -14,7 +14,10 @@ class FilePickerWidget(QWidget):
     basic application for opening a file dialog/ restoring a session by choosing the respective option in the menubar
     """
     import_requested = Signal()
+    cancel_requested = Signal()
 
+    valid_video_file_extensions = [".mp4", ".avi", ".mov"]
+    valid_gpsdata_file_extensions = [".csv"]
 
     def __init__(self, session: SessionHandler, menubar: QMenuBar):
         super().__init__()
@@ -33,14 +36,27 @@ class FilePickerWidget(QWidget):
             f"No path to gps data specified ({FilePickerWidget.valid_gpsdata_file_extensions})"
             )
         self.import_button = QPushButton(text= "Import")
+        # gps data of a running recording is read again whenever lines are appended
+        self.follow_checkbox = QCheckBox("Follow GPS data while it is recorded")
 
         # Prepare Button
         self.import_button.clicked.connect(self.import_button_clicked)
 
+        # Progress of the import and a button to cancel it, only visible while importing
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.hide()
+        self.cancel_button = QPushButton(text= "Cancel")
+        self.cancel_button.clicked.connect(self.cancel_requested)
+        self.cancel_button.hide()
+
         # Add the text boxes to the layout
         main_layout.addWidget(self.video_path_textbox)
         main_layout.addWidget(self.gps_data_path_textbox)
+        main_layout.addWidget(self.follow_checkbox)
         main_layout.addWidget(self.import_button)
+        main_layout.addWidget(self.progress_bar)
+        main_layout.addWidget(self.cancel_button)
 
         self.setLayout(main_layout)
 
@@ -96,14 +112,27 @@ class FilePickerWidget(QWidget):
     def import_button_clicked(self):
         """ Emit a Signal on button click """
         if self.check_path_validity():
-            self.session.initialize(
-                self.video_path,
-                self.gps_data_path,
-                None,
-                None
-            )
+            # image size and fps of the session are set by the video player, they are kept for the same files
+            session_data = self.session.session_data
+            if session_data is None or session_data.video_file_path != self.video_path \
+                    or session_data.gps_file_path != self.gps_data_path:
+                self.session.initialize(
+                    self.video_path,
+                    self.gps_data_path,
+                    None,
+                    None
+                )
             self.import_requested.emit()
 
+    @Slot(int, str)
+    def show_progress(self, value: int, message: str):
+        """ shows import progress in percent, import is disabled until it is finished """
+        self.progress_bar.setValue(value)
+        self.progress_bar.setFormat(f"%p% {message}")
+        self.progress_bar.setVisible(value < 100)
+        self.cancel_button.setVisible(value < 100)
+        self.import_button.setDisabled(value < 100)
+
     def check_path_validity(self):
         """ checks if the given filepaths are valid and have a correct extension
         
@@ -122,6 +151,11 @@ class FilePickerWidget(QWidget):
         #     return False
         return True
 
+    @property
+    def follow_gps_data(self) -> bool:
+        """ Getter for whether the gps data file should be followed after import """
+        return self.follow_checkbox.isChecked()
+
     @property
     def video_path(self) -> str:
         """ Getter for path to video file as str """
@@ -31,13 +31,13 @@ class InteractiveMapWindow(QWidget):
         # self.engine = QQmlApplicationEngine()
         self.model = MarkerModel()
         self.model.point_clicked.connect(self.receive_clicked_signal)
+        self.model.map_clicked.connect(self.go_to_location)
 
         print("Adding markers to model")
-        for i, coordinate in enumerate(_gpsdata.data):
-            color = QColor(["red", "green"][i == self.current_index])
-            self.model.addMarker(
-                QPointF(coordinate.latitude, coordinate.longitude), color
-                )
+        self._gpsdata = _gpsdata
+        self.add_markers(0)
+        # rows of a followed gps file are added as markers
+        self._gpsdata.data_appended.connect(self.add_markers)
 
         print("Setting context property")
         self.map_widget.rootContext().setContextProperty("markerModel", self.model)
@@ -57,9 +57,31 @@ class InteractiveMapWindow(QWidget):
         
         print("Initialization finished")
 
+    @Slot(int)
+    def add_markers(self, start: int):
+        """ adds markers for gps data from index start on """
+        for i, coordinate in enumerate(self._gpsdata.data[start:], start):
+            color = QColor(["red", "green"][i == self.current_index])
+            self.model.addMarker(
+                QPointF(coordinate.latitude, coordinate.longitude), color
+                )
+
+    @Slot(float, float)
+    def go_to_location(self, latitude: float, longitude: float):
+        """ Slot for markerModel's map_clicked signal, selects and requests the closest gps datum """
+        index = self._gpsdata.index_by_coordinate(latitude, longitude)
+        self.select_marker(index)
+        self._gpsdata.request_gpsdatum(self._gpsdata[index])
+
     @Slot(int, QPointF)
     def receive_clicked_signal(self, index, position: QPointF):
         """ Slot for markerModel's point_clicked signal"""
+        self.select_marker(index)
+        # hi = self.model.data(self.model.getIndexFromInt(index), self.model.PositionRole)
+        print(f"Signal received from marker {index} at {position.x()}, {position.y()}")
+
+    def select_marker(self, index: int):
+        """ colors the marker at index green and the previously selected one red """
         self.model.setData(
             self.model.getIndexFromInt(self.current_index),
             QColor("red"),
@@ -70,8 +92,6 @@ class InteractiveMapWindow(QWidget):
             QColor("green"),
             MarkerModel.ColorRole)
         self.current_index = index
-        # hi = self.model.data(self.model.getIndexFromInt(index), self.model.PositionRole)
-        print(f"Signal received from marker {index} at {position.x()}, {position.y()}")
 
 
 if __name__ == '__main__':
@@ -4,16 +4,23 @@ Window for displaying Linecharts
 
 # import sys
 from PySide6.QtCore import Signal, Slot
-from PySide6.QtWidgets import QMenuBar, QVBoxLayout, QWidget
+from PySide6.QtWidgets import QMenuBar, QVBoxLayout, QWidget, QComboBox
 
+import numpy as np
 import pyqtgraph as pg
 
 from COTdataclasses import GPSDatum, KeyFrame
 from COTabc import AbstractBaseWidget
 from tools.handler import GPSDataHandler, SessionHandler, KeyFrameHandler
+from tools.derived import DERIVED_COLUMNS
 
 class COTLineChartWidget(AbstractBaseWidget):
-    """ Line chart window specifically for speed and altitude against time """
+    """ Line chart window specifically for speed and altitude against time or distance """
+
+    # labels of the horizontal axes that can be chosen
+    x_axis_labels = {"time": "Time", "distance": "Distance", "compressed_time": "Time without Stops"}
+    # camera parameters interpolated between keyframes, shown once a keyframe is calibrated
+    calibration_labels = {"swing": "Swing", "tilt": "Tilt", "z_offset": "Height"}
 
     ################################## Implementation of abstract methods ###########################################
     def _initialize(self):
@@ -67,6 +74,25 @@ class COTLineChartWidget(AbstractBaseWidget):
         self.altitude_plot.addItem(self.altitude_position_indicator)
         self.gradient_plot.addItem(self.gradient_position_indicator)
 
+        # plots of the calibration timeline, see tools.handler.CalibrationTimeline
+        self.calibration_plots = {}
+        self.calibration_curves = {}
+        self.calibration_position_indicators = []
+        for name, label in COTLineChartWidget.calibration_labels.items():
+            plot = pg.PlotWidget(title=f"{label} vs. Time")
+            plot.setXLink(self.altitude_plot)
+            self.calibration_curves[name] = plot.plot(pen='c')
+            indicator = pg.InfiniteLine(0, angle= 90, bounds=[0, time_list[-1]])
+            plot.addItem(indicator)
+            self.calibration_position_indicators.append(indicator)
+            plot.hide()
+            self.calibration_plots[name] = plot
+
+        # plots of derived columns added by the user, see tools.derived
+        self.derived_plots = {}
+        self.derived_curves = {}
+        self.derived_position_indicators = []
+
         # Connect the clicked signal of the ScatterPlotItem to handle interaction with data points
         self.speed_scatter.sigClicked.connect(self.on_point_clicked)
         self.altitude_scatter.sigClicked.connect(self.on_point_clicked)
@@ -75,6 +101,18 @@ class COTLineChartWidget(AbstractBaseWidget):
         self._keyframes = []
         self._keyframe_indicators = []
 
+        # horizontal axis, see x_axis_labels, and the row shown by the position indicators
+        self._x_axis = "time"
+        self._current_index = 0
+        # timeline with collapsed stops, created on first use
+        self._compressed_time: np.ndarray = None
+
+        # rows of a followed gps file are added to the existing plots
+        self._connect(self._gpsdata_handler.data_appended, self.extend_plots)
+
+        if self._keyframe_handler.calibration is not None:
+            self._connect(self._keyframe_handler.calibration.calibration_changed, self.update_calibration_plots)
+
     def _setup_ui(self):
         # Set the application window title and general tooltip
         self._widget.setWindowTitle("Line Chart Window "+ self._gpsdata_handler.file_path.split("/")[-1])
@@ -87,39 +125,61 @@ class COTLineChartWidget(AbstractBaseWidget):
         # Create the main layout
         main_layout = QVBoxLayout()
 
+        # choice of the horizontal axis
+        self.x_axis_combobox = QComboBox()
+        for x_axis, label in COTLineChartWidget.x_axis_labels.items():
+            self.x_axis_combobox.addItem(label, x_axis)
+        self.x_axis_combobox.currentIndexChanged.connect(
+            lambda: self.set_x_axis(self.x_axis_combobox.currentData())
+        )
+        main_layout.addWidget(self.x_axis_combobox)
+
+        # adds a plot of any registered derived column
+        self.add_plot_combobox = QComboBox()
+        self.add_plot_combobox.addItem("Add Plot of ...", None)
+        for name, derived_column in DERIVED_COLUMNS.items():
+            self.add_plot_combobox.addItem(derived_column.label, name)
+        self.add_plot_combobox.activated.connect(
+            lambda: self.add_derived_plot(self.add_plot_combobox.currentData())
+        )
+        main_layout.addWidget(self.add_plot_combobox)
+
         # Add the plot widgets to the main layout
         main_layout.addWidget(self.speed_plot)
         main_layout.addWidget(self.altitude_plot)
         main_layout.addWidget(self.gradient_plot)
+        for plot in self.calibration_plots.values():
+            main_layout.addWidget(plot)
 
         # set layout
+        self._main_layout = main_layout
         self._widget.setLayout(main_layout)
 
     def react_to_keyframe_change(self, keyframe: KeyFrame):
         # add a vertical line as an indicator for a keyframe
         self._keyframes.append(keyframe)
-        speed_keyframe_indicator = pg.InfiniteLine(keyframe.gps.timestamp, angle= 90, movable=False, pen="b")
-        altitude_keyframe_indicator = pg.InfiniteLine(keyframe.gps.timestamp, angle= 90, movable=False, pen="b")
-        gradient_keyframe_indicator = pg.InfiniteLine(keyframe.gps.timestamp, angle= 90, movable=False, pen="b")
+        x = self.x_of(keyframe.gps)
+        speed_keyframe_indicator = pg.InfiniteLine(x, angle= 90, movable=False, pen="b")
+        altitude_keyframe_indicator = pg.InfiniteLine(x, angle= 90, movable=False, pen="b")
+        gradient_keyframe_indicator = pg.InfiniteLine(x, angle= 90, movable=False, pen="b")
 
         self.speed_plot.addItem(speed_keyframe_indicator)
         self.altitude_plot.addItem(altitude_keyframe_indicator)
         self.gradient_plot.addItem(gradient_keyframe_indicator)
 
-        self._keyframe_indicators.append(
-            [speed_keyframe_indicator, altitude_keyframe_indicator, gradient_keyframe_indicator]
-        )
+        indicators = [speed_keyframe_indicator, altitude_keyframe_indicator, gradient_keyframe_indicator]
+        for plot in [*self.calibration_plots.values(), *self.derived_plots.values()]:
+            indicator = pg.InfiniteLine(x, angle= 90, movable=False, pen="b")
+            plot.addItem(indicator)
+            indicators.append(indicator)
+        self._keyframe_indicators.append(indicators)
 
         # update position indicators
-        self.speed_position_indicator.setPos(keyframe.gps.timestamp)
-        self.altitude_position_indicator.setPos(keyframe.gps.timestamp)
-        self.gradient_position_indicator.setPos(keyframe.gps.timestamp)
+        self.update_plot_on_frame_change(keyframe.gps)
 
     def react_to_gpsdatum_change(self, gpsdatum: GPSDatum):
         """ updates visuals when a new frame is displayed """
-        self.speed_position_indicator.setPos(gpsdatum.timestamp)
-        self.altitude_position_indicator.setPos(gpsdatum.timestamp)
-        self.gradient_position_indicator.setPos(gpsdatum.timestamp)
+        self.update_plot_on_frame_change(gpsdatum)
 
 
     ################################## Implementation of class methods ###########################################
@@ -134,9 +194,135 @@ class COTLineChartWidget(AbstractBaseWidget):
         # request datum from handler
         self._gpsdata_handler.request_gpsdatum(self._gpsdata_handler[index])
 
+    def x_values(self) -> np.ndarray:
+        """ horizontal positions of all rows, time in seconds, with collapsed stops or distance in kilometers """
+        if self._x_axis == "distance":
+            return self._gpsdata_handler.distances / 1000
+        if self._x_axis == "compressed_time":
+            # rows keep their index, only their position on the axis changes
+            if self._compressed_time is None or len(self._compressed_time) != len(self._gpsdata_handler):
+                self._compressed_time = self._gpsdata_handler.stops.compressed_time(
+                    self._gpsdata_handler.columns["timestamp"]
+                )
+            return self._compressed_time
+        return self._gpsdata_handler.columns["timestamp"]
+
+    def x_of(self, gpsdatum: GPSDatum) -> float:
+        """ horizontal position of a gps datum """
+        return self.x_values()[self._gpsdata_handler.index_by_timestamp(gpsdatum.timestamp)]
+
+    @Slot(str)
+    def set_x_axis(self, x_axis: str):
+        """ plots all data against time or distance, see x_axis_labels """
+        self._x_axis = x_axis
+        label = COTLineChartWidget.x_axis_labels[x_axis]
+        columns = self._gpsdata_handler.columns
+        x_list = self.x_values()
+
+        for plot, curve, scatter, name in (
+            (self.speed_plot, self.speed_curve, self.speed_scatter, "speed"),
+            (self.altitude_plot, self.altitude_curve, self.altitude_scatter, "altitude"),
+            (self.gradient_plot, self.gradient_curve, self.gradient_scatter, "gradient")
+        ):
+            plot.setTitle(f"{name.capitalize()} vs. {label}")
+            curve.setData(x_list, columns[name])
+            scatter.setData(x=x_list, y=columns[name])
+
+        for keyframe, indicators in zip(self._keyframes, self._keyframe_indicators):
+            for indicator in indicators:
+                indicator.setPos(self.x_of(keyframe.gps))
+
+        for name, plot in self.calibration_plots.items():
+            plot.setTitle(f"{COTLineChartWidget.calibration_labels[name]} vs. {label}")
+        self.update_calibration_plots()
+
+        for name, plot in self.derived_plots.items():
+            plot.setTitle(f"{DERIVED_COLUMNS[name].label} vs. {label}")
+        self.update_derived_plots()
+
+        for indicator in self.position_indicators():
+            indicator.setBounds([0, x_list[-1]])
+            indicator.setPos(x_list[self._current_index])
+
+        margin = (x_list[-1] - x_list[0]) / 100
+        self.altitude_plot.setXRange(x_list[0] - margin, x_list[-1] + margin)
+
+    def position_indicators(self) -> list:
+        """ vertical lines of the current position in all plots """
+        return [
+            self.speed_position_indicator, self.altitude_position_indicator, self.gradient_position_indicator,
+            *self.calibration_position_indicators, *self.derived_position_indicators
+        ]
+
+    @Slot(str)
+    def add_derived_plot(self, name: str):
+        """ adds a plot of a derived column below the others, see tools.derived """
+        self.add_plot_combobox.setCurrentIndex(0)
+        if name is None or name in self.derived_plots:
+            return
+
+        derived_column = DERIVED_COLUMNS[name]
+        x_list = self.x_values()
+        plot = pg.PlotWidget(title=f"{derived_column.label} vs. {COTLineChartWidget.x_axis_labels[self._x_axis]}")
+        plot.setLabel("left", derived_column.label, units=derived_column.unit)
+        plot.setXLink(self.altitude_plot)
+        self.derived_curves[name] = plot.plot(x_list, self._gpsdata_handler.derived(name), pen='y')
+
+        indicator = pg.InfiniteLine(x_list[self._current_index], angle= 90, bounds=[0, x_list[-1]])
+        plot.addItem(indicator)
+        self.derived_position_indicators.append(indicator)
+
+        for keyframe, indicators in zip(self._keyframes, self._keyframe_indicators):
+            keyframe_indicator = pg.InfiniteLine(self.x_of(keyframe.gps), angle= 90, movable=False, pen="b")
+            plot.addItem(keyframe_indicator)
+            indicators.append(keyframe_indicator)
+
+        self.derived_plots[name] = plot
+        self._main_layout.addWidget(plot)
+
+    def update_derived_plots(self):
+        """ plots derived columns again, they are only computed again if their inputs changed """
+        x_list = self.x_values()
+        for name, curve in self.derived_curves.items():
+            curve.setData(x_list, self._gpsdata_handler.derived(name))
+
+    @Slot(int, int)
+    def update_calibration_plots(self, _start: int = 0, _end: int = None):
+        """ plots the calibration timeline, the plots are hidden until a keyframe is calibrated """
+        calibration = self._keyframe_handler.calibration
+        if calibration is None or calibration.keyframe_count() == 0:
+            return
+
+        columns = calibration.columns
+        x_list = self.x_values()
+        for name, plot in self.calibration_plots.items():
+            self.calibration_curves[name].setData(x_list, columns[name])
+            plot.show()
+
+    @Slot(int)
+    def extend_plots(self, start: int):
+        """ adds rows appended to the gps data from index start on """
+        columns = self._gpsdata_handler.columns
+        time_list = self.x_values()
+
+        # curves are drawn from the columns, scatter points are only added for the new rows
+        self.speed_curve.setData(time_list, columns["speed"])
+        self.altitude_curve.setData(time_list, columns["altitude"])
+        self.gradient_curve.setData(time_list, columns["gradient"])
+
+        self.speed_scatter.addPoints(x=time_list[start:], y=columns["speed"][start:])
+        self.altitude_scatter.addPoints(x=time_list[start:], y=columns["altitude"][start:])
+        self.gradient_scatter.addPoints(x=time_list[start:], y=columns["gradient"][start:])
+
+        self.update_derived_plots()
+
+        for indicator in self.position_indicators():
+            indicator.setBounds([0, time_list[-1]])
+
     @Slot(GPSDatum)
     def update_plot_on_frame_change(self, gpsdatum: GPSDatum):
         """ updates visuals when a new frame is displayed """
-        self.speed_position_indicator.setPos(gpsdatum.timestamp)
-        self.altitude_position_indicator.setPos(gpsdatum.timestamp)
-        self.gradient_position_indicator.setPos(gpsdatum.timestamp)
+        self._current_index = self._gpsdata_handler.index_by_timestamp(gpsdatum.timestamp)
+        x = self.x_values()[self._current_index]
+        for indicator in self.position_indicators():
+            indicator.setPos(x)
@@ -77,6 +77,15 @@ Rectangle {
             }
         }
 
+        // clicks beside the markers are resolved to the closest gps datum in interactive map
+        TapHandler {
+            id: tap
+            onTapped: (eventPoint) => {
+                var coordinate = mapItem.toCoordinate(eventPoint.position)
+                markerModel.forward_map_clicked(coordinate.latitude, coordinate.longitude)
+            }
+        }
+
         property geoCoordinate startCentroid
 
         PinchHandler {
@@ -47,6 +47,8 @@ class MarkerModel(QAbstractListModel):
     ColorRole = Qt.UserRole + 3
 
     point_clicked = Signal(int, QPointF)
+    # latitude and longitude of a click on the map beside the markers
+    map_clicked = Signal(float, float)
 
     _roles = {IndexRole: QByteArray(b"markerIndex"), PositionRole: QByteArray(b"markerPosition"), ColorRole: QByteArray(b"markerColor")}
 
@@ -59,6 +61,10 @@ class MarkerModel(QAbstractListModel):
     def forward_clicked_signal(self, index: int, position: QPointF):
         self.point_clicked.emit(index, position)
 
+    @Slot(float, float)
+    def forward_map_clicked(self, latitude: float, longitude: float):
+        self.map_clicked.emit(latitude, longitude)
+
     def rowCount(self, index= QModelIndex()):
         return len(self._markers)
 
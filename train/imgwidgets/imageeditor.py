@@ -1,33 +1,92 @@
 """ Contains class definitions for InteractableGraphicsView and ImageViewerWidget """
 
+import os
 import sys
-from PySide6.QtCore import Signal, Slot, QLineF, QRectF
-from PySide6.QtWidgets import QPushButton, QVBoxLayout, QWidget, \
-                              QGraphicsView, QGraphicsScene, QHBoxLayout
-from PySide6.QtGui import QPixmap, QPen, QColor, QMouseEvent
+import cv2
+import numpy as np
+from PySide6.QtCore import Qt, Signal, Slot, QLineF, QRectF
+from PySide6.QtWidgets import QPushButton, QVBoxLayout, QWidget, QLabel, QProgressBar, \
+                              QGraphicsView, QGraphicsScene, QHBoxLayout, QGraphicsItem
+from PySide6.QtGui import QPixmap, QImage, QPen, QColor, QMouseEvent, QWheelEvent, QPainter
 
 from COTdataclasses import KeyFrame, GPSDatum, ImagePointContainer
 from COTabc import AbstractBaseWidget
 from tools.math import assign_points_to_assumed_order
+from tools.birdseye import BirdsEyeView, image_to_ground
+from tools.tracker import KeyFrameTracker
+from imgwidgets.tiledpixmap import TiledPixmapItem
+
+try:
+    from PySide6.QtOpenGLWidgets import QOpenGLWidget
+except ImportError:
+    QOpenGLWidget = None
+
 
 class InteractableGraphicsView(QGraphicsView):
     """ Renders choosen key frame and handles mouse events for an interactable image
 
-    Renders exactly 4 points and lines connecting them
+    Renders exactly 4 points and lines connecting them. The image and overlay items are created
+    once and updated in place. The image is drawn from a tiled pyramid, the wheel zooms down to
+    pixel level and the middle mouse button pans. With COT_OPENGL=1 the view renders with OpenGL.
     """
     point_changed = Signal(int, int, int)
 
+    # maximum zoom in screen pixels per image pixel
+    max_zoom = 32
+    # zoom factor per wheel step
+    zoom_step = 1.25
+
     def __init__(self, width: int, height: int, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         # prepare graphics scene
         self.scene = QGraphicsScene(0, 0, width, height, self)
         self.setScene(self.scene)
-        # self.setSceneRect(0, 0, width, height)
+
+        if os.environ.get("COT_OPENGL", "0") not in ("", "0"):
+            if QOpenGLWidget is not None:
+                self.setViewport(QOpenGLWidget())
+                # partial updates are not supported by OpenGL viewports
+                self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.FullViewportUpdate)
+            else:
+                print("OpenGL is not available, the image editor renders without it.")
+
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self._pan_start = None
+
+        self.points = []
+        self.current_point_index = 0
+
+        # persistent items, positions are updated by draw_points
+        pen = QPen(QColor(255, 0, 0))
+        # the pen keeps its width at every zoom
+        pen.setCosmetic(True)
+
+        self._image_item = TiledPixmapItem()
+        self.scene.addItem(self._image_item)
+
+        self._line_items = []
+        for _ in range(4):
+            line_item = self.scene.addLine(QLineF(), pen)
+            line_item.hide()
+            self._line_items.append(line_item)
+
+        self._point_items = []
+        for _ in range(4):
+            point_item = self.scene.addEllipse(QRectF(-3, -3, 6, 6), pen)
+            # points keep their size on screen at every zoom
+            point_item.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIgnoresTransformations)
+            point_item.hide()
+            self._point_items.append(point_item)
 
     def load_keyframe(self, keyframe: KeyFrame) -> None:
         # is called when keyframe was created or loaded
         self._original_image: QPixmap = keyframe.pixmap
+        self._image_item.set_pixmap(self._original_image)
+        if self._original_image is not None:
+            self.setSceneRect(0, 0, self._original_image.width(), self._original_image.height())
+            self.fit_in_view()
 
         self.points = []
         if keyframe.image_point is not None:
@@ -39,31 +98,42 @@ class InteractableGraphicsView(QGraphicsView):
         self.draw_points()
 
     def draw_points(self):
-        """ clear graphicsscene and draw points and lines from buffer """
-        # prepare scene and pen
-        self.scene.clear()
-        self.scene.addPixmap(self._original_image)
-        self.setSceneRect(0, 0, self._original_image.width(), self._original_image.height())
-        pen = QPen(QColor(255, 0, 0))
-
-        # draw lines between
-        if len(self.points) > 1:
-            for i, (x_1, y_1) in enumerate(self.points):
-                # dont draw final line if not 4 points are set
-                if i+1 == len(self.points) and not (i+1)%4 == 0:
-                    break
-
-                # get following point and draw line
-                x_2, y_2 = self.points[(i+1)%len(self.points)]
-                line = QLineF(x_1, y_1, x_2, y_2)
-                self.scene.addLine(line, pen)
-
-        # Draw circles at each point
-        for i, (x, y) in enumerate(self.points):
-            ellipse = QRectF(x - 3, y - 3, 6, 6)
-            self.scene.addEllipse(ellipse, pen)
-
-        # Update the scene with the updated image
+        """ move the overlay items to the points in the buffer """
+        # points are pixel indices, markers are drawn at the center of the pixel
+        centers = [(x + 0.5, y + 0.5) for x, y in self.points]
+
+        # draw lines between, dont draw final line if not 4 points are set
+        line_count = len(centers) if len(centers) == 4 else max(len(centers) - 1, 0)
+        for i, line_item in enumerate(self._line_items):
+            if i < line_count:
+                x_1, y_1 = centers[i]
+                x_2, y_2 = centers[(i+1)%len(centers)]
+                line_item.setLine(x_1, y_1, x_2, y_2)
+                line_item.show()
+            else:
+                line_item.hide()
+
+        # circles at each point
+        for i, point_item in enumerate(self._point_items):
+            if i < len(centers):
+                point_item.setPos(*centers[i])
+                point_item.show()
+            else:
+                point_item.hide()
+
+    def fit_in_view(self):
+        """ zooms to show the whole image """
+        self.fitInView(self.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
+
+    def zoom(self, factor: float):
+        """ zooms by factor, limited between the whole image and max_zoom """
+        scale = self.transform().m11()
+        fit_scale = min(
+            self.viewport().width() / max(self.sceneRect().width(), 1),
+            self.viewport().height() / max(self.sceneRect().height(), 1)
+        )
+        factor = min(max(scale * factor, min(fit_scale, 1)), self.max_zoom) / scale
+        self.scale(factor, factor)
 
     def set_current_index(self, desired_index: int):
         """ Set current index as requested if there are points before that index """
@@ -71,15 +141,51 @@ class InteractableGraphicsView(QGraphicsView):
             if len(self.points) >= desired_index \
             else len(self.points)
 
+    def wheelEvent(self, event: QWheelEvent):
+        """ zooms around the mouse position """
+        steps = event.angleDelta().y() / 120
+        if steps != 0:
+            self.zoom(self.zoom_step ** steps)
+        event.accept()
+
+    def mouseDoubleClickEvent(self, event: QMouseEvent):
+        """ double click with the middle mouse button shows the whole image """
+        if event.button() == Qt.MouseButton.MiddleButton:
+            self.fit_in_view()
+        else:
+            super().mouseDoubleClickEvent(event)
+
+    def mouseMoveEvent(self, event: QMouseEvent):
+        if self._pan_start is not None:
+            delta = event.position() - self._pan_start
+            self._pan_start = event.position()
+            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - int(delta.x()))
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() - int(delta.y()))
+            return
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event: QMouseEvent):
+        if event.button() == Qt.MouseButton.MiddleButton:
+            self._pan_start = None
+            return
+        super().mouseReleaseEvent(event)
+
     def mousePressEvent(self, event: QMouseEvent):
         """ Function to handle mouse click events on the image """
+        if event.button() == Qt.MouseButton.MiddleButton:
+            self._pan_start = event.position()
+            return
+        if event.button() != Qt.MouseButton.LeftButton:
+            return
 
         # Get the mouse coordinates translate them to the picture
-        x = int(event.position().x())
-        y = int(event.position().y())
+        position = self.mapToScene(event.position().toPoint())
+        x = int(position.x())
+        y = int(position.y())
 
-        x = int(self.mapToScene(x,y).x())
-        y = int(self.mapToScene(x,y).y())
+        # ignore clicks beside the image
+        if not (0 <= x < self.sceneRect().width() and 0 <= y < self.sceneRect().height()):
+            return
 
         # Add points
         if len(self.points) > self.current_point_index:
@@ -104,7 +210,12 @@ class ImageViewerWidget(AbstractBaseWidget):
     ################################## Implementation of abstract methods ###########################################
 
     def _initialize(self):
-        pass
+        # propagates the points of a calibrated keyframe to create further keyframes
+        self.tracker = KeyFrameTracker()
+        self.tracker.progress.connect(self.on_tracking_progress)
+        self.tracker.candidates_found.connect(self._keyframe_handler.add_keyframes)
+        self.tracker.finished.connect(self.on_tracking_finished)
+        self.tracker.failed.connect(self.on_tracking_failed)
 
     def _setup_ui(self):
         # Set up the UI
@@ -117,7 +228,19 @@ class ImageViewerWidget(AbstractBaseWidget):
         )
 
         self.view.point_changed.connect(self.on_points_changed)
-        layout.addWidget(self.view)
+
+        # rectified ground plane next to the image, shown once the keyframe is calibrated
+        self.birdseye_label = QLabel()
+        self.birdseye_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.birdseye_label.setMinimumWidth(240)
+        self.birdseye_label.hide()
+
+        view_row = QWidget()
+        view_row_layout = QHBoxLayout()
+        view_row_layout.addWidget(self.view, 3)
+        view_row_layout.addWidget(self.birdseye_label, 1)
+        view_row.setLayout(view_row_layout)
+        layout.addWidget(view_row)
 
         # Create buttons for points and connect them to the point_clicked function
         self.buttons = []
@@ -141,6 +264,19 @@ class ImageViewerWidget(AbstractBaseWidget):
         self.export_button_enabled = False
         layout.addWidget(self.export_button)
 
+        # tracks the points of the calibrated keyframe through the following frames
+        tracking_row = QWidget()
+        tracking_row_layout = QHBoxLayout()
+        self.track_button = QPushButton("Track Points")
+        self.track_button.clicked.connect(self.track_button_clicked)
+        self.track_button.setDisabled(True)
+        tracking_row_layout.addWidget(self.track_button)
+        self.tracking_progress_bar = QProgressBar()
+        self.tracking_progress_bar.hide()
+        tracking_row_layout.addWidget(self.tracking_progress_bar)
+        tracking_row.setLayout(tracking_row_layout)
+        layout.addWidget(tracking_row)
+
         # Set the main layout
         self._widget.setLayout(layout)
 
@@ -151,14 +287,56 @@ class ImageViewerWidget(AbstractBaseWidget):
         # remember current keyframe for exporting them later
         self.current_keyframe = keyframe
         self.view.load_keyframe(keyframe)
+        self.show_birdseye(keyframe)
+        if not self.tracker.is_running():
+            self.track_button.setDisabled(keyframe.intrinsics is None)
         self.show()
 
     def react_to_gpsdatum_change(self, gpsdatum: GPSDatum):
         pass
 
 
+    def close(self) -> bool:
+        self.tracker.shutdown()
+        return super().close()
+
     ################################## Implementation of class methods ###########################################
 
+    def show_birdseye(self, keyframe: KeyFrame):
+        """ shows the keyframe rectified onto the ground plane with its image points, if calibrated """
+        if keyframe.intrinsics is None or keyframe.pixmap is None:
+            self.birdseye_label.hide()
+            return
+
+        image = keyframe.pixmap.toImage().convertToFormat(QImage.Format.Format_RGB888)
+        width, height = image.width(), image.height()
+        # rows may be padded
+        frame = np.frombuffer(image.constBits(), np.uint8).reshape(height, image.bytesPerLine())
+        frame = frame[:, :3 * width].reshape(height, width, 3)
+
+        try:
+            birdseye = BirdsEyeView.from_keyframe(keyframe, width, height)
+        except ValueError as exception:
+            print(f"{exception} Keyframe at {keyframe.gps.timestamp}s can not be shown from above.")
+            self.birdseye_label.hide()
+            return
+        rectified = birdseye.rectify(frame)
+
+        # image points where the calibration puts them on the ground
+        ground = image_to_ground(birdseye.homography, keyframe.image_point.to_list())
+        for x, y in birdseye.ground_to_output(ground):
+            cv2.circle(rectified, (int(round(x)), int(round(y))), 4, (255, 0, 0), 1)
+
+        rectified = np.ascontiguousarray(rectified)
+        q_image = QImage(rectified.data, rectified.shape[1], rectified.shape[0], rectified.strides[0],
+                         QImage.Format.Format_RGB888)
+        self.birdseye_label.setPixmap(QPixmap.fromImage(q_image).scaled(
+            self.birdseye_label.width(), self.view.height(),
+            Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
+        ))
+        self.birdseye_label.setToolTip(f"Bird's-eye view, {birdseye.scale:.0f} mm per pixel")
+        self.birdseye_label.show()
+
     def point_button_clicked(self, _, point: int):
         """ Function to handle point button clicks """
         self.view.set_current_index(point - 1)
@@ -169,8 +347,51 @@ class ImageViewerWidget(AbstractBaseWidget):
         a, b, c, d = assign_points_to_assumed_order(image_points)
         ipc = ImagePointContainer(a, b, c, d)
         self.current_keyframe.image_point = ipc
+        # the keyframe is calibrated again with the changed points
+        self.current_keyframe.intrinsics = None
+        self.current_keyframe.extrinsics = None
         self._keyframe_handler.request_keyframe(self.current_keyframe)
 
+    def track_button_clicked(self):
+        """ starts tracking the points of the current keyframe, cancels it if running """
+        if self.tracker.is_running():
+            self.tracker.cancel()
+            return
+
+        session_data = self._session_handler.session_data
+        if not session_data.video_fps:
+            print("Frame rate of the video is unknown, points can not be tracked.")
+            return
+
+        index = self._gpsdata_handler.index_by_timestamp(self.current_keyframe.gps.timestamp)
+        self.tracker.start(
+            session_data.video_file_path,
+            session_data.video_fps,
+            (session_data.image_width, session_data.image_height),
+            self._gpsdata_handler.data[index:],
+            self.current_keyframe
+        )
+        self.track_button.setText("Cancel Tracking")
+        self.tracking_progress_bar.setValue(0)
+        self.tracking_progress_bar.show()
+
+    @Slot(int, str)
+    def on_tracking_progress(self, percent: int, message: str):
+        self.tracking_progress_bar.setValue(percent)
+        self.tracking_progress_bar.setFormat(f"%p% {message}")
+
+    @Slot(str)
+    def on_tracking_finished(self, reason: str):
+        print(f"Tracking finished: {reason}")
+        self.track_button.setText("Track Points")
+        self.track_button.setDisabled(self.current_keyframe.intrinsics is None)
+
+    @Slot(str)
+    def on_tracking_failed(self, message: str):
+        print(f"Tracking failed: {message}")
+        self.track_button.setText("Track Points")
+        self.tracking_progress_bar.hide()
+
     @Slot(int, int, int)
     def on_points_changed(self, i, x, y):
         """ Function to handle mouse click events on the image """
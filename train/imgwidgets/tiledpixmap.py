@@ -0,0 +1,118 @@
+""" Graphics item drawing a large pixmap from a tiled multi-resolution pyramid
+
+TiledPixmapItem
+
+Level 0 is the full resolution image, every further level halves width and height down to a
+single tile. A paint only draws the tiles of the level matching the zoom that intersect the
+exposed rect, so zoomed in only a few full resolution tiles are drawn and zoomed out only a
+few tiles of a small level. Levels and tiles are created on first use and kept, with an
+OpenGL viewport every tile is uploaded as texture once.
+"""
+
+from math import ceil, floor, log2
+
+from PySide6.QtCore import Qt, QRectF
+from PySide6.QtGui import QImage, QPainter, QPixmap
+from PySide6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+
+class TiledPixmapItem(QGraphicsItem):
+    """ draws a pixmap at its full resolution size in item coordinates """
+
+    # edge length of a tile in pixels of its level
+    tile_size = 256
+
+    def __init__(self, parent: QGraphicsItem = None) -> None:
+        super().__init__(parent)
+        # exposed rect is needed to only draw visible tiles
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+
+        self._width = 0
+        self._height = 0
+        # images of all levels, created on first use
+        self._levels: list = []
+        # pixmap of a tile by level and tile position
+        self._tiles: dict = {}
+
+    def set_pixmap(self, pixmap: QPixmap) -> None:
+        """ replaces the image, previous levels and tiles are discarded """
+        self.prepareGeometryChange()
+        self._tiles.clear()
+        if pixmap is None or pixmap.isNull():
+            self._width = 0
+            self._height = 0
+            self._levels = []
+        else:
+            self._width = pixmap.width()
+            self._height = pixmap.height()
+            # smallest level fits into a single tile
+            level_count = max(ceil(log2(max(self._width, self._height) / self.tile_size)), 0) + 1
+            self._levels = [pixmap.toImage()] + [None] * (level_count - 1)
+        self.update()
+
+    def level_count(self) -> int:
+        return len(self._levels)
+
+    def _level(self, level: int) -> QImage:
+        """ image of a level, scaled down from the level above """
+        if self._levels[level] is None:
+            above = self._level(level - 1)
+            self._levels[level] = above.scaled(
+                max(above.width() // 2, 1), max(above.height() // 2, 1),
+                Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation
+            )
+        return self._levels[level]
+
+    def _tile(self, level: int, column: int, row: int) -> QPixmap:
+        key = (level, column, row)
+        tile = self._tiles.get(key)
+        if tile is None:
+            image = self._level(level)
+            x = column * self.tile_size
+            y = row * self.tile_size
+            # tiles at the right and bottom edge are smaller
+            tile = QPixmap.fromImage(image.copy(
+                x, y, min(self.tile_size, image.width() - x), min(self.tile_size, image.height() - y)
+            ))
+            self._tiles[key] = tile
+        return tile
+
+    def boundingRect(self) -> QRectF:
+        return QRectF(0, 0, self._width, self._height)
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None) -> None:
+        if len(self._levels) == 0:
+            return
+
+        # screen pixels per image pixel, the level is chosen to have at least one pixel per screen pixel
+        level_of_detail = option.levelOfDetailFromTransform(painter.worldTransform())
+        level = 0
+        if level_of_detail < 1:
+            level = min(floor(log2(1 / level_of_detail)), len(self._levels) - 1)
+        image = self._level(level)
+
+        # item coordinates per pixel of the level, per axis as levels are rounded down
+        scale_x = self._width / image.width()
+        scale_y = self._height / image.height()
+        tile_width = self.tile_size * scale_x
+        tile_height = self.tile_size * scale_y
+
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        first_column = max(int(exposed.left() // tile_width), 0)
+        last_column = min(int(exposed.right() // tile_width), (image.width() - 1) // self.tile_size)
+        first_row = max(int(exposed.top() // tile_height), 0)
+        last_row = min(int(exposed.bottom() // tile_height), (image.height() - 1) // self.tile_size)
+
+        # interpolate when scaled down, show sharp pixels when zoomed in
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, level_of_detail < 1)
+
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                tile = self._tile(level, column, row)
+                painter.drawPixmap(
+                    QRectF(column * tile_width, row * tile_height, tile.width() * scale_x, tile.height() * scale_y),
+                    tile,
+                    QRectF(tile.rect())
+                )
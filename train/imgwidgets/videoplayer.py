@@ -3,17 +3,75 @@
 
 """
 
+import os
+import threading
 import cv2
+import numpy as np
 from numpy import ndarray
-from datetime import timedelta
+from datetime import timedelta, datetime
 
-from PySide6.QtWidgets import QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QWidget, QLineEdit
-from PySide6.QtCore import Qt, QTimer, Signal, Slot, QSize
-from PySide6.QtGui import QPixmap, QImage, QResizeEvent, QIntValidator
+from PySide6.QtWidgets import QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QWidget, QLineEdit, QCheckBox, QComboBox
+from PySide6.QtCore import Qt, QTimer, Signal, Slot, QSize, QLocale
+from PySide6.QtGui import QPixmap, QImage, QResizeEvent, QDoubleValidator
 
 from COTabc import AbstractBaseWidget
 from COTdataclasses import GPSDatum, KeyFrame
 from tools.handler import SessionHandler, GPSDataHandler, KeyFrameHandler
+from tools.profiling import profiler, timed, section
+from tools.birdseye import BirdsEyeView
+from tools.framepool import FrameBufferPool
+from tools.math import frame_number_at
+from tools.decoder import SharedMemoryDecoder
+from tools.framesource import OpenCVFrameSource, available_frame_sources, open_frame_source, select_frame_source
+
+
+class FramePrefetcher:
+    """ reads frames in a background thread with its own frame source, e.g. the frames of keyframe candidates
+
+    Frames are read in the order of their frame number and kept until other frames are prefetched.
+    """
+
+    def __init__(self, video_path: str) -> None:
+        self.video_path = video_path
+        # frames by frame number, filled by the thread
+        self._frames = {}
+        self._cancel_event = threading.Event()
+        self._thread: threading.Thread = None
+
+    def prefetch(self, frame_numbers: list) -> None:
+        """ discards prefetched frames and starts reading frame_numbers """
+        self.stop()
+        self._frames = {}
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._read,
+            args=(self._cancel_event, self._frames, sorted(set(frame_numbers))),
+            name="frame-prefetcher",
+            daemon=True
+        )
+        self._thread.start()
+
+    def get(self, frame_number: int) -> ndarray:
+        """ prefetched frame or None if it was not read yet """
+        return self._frames.get(frame_number)
+
+    def stop(self) -> None:
+        self._cancel_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _read(self, cancel_event: threading.Event, frames: dict, frame_numbers: list) -> None:
+        with open_frame_source(self.video_path, None, frame_numbers) as frame_source:
+            for frame_number in frame_numbers:
+                if cancel_event.is_set():
+                    break
+                frame = frame_source.read(frame_number)
+                if frame is None:
+                    break
+                # frames of memory mapped stores are read only views
+                frames[frame_number] = frame if frame.flags.writeable else frame.copy()
+
 
 class COTVideoPlayer(QLabel):
     """ Integrates a Video loaded with OpenCV into a displayable Widget and provides functionality """
@@ -32,31 +90,62 @@ class COTVideoPlayer(QLabel):
 
         # Initialize video properties
         self.video_path = ""
-        self.video_capture = None
+        # the video itself and the fastest source for stepping through the gps rows, see tools.framesource
+        self.video_source: OpenCVFrameSource = None
+        self.frame_source = None
         self.gpsdata: GPSDataHandler = None
         self.current_timestamp_index = 0
+        # time in seconds of the displayed frame, the gps track is interpolated at it
+        self.current_frame_time = 0
         self.is_playing = False
+        # shows frames rectified onto the ground plane if set, exported frames are not rectified
+        self.birdseye: BirdsEyeView = None
+        self._rectified: ndarray = None
+        # frames read ahead in the background, used instead of seeking if available
+        self.prefetcher: FramePrefetcher = None
+        # playback and stepping skip the rows inside of stops, see tools.stops
+        self.skip_stops = False
+        # buffers for read, color conversion and scaling, taken back once a frame is displayed
+        self.frame_pool = FrameBufferPool()
+        # decodes frames in a separate process if set, see set_decoder_backend
+        self.decoder: SharedMemoryDecoder = None
 
         # Timer to update the video display
         self.timer = QTimer(self)
         self.timer.timeout.connect(self._update_video_frame_wrapper)
 
-    def load_video(self, video_path: str, gpsdata: GPSDataHandler):
+    def load_video(self, video_path: str, gpsdata: GPSDataHandler, video_capture: cv2.VideoCapture = None):
 
-        # Load the video and set the timestamps from gpsdata
+        # Load the video, if it was not opened already, and set the timestamps from gpsdata
         self.video_path = video_path
-        self.video_capture = cv2.VideoCapture(video_path)
+        self.close_frame_source()
+        self.video_source = OpenCVFrameSource(video_path, video_capture)
         self.gpsdata = gpsdata
 
         # read fps information for calculation purposes
-        self.video_fps = self.video_capture.get(cv2.CAP_PROP_FPS)
-        self.image_width = int(self.video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.image_height = int(self.video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.video_fps = self.video_source.fps
+        self.image_width, self.image_height = self.video_source.native_resolution
+
+        # playback steps about a second from row to row, stores of extracted frames are used if they hold all rows
+        frame_numbers = frame_number_at(self.video_fps, gpsdata.columns["timestamp"])
+        sources = available_frame_sources(video_path, self.video_source)
+        self.frame_source = select_frame_source(
+            sources, round(self.video_fps), frame_numbers[frame_numbers < self.video_source.frame_count]
+        ) or self.video_source
+        for source in sources:
+            if source is not self.frame_source and source is not self.video_source:
+                source.close()
 
         # Set the initial timestamp index and update the video display
         self.current_timestamp_index = 0
         self._update_video_frame()
 
+    def close_frame_source(self):
+        """ closes the source chosen for playback, the video itself may be shared with the import pipeline """
+        if self.frame_source is not None and self.frame_source is not self.video_source:
+            self.frame_source.close()
+        self.frame_source = self.video_source
+
     def toggle_play_pause(self) -> bool:
         """ Toggle play/pause state and start/stop the timer accordingly """
         self.is_playing = not self.is_playing
@@ -68,7 +157,7 @@ class COTVideoPlayer(QLabel):
 
     def jump_to_gpsdatum(self, gpsdatum: GPSDatum):
         """ slot for signal from parent, looks for a certain timestamp """
-        self.current_timestamp_index = self.gpsdata.list_of_timestamps().index(gpsdatum.timestamp)
+        self.current_timestamp_index = self.gpsdata.index_by_timestamp(gpsdatum.timestamp)
         self._update_video_frame()
 
     @Slot(int)
@@ -81,7 +170,7 @@ class COTVideoPlayer(QLabel):
     def go_to_previous_timestamp(self):
         """ Move to the previous timestamp and update the video display """
         if self.current_timestamp_index > 0:
-            self.current_timestamp_index -= 1
+            self.current_timestamp_index = self.previous_index(self.current_timestamp_index)
             self._update_video_frame()
 
             # signal which frame was loaded
@@ -91,64 +180,169 @@ class COTVideoPlayer(QLabel):
     def go_to_next_timestamp(self):
         """ Move to the next timestamp and update the video display """
         if self.current_timestamp_index < len(self.gpsdata) - 1:
-            self.current_timestamp_index += 1
+            self.current_timestamp_index = self.next_index(self.current_timestamp_index)
             self._update_video_frame()
 
             # signal which frame was loaded
             current_gpsdatum: GPSDatum = self.gpsdata[self.current_timestamp_index]
             self.frame_updated.emit(current_gpsdatum)
 
+    def next_index(self, index: int) -> int:
+        """ row shown after index, the row after a stop if stops are skipped """
+        if self.skip_stops:
+            return self.gpsdata.stops.next_index(index)
+        return index + 1
+
+    def previous_index(self, index: int) -> int:
+        """ row shown before index, the row before a stop if stops are skipped """
+        if self.skip_stops:
+            return self.gpsdata.stops.previous_index(index)
+        return index - 1
+
+    def set_decoder_backend(self, backend: str):
+        """ decodes frames with the frame sources in the gui process ("capture") or in a decoder process ("process") """
+        if backend == "process":
+            if self.decoder is None:
+                self.decoder = SharedMemoryDecoder(self.video_path, self.image_width, self.image_height)
+        else:
+            self.shutdown_decoder()
+
+    def shutdown_decoder(self):
+        """ stops the decoder process, frames are read by the frame sources again """
+        if self.decoder is not None:
+            self.decoder.shutdown()
+            self.decoder = None
+
+    def _frames_ahead(self) -> list:
+        """ frame numbers and rows of the rows shown next, requested in advance from the decoder """
+        ahead = []
+        index = self.current_timestamp_index
+        for _ in range(self.decoder.slot_count // 2):
+            index = self.next_index(index)
+            if index >= len(self.gpsdata):
+                break
+            ahead.append((frame_number_at(self.video_fps, self.gpsdata[index].timestamp), index))
+        return ahead
+
     def _update_video_frame_wrapper(self):
         """ wrapper for update video frame that advances the frame number,
             to be called by the internal timer """
-        self.current_timestamp_index = (self.current_timestamp_index + 1) % len(self.gpsdata)
+        self.current_timestamp_index = self.next_index(self.current_timestamp_index) % len(self.gpsdata)
         self._update_video_frame()
         
         # signal which frame was loaded
         current_gpsdatum: GPSDatum = self.gpsdata[self.current_timestamp_index]
         self.frame_updated.emit(current_gpsdatum)
 
+    @timed()
     def _update_video_frame(self):
         # Get the current timestamp and set the video capture to the corresponding frame
         # only ever frames with a gps coordinate are shown
         current_gpsdatum: GPSDatum = self.gpsdata[self.current_timestamp_index]
-        frame_number = int(self.video_capture.get(cv2.CAP_PROP_FPS) * current_gpsdatum.timestamp)
-        self.video_capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-
-        # Read the frame and convert it to RGB format
-        ret, frame = self.video_capture.read()
-        if not ret:
-            self.timer.stop()
-            print("Something went wrong")
-            return
+        frame_number = frame_number_at(self.video_fps, current_gpsdatum.timestamp)
+        self.current_frame_time = frame_number / self.video_fps
+
+        frame = self.prefetcher.get(frame_number) if self.prefetcher is not None else None
+        # prefetched frames are not from the pool
+        buffer = None
+        # frames of the decoder are drawn on directly and discarded after they were shown
+        in_place = False
+        if frame is None and self.decoder is not None:
+            with section("SharedMemoryDecoder.frame"):
+                frame = self.decoder.frame(frame_number, self.current_timestamp_index, self._frames_ahead())
+            if frame is None:
+                self.timer.stop()
+                print("Something went wrong")
+                return
+            # the bird's-eye view rectifies the frame without the text on it
+            in_place = self.birdseye is None
+        elif frame is None:
+            # rows appended by a followed gps file are not in a store of extracted frames
+            frame_source = self.frame_source if self.frame_source.contains(frame_number) else self.video_source
+
+            # Read the frame into a buffer of the pool
+            buffer = self.frame_pool.acquire((self.image_height, self.image_width, 3))
+            with section(f"FrameSource.read[{frame_source.name}]"):
+                frame = frame_source.read(frame_number, buffer)
+            if frame is None:
+                self.frame_pool.release(buffer)
+                self.timer.stop()
+                print("Something went wrong")
+                return
 
         # Display the frame in the widget
-        q_pixmap = self.convert_cv_img_to_q_pixmap(frame)
-        self.setPixmap(q_pixmap)
-
-    def convert_cv_img_to_q_pixmap(self, cv_image: ndarray):
-        """Provides functionality to convert opencvs ndarray to qts pixmap """
-
-        # fix color channels
-        cv_image = cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB)
+        try:
+            q_pixmap = self.convert_cv_img_to_q_pixmap(frame, in_place=in_place)
+            if self.birdseye is not None:
+                with section("BirdsEyeView.rectify"):
+                    self._rectified = self.birdseye.rectify(frame, self._rectified)
+                q_pixmap = self.convert_cv_img_to_q_pixmap(self._rectified, keep_unscaled=False)
+            self.setPixmap(q_pixmap)
+        finally:
+            if buffer is not None:
+                self.frame_pool.release(buffer)
+            if in_place:
+                self.decoder.discard(frame_number)
+
+    def set_birdseye(self, birdseye: BirdsEyeView):
+        """ shows frames rectified by birdseye, None shows them unchanged """
+        if birdseye is None and self.birdseye is None:
+            return
+        self.birdseye = birdseye
+        self._rectified = None
+        if self.video_source is not None:
+            self._update_video_frame()
 
-        # put the time on the image
-        current_gpsdatum: GPSDatum = self.gpsdata[self.current_timestamp_index]
-        timestamp_hhmmss = timedelta(seconds= current_gpsdatum.timestamp)
-        cv_image = cv2.putText(cv_image,
-                               f"t= {timestamp_hhmmss} ({current_gpsdatum.timestamp}s)",
-                               (50,20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+    @timed()
+    def convert_cv_img_to_q_pixmap(self, cv_image: ndarray, keep_unscaled: bool = True, in_place: bool = False):
+        """Provides functionality to convert opencvs ndarray to qts pixmap
 
+        keep_unscaled keeps the unscaled image as pixmap_unscaled for export. The images are
+        converted and scaled in buffers of the frame pool, QPixmap.fromImage copies them, so the
+        buffers are released once the pixmaps exist. in_place draws on cv_image and wraps it as
+        BGR image without conversion, e.g. for a slot of the decoder.
+        """
         height, width, _ = cv_image.shape
-        bytesPerLine = 3 * width
-
-        unscaled_q_image = QImage(cv_image.data, width, height, bytesPerLine, QImage.Format_RGB888)
-
-        # save unscaled image for export
-        self.pixmap_unscaled = QPixmap.fromImage(unscaled_q_image)
-        # unscaled_q_image = QImage(cv_image.data, width, height, bytesPerLine, QImage.Format_RGB888)
-        scaled_q_image = unscaled_q_image.scaled(self.display_size.width(), self.display_size.height(), Qt.KeepAspectRatio)
-        return QPixmap.fromImage(scaled_q_image)
+        rgb_image = None
+        scaled_image = None
+        try:
+            if in_place:
+                image, image_format, text_color = cv_image, QImage.Format_BGR888, (255, 0, 0)
+            else:
+                # fix color channels
+                rgb_image = self.frame_pool.acquire((height, width, 3))
+                cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB, dst=rgb_image)
+                image, image_format, text_color = rgb_image, QImage.Format_RGB888, (0, 0, 255)
+
+            # put the time of the frame and the gps state interpolated at it on the image
+            frame_state: GPSDatum = self.gpsdata.state_at(self.current_frame_time)
+            timestamp_hhmmss = timedelta(seconds= int(self.current_frame_time))
+            cv2.putText(image,
+                        f"t= {timestamp_hhmmss} ({self.current_frame_time:.2f}s) v= {frame_state.speed:.1f}km/h",
+                        (50,20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, text_color, 2)
+
+            unscaled_q_image = QImage(image.data, width, height, 3 * width, image_format)
+
+            # save unscaled image for export
+            if keep_unscaled:
+                self.pixmap_unscaled = QPixmap.fromImage(unscaled_q_image)
+
+            # scaled to fit the display like Qt.KeepAspectRatio, nearest neighbour like Qt.FastTransformation
+            scaled_width, scaled_height = self.display_size.width(), self.display_size.height()
+            if scaled_height * width // height <= scaled_width:
+                scaled_width = max(scaled_height * width // height, 1)
+            else:
+                scaled_height = max(scaled_width * height // width, 1)
+            scaled_image = self.frame_pool.acquire((scaled_height, scaled_width, 3))
+            cv2.resize(image, (scaled_width, scaled_height), dst=scaled_image, interpolation=cv2.INTER_NEAREST)
+
+            scaled_q_image = QImage(scaled_image.data, scaled_width, scaled_height, 3 * scaled_width, image_format)
+            return QPixmap.fromImage(scaled_q_image)
+        finally:
+            if rgb_image is not None:
+                self.frame_pool.release(rgb_image)
+            if scaled_image is not None:
+                self.frame_pool.release(scaled_image)
 
     def resizeEvent(self, event: QResizeEvent) -> None:
         self.display_size: QSize = event.size()
@@ -163,6 +357,9 @@ class VideoPlayerWidget(AbstractBaseWidget):
     - displays it with common functionality
     """
 
+    # video opened in advance, e.g. by the import worker
+    _video_capture: cv2.VideoCapture = None
+
     ################################## Implementation of abstract methods ###########################################
 
     def _initialize(self):
@@ -170,15 +367,29 @@ class VideoPlayerWidget(AbstractBaseWidget):
         self._cot_video_player = COTVideoPlayer()
         self._cot_video_player.load_video(
             self._session_handler.session_data.video_file_path,
-            self._gpsdata_handler
+            self._gpsdata_handler,
+            self._video_capture
         )
 
         self._session_handler.session_data.image_width = self._cot_video_player.image_width
         self._session_handler.session_data.image_height = self._cot_video_player.image_height
+        self._session_handler.session_data.video_fps = self._cot_video_player.video_fps
 
         # connect wrapper for signal
         self._cot_video_player.frame_updated.connect(self.frame_updated_wrapper)
 
+        # the jump range grows with a followed gps file
+        self._connect(self._gpsdata_handler.data_appended, self.update_jump_range)
+
+        # rows where the track ahead is straight and level, ranked on first use
+        self.keyframe_candidates = None
+        self.keyframe_candidate_position = -1
+        self._cot_video_player.prefetcher = FramePrefetcher(self._session_handler.session_data.video_file_path)
+        self._connect(self._gpsdata_handler.data_appended, self.reset_keyframe_candidates)
+
+        # frames are decoded in a separate process with COT_DECODER=process, see tools.decoder
+        self._cot_video_player.set_decoder_backend(os.environ.get("COT_DECODER", "capture"))
+
     def _setup_ui(self):
         # Set general Info
         self._widget.setWindowTitle("Video Player " + self._session_handler.session_data.video_file_path.split("/")[-1])
@@ -215,49 +426,141 @@ class VideoPlayerWidget(AbstractBaseWidget):
         jump_layout = QHBoxLayout()
 
         # Create sub widgets
-        last_timestamp = self._gpsdata_handler[-1].timestamp
-
         textfield1 = QLabel("Jump to:")
-        minimum_jump_tf = QLabel("0 ≤ ")
+        self.minimum_jump_tf = QLabel("0 ≤ ")
         self.jump_line_edit = QLineEdit("0")
-        maximum_jump_tf = QLabel(str(last_timestamp))
+        self.maximum_jump_tf = QLabel()
+        # jump by time in seconds, by distance along the track in kilometers or to the closest location
+        self.jump_mode_combobox = QComboBox()
+        self.jump_mode_combobox.addItems(["s", "km", "lat, lon"])
         jump_button = QPushButton("Jump")
 
-        self.jump_line_edit.setValidator(QIntValidator(0, last_timestamp, self._widget))
+        # decimal point regardless of the system locale, the text is converted with float
+        self.jump_validator = QDoubleValidator(0, 0, 2, self._widget)
+        self.jump_validator.setLocale(QLocale.c())
+        self.jump_line_edit.setValidator(self.jump_validator)
+        self.update_jump_range()
 
         # connect to signals
-        jump_button.clicked.connect(
-            lambda: self._gpsdata_handler.request_gpsdatum(
-                self._gpsdata_handler.closest_datum_by_timestamp(int(self.jump_line_edit.text()))
-                )
-            )
+        self.jump_mode_combobox.currentTextChanged.connect(self.change_jump_mode)
+        jump_button.clicked.connect(self.jump)
+        self.jump_line_edit.returnPressed.connect(self.jump)
 
         # add to layout
         jump_layout.addWidget(textfield1)
-        jump_layout.addWidget(minimum_jump_tf)
+        jump_layout.addWidget(self.minimum_jump_tf)
         jump_layout.addWidget(self.jump_line_edit)
-        jump_layout.addWidget(maximum_jump_tf)
+        jump_layout.addWidget(self.maximum_jump_tf)
+        jump_layout.addWidget(self.jump_mode_combobox)
         jump_layout.addWidget(jump_button)
 
         jump_widget.setLayout(jump_layout)
 
+        # Create widget to step through the best frames for a keyframe
+        candidate_widget = QWidget()
+        candidate_layout = QHBoxLayout()
+        previous_candidate_button = QPushButton("Previous Candidate")
+        next_candidate_button = QPushButton("Next Candidate")
+        self.keyframe_candidate_label = QLabel("Keyframe candidates, where the track is straight and level")
+        previous_candidate_button.clicked.connect(lambda: self.jump_to_keyframe_candidate(-1))
+        next_candidate_button.clicked.connect(lambda: self.jump_to_keyframe_candidate(1))
+        candidate_layout.addWidget(previous_candidate_button)
+        candidate_layout.addWidget(self.keyframe_candidate_label)
+        candidate_layout.addWidget(next_candidate_button)
+        candidate_widget.setLayout(candidate_layout)
+
+        # Create widget to show timings of hot paths, see tools.profiling
+        profiling_widget = QWidget()
+        profiling_layout = QHBoxLayout()
+
+        # shows the ground plane as seen from above, calibrated by the current keyframe
+        self.birdseye_checkbox = QCheckBox("Bird's-eye View")
+        self.birdseye_checkbox.setEnabled(False)
+        self.birdseye_checkbox.toggled.connect(self.update_birdseye)
+
+        # playback skips the time the train stands still
+        self.skip_stops_checkbox = QCheckBox("Skip Stops")
+        self.skip_stops_checkbox.toggled.connect(self.toggle_skip_stops)
+
+        # where frames are decoded, see COTVideoPlayer.set_decoder_backend
+        self.decoder_combobox = QComboBox()
+        self.decoder_combobox.addItem("Decode in GUI", "capture")
+        self.decoder_combobox.addItem("Decoder Process", "process")
+        self.decoder_combobox.setCurrentIndex(int(self._cot_video_player.decoder is not None))
+        self.decoder_combobox.currentIndexChanged.connect(self.change_decoder_backend)
+
+        self.profiling_checkbox = QCheckBox("Show Timings")
+        self.profiling_checkbox.setChecked(profiler.enabled)
+        self.profiling_checkbox.toggled.connect(self.toggle_profiling)
+        save_trace_button = QPushButton("Save Trace")
+        save_trace_button.clicked.connect(self.save_trace)
+
+        profiling_layout.addWidget(self.birdseye_checkbox)
+        profiling_layout.addWidget(self.skip_stops_checkbox)
+        profiling_layout.addWidget(self.decoder_combobox)
+        profiling_layout.addWidget(self.profiling_checkbox)
+        profiling_layout.addWidget(save_trace_button)
+        profiling_widget.setLayout(profiling_layout)
+
+        # overlay with rolling averages, refreshed while profiling
+        self.profiling_label = QLabel()
+        self.profiling_label.setStyleSheet("font-family: monospace")
+        self.profiling_label.setVisible(profiler.enabled)
+        self.profiling_timer = QTimer(self._widget)
+        self.profiling_timer.timeout.connect(self.update_profiling_label)
+        if profiler.enabled:
+            self.profiling_timer.start(500)
+
         # add button widget to UI
         general_layout.addWidget(button_widget)
         general_layout.addWidget(jump_widget)
+        general_layout.addWidget(candidate_widget)
+        general_layout.addWidget(profiling_widget)
+        general_layout.addWidget(self.profiling_label)
         self._widget.setLayout(general_layout)
         
 
         # configure jump widget with last possible timestamp in text and as limiter
 
     def react_to_keyframe_change(self, keyframe: KeyFrame):
+        # tracked keyframes are created without their frame
+        if keyframe.pixmap is None:
+            self.restore_keyframe_pixmaps([keyframe])
+        self.birdseye_checkbox.setEnabled(keyframe.intrinsics is not None)
+        self.update_birdseye()
         self.react_to_gpsdatum_change(keyframe.gps)
 
     def react_to_gpsdatum_change(self, gpsdatum: GPSDatum):
-        self.jump_line_edit.setText(str(gpsdatum.timestamp))
         self._cot_video_player.jump_to_gpsdatum(gpsdatum)
+        self.jump_line_edit.setText(self.jump_text(self._cot_video_player.current_timestamp_index))
+
+    def close(self) -> bool:
+        self._cot_video_player.prefetcher.stop()
+        self._cot_video_player.close_frame_source()
+        return super().close()
 
     ################################## Implementation of class methods ###########################################
 
+    def preload(self, video_capture: cv2.VideoCapture):
+        """ sets an already opened video to be used on initialization """
+        self._video_capture = video_capture
+
+    def restore_keyframe_pixmaps(self, keyframes: list):
+        """ reads the frames of keyframes restored without pixmap, e.g. from a session snapshot """
+        current_index = self._cot_video_player.current_timestamp_index
+        # the unscaled frame is only kept while frames are not rectified
+        birdseye = self._cot_video_player.birdseye
+        self._cot_video_player.birdseye = None
+
+        keyframe: KeyFrame
+        for keyframe in keyframes:
+            if keyframe.pixmap is None:
+                self._cot_video_player.jump_to_gpsdatum(keyframe.gps)
+                keyframe.pixmap = self._cot_video_player.pixmap_unscaled
+
+        self._cot_video_player.birdseye = birdseye
+        self._cot_video_player.jump_to_index(current_index)
+
     @Slot()
     def export_frame(self):
         """ Slot for export button, sends the current frames pixmap"""
@@ -269,6 +572,154 @@ class VideoPlayerWidget(AbstractBaseWidget):
 
         self._keyframe_handler.request_keyframe(keyframe)
 
+    @Slot()
+    def update_birdseye(self, _=None):
+        """ rectifies the video with the calibration of the current keyframe if enabled """
+        keyframe: KeyFrame = self._keyframe_handler.current_keyframe
+        birdseye = None
+        if self.birdseye_checkbox.isChecked() and keyframe is not None and keyframe.intrinsics is not None:
+            try:
+                birdseye = BirdsEyeView.from_keyframe(
+                    keyframe, self._cot_video_player.image_width, self._cot_video_player.image_height
+                )
+            except ValueError as exception:
+                print(f"{exception} Keyframe at {keyframe.gps.timestamp}s can not be used for a bird's-eye view.")
+
+        # frames are exported unrectified, but exporting what is not shown would be confusing
+        self.export_button.setDisabled(birdseye is not None)
+        self._cot_video_player.set_birdseye(birdseye)
+
+    @Slot(bool)
+    def toggle_skip_stops(self, enabled: bool):
+        """ lets playback and stepping jump over the rows inside of stops """
+        self._cot_video_player.skip_stops = enabled
+        if enabled:
+            stops = self._gpsdata_handler.stops
+            self.skip_stops_checkbox.setToolTip(f"{len(stops)} stops of at least {stops.min_duration}s")
+
+    @Slot(int)
+    def change_decoder_backend(self, _):
+        self._cot_video_player.set_decoder_backend(self.decoder_combobox.currentData())
+
+    def shutdown_decoder(self):
+        """ stops the decoder process, called by the main window before it closes """
+        self._cot_video_player.shutdown_decoder()
+
+    @Slot(bool)
+    def toggle_profiling(self, enabled: bool):
+        """ enables the profiler and shows its rolling averages """
+        profiler.enabled = enabled
+        self.profiling_label.setVisible(enabled)
+        if enabled:
+            self.profiling_timer.start(500)
+        else:
+            self.profiling_timer.stop()
+
+    @Slot()
+    def update_profiling_label(self):
+        """ shows rolling averages of all profiled sections in milliseconds and all gauges with their peak """
+        averages = profiler.averages()
+        lines = [
+            f"{name:<45} {average * 1000:>8.2f} ms (n={count})"
+            for name, (average, count) in sorted(averages.items())
+        ]
+        lines.extend(
+            f"{name:<45} {value:>8.2f} (peak {peak:.2f})"
+            for name, (value, peak) in sorted(profiler.gauges().items())
+        )
+        self.profiling_label.setText("\n".join(lines))
+
+    @Slot()
+    def save_trace(self):
+        """ saves profiled events as chrome trace next to saved keyframes """
+        path = f"{datetime.now().strftime('%y-%m-%d_%H-%M-%S')}_trace.json"
+        profiler.dump_chrome_trace(path)
+        print(f"Trace saved to {path}")
+
+    def jump_text(self, index: int) -> str:
+        """ position of the gps datum at index in the unit of the jump mode """
+        if self.jump_mode_combobox.currentText() == "km":
+            return f"{self._gpsdata_handler.distances[index] / 1000:.2f}"
+        if self.jump_mode_combobox.currentText() == "lat, lon":
+            gpsdatum: GPSDatum = self._gpsdata_handler[index]
+            return f"{gpsdatum.latitude:.5f}, {gpsdatum.longitude:.5f}"
+        return str(self._gpsdata_handler[index].timestamp)
+
+    @Slot()
+    def jump(self):
+        """ requests the gps datum closest to the entered time, distance or location """
+        if self.jump_mode_combobox.currentText() == "lat, lon":
+            try:
+                latitude, longitude = [float(value) for value in self.jump_line_edit.text().split(",")]
+            except ValueError:
+                print(f"{self.jump_line_edit.text()} is not a location, expected latitude, longitude")
+                return
+            self._gpsdata_handler.request_gpsdatum(
+                self._gpsdata_handler.closest_datum_by_coordinate(latitude, longitude)
+            )
+            return
+
+        value = float(self.jump_line_edit.text() or 0)
+        if self.jump_mode_combobox.currentText() == "km":
+            gpsdatum = self._gpsdata_handler.closest_datum_by_distance(value * 1000)
+        else:
+            gpsdatum = self._gpsdata_handler.closest_datum_by_timestamp(value)
+        self._gpsdata_handler.request_gpsdatum(gpsdatum)
+
+    @Slot(int)
+    def reset_keyframe_candidates(self, _= None):
+        """ candidates are ranked again on next use, e.g. after rows were appended """
+        self.keyframe_candidates = None
+        self.keyframe_candidate_position = -1
+
+    def jump_to_keyframe_candidate(self, step: int):
+        """ requests the next or previous of the best ranked keyframe candidates
+
+        Candidates are ranked on first use and their frames are read in the background.
+        """
+        if self.keyframe_candidates is None:
+            self.keyframe_candidates = self._gpsdata_handler.keyframe_candidates().tolist()
+            fps = self._cot_video_player.video_fps
+            self._cot_video_player.prefetcher.prefetch([
+                frame_number_at(fps, self._gpsdata_handler[index].timestamp) for index in self.keyframe_candidates
+            ])
+        if len(self.keyframe_candidates) == 0:
+            self.keyframe_candidate_label.setText("No straight and level track found")
+            return
+
+        count = len(self.keyframe_candidates)
+        if self.keyframe_candidate_position < 0:
+            self.keyframe_candidate_position = 0 if step > 0 else count - 1
+        else:
+            self.keyframe_candidate_position = (self.keyframe_candidate_position + step) % count
+        index = self.keyframe_candidates[self.keyframe_candidate_position]
+        self.keyframe_candidate_label.setText(
+            f"Candidate {self.keyframe_candidate_position + 1} of {count} "
+            f"at {self._gpsdata_handler.distances[index] / 1000:.2f} km"
+        )
+        self._gpsdata_handler.request_gpsdatum(self._gpsdata_handler[index])
+
+    @Slot(str)
+    def change_jump_mode(self, _):
+        """ shows range and current position in the unit of the new jump mode """
+        self.update_jump_range()
+        self.jump_line_edit.setText(self.jump_text(self._cot_video_player.current_timestamp_index))
+
+    @Slot(int)
+    def update_jump_range(self, _= None):
+        """ sets the jump range to the last timestamp or distance, e.g. after rows were appended """
+        # locations are not limited to a range
+        is_location = self.jump_mode_combobox.currentText() == "lat, lon"
+        self.minimum_jump_tf.setVisible(not is_location)
+        self.maximum_jump_tf.setVisible(not is_location)
+        self.jump_line_edit.setValidator(None if is_location else self.jump_validator)
+        if is_location:
+            return
+
+        maximum = float(self.jump_text(-1))
+        self.maximum_jump_tf.setText(str(maximum))
+        self.jump_validator.setTop(maximum)
+
     # internal Slots
     @Slot(int)
     def frame_updated_wrapper(self, gpsdatum: GPSDatum):
@@ -1,20 +1,34 @@
 """ main window that uses all other components in inheritance or instantiation """
 
+import os
 import sys
 
+from importlib import import_module
+
 from PySide6.QtWidgets import QApplication, QMainWindow, QMenuBar
-from PySide6.QtCore import Slot, Signal
+from PySide6.QtCore import Slot, Signal, QTimer
 from PySide6.QtGui import QCloseEvent
 
+from COTabc import AbstractBaseWidget
+from COTdataclasses import KeyFrame
 from tools.handler import GPSDataHandler, SessionHandler, KeyFrameHandler
+from tools.cache import GPSDataCache
+from tools.importer import ImportPipeline
+from tools.follower import GPSFileFollower
+from tools.watchdog import StallDetector
 
 from datawidgets.filepicker import FilePickerWidget
-from datawidgets.dataview import DataViewWidget
 
-from gpswidgets.linechartplotter import COTLineChartWidget
 
-from imgwidgets.imageeditor import ImageViewerWidget
-from imgwidgets.videoplayer import VideoPlayerWidget
+# windows in order of initialization with the module and class they are created from,
+# modules are imported on first use to keep OpenCV and pyqtgraph out of the startup
+WINDOW_CLASSES = {
+    "linechart": ("gpswidgets.linechartplotter", "COTLineChartWidget"),
+    # video player has to be initialized first of the following, it determines the image size
+    "videoplayer": ("imgwidgets.videoplayer", "VideoPlayerWidget"),
+    "image_editor": ("imgwidgets.imageeditor", "ImageViewerWidget"),
+    "dataview": ("datawidgets.dataview", "DataViewWidget")
+}
 
 
 class MainWindow(QMainWindow):
@@ -29,21 +43,29 @@ class MainWindow(QMainWindow):
         # create handler
         self._session_handler: SessionHandler = SessionHandler()
         self._filepicker = FilePickerWidget(self._session_handler, menubar)
-        self._gpsdata_handler: GPSDataHandler = GPSDataHandler()
-        self._keyframe_handler: KeyFrameHandler = KeyFrameHandler(menubar)
-
-
-        self._linechart_window: COTLineChartWidget = COTLineChartWidget()
-        self._videoplayer_window: VideoPlayerWidget = VideoPlayerWidget()
-        self._image_editor_window: ImageViewerWidget = ImageViewerWidget()
-        self._dataview_window: DataViewWidget = DataViewWidget()
-
-        self.active_windows = [
-            self._linechart_window,
-            self._videoplayer_window,
-            self._image_editor_window,
-            self._dataview_window
-        ]
+        self._gpsdata_handler: GPSDataHandler = GPSDataHandler(GPSDataCache())
+        self._keyframe_handler: KeyFrameHandler = KeyFrameHandler(menubar, self._gpsdata_handler)
+
+        # windows are created on first show, see _window
+        self.active_windows = {}
+        # video of the import the windows were created for
+        self._windows_video_capture = None
+
+        # loads data and video before the windows are created
+        self._import_pipeline = ImportPipeline(self._gpsdata_handler, self)
+        self._import_pipeline.progress.connect(self._filepicker.show_progress)
+        self._import_pipeline.stage_finished.connect(self._report_stage_timing)
+        self._import_pipeline.failed.connect(self._report_import_failure)
+        self._import_pipeline.cleaned.connect(self._report_cleaning)
+        self._import_pipeline.finished.connect(self._initialize_windows)
+        self._filepicker.cancel_requested.connect(self._import_pipeline.cancel)
+        self._restored = False
+
+        # appends rows of a gps file that is still recorded, started after the import
+        self._gps_follower = GPSFileFollower(self._gpsdata_handler, parent=self)
+
+        # image editor is not shown, it is created when the first keyframe is exported
+        self._keyframe_handler.keyframe_requested.connect(self._create_image_editor)
 
         # UI setup
         self.setWindowTitle("Main Window (Exit all on close)")
@@ -53,50 +75,123 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(self._filepicker)
 
-    def initialize(self):
-        """ initialize data and windows, if already initialized show windows if closed """
-
-        self._gpsdata_handler.read_csv_data(self._filepicker.gps_data_path)
+        # reports stalls of the event loop, enabled with COT_WATCHDOG=1 or COT_WATCHDOG=<threshold in ms>
+        self._stall_detector: StallDetector = None
+        watchdog = os.environ.get("COT_WATCHDOG", "0")
+        if watchdog not in ("", "0"):
+            threshold = 0.2 if watchdog == "1" else int(watchdog) / 1000
+            self._stall_detector = StallDetector(threshold, parent=self)
+            self._stall_detector.start()
+
+    def _window(self, name: str) -> AbstractBaseWidget:
+        """ returns window by name, creates and initializes it on first access """
+        if name not in self.active_windows:
+            module_name, class_name = WINDOW_CLASSES[name]
+            window: AbstractBaseWidget = getattr(import_module(module_name), class_name)()
+
+            if name == "videoplayer":
+                # hand over the video opened by the import pipeline
+                window.preload(self._import_pipeline.video_capture)
+
+            window.initialize(
+                self._session_handler,
+                self._gpsdata_handler,
+                self._keyframe_handler
+            )
+            self.active_windows[name] = window
+        return self.active_windows[name]
 
-        self._linechart_window.initialize(
-            self._session_handler,
-            self._gpsdata_handler,
-            self._keyframe_handler
-        )
-        self._linechart_window.show()
-
-        self._videoplayer_window.initialize(
-            self._session_handler,
-            self._gpsdata_handler,
-            self._keyframe_handler
-        )
-        self._videoplayer_window.show()
-
-        self._image_editor_window.initialize(
-            self._session_handler,
-            self._gpsdata_handler,
-            self._keyframe_handler
+    def initialize(self):
+        """ load data in the background and initialize windows afterwards, if already initialized show windows if closed """
+        if self._import_pipeline.is_running():
+            return
+        self._gps_follower.stop()
+
+        # restore from the binary snapshot of the last session if it belongs to the chosen files
+        self._restored = self._gpsdata_handler.file_path is None and \
+            self._session_handler.load_snapshot(self._gpsdata_handler, self._keyframe_handler)
+
+        self._import_pipeline.start_import(
+            self._filepicker.gps_data_path,
+            self._filepicker.video_path
         )
-        # don't show, shows itself, when first keyframe is exported
 
-        self._dataview_window.initialize(
-            self._session_handler,
-            self._gpsdata_handler,
-            self._keyframe_handler
-        )
-        self._dataview_window.show()
+    @Slot(str, float)
+    def _report_stage_timing(self, stage: str, duration: float):
+        print(f"Import stage {stage} finished in {duration:.3f}s")
+
+    @Slot(str)
+    def _report_import_failure(self, message: str):
+        print(f"Import failed: {message}")
+
+    @Slot(dict)
+    def _report_cleaning(self, statistics: dict):
+        print(f"GPS cleaning replaced {statistics['jumps']} jumps and {statistics['repeated fixes']} repeated fixes")
+        for name, before in statistics["before"].items():
+            print(f"    {name:<26} {before:>10.4g} -> {statistics['after'][name]:.4g}")
+
+    @Slot()
+    def _initialize_windows(self):
+        """ creates windows one after another, so the event loop can draw in between """
+        # an import of changed files opens the video again, windows of the previous files are created again
+        if self._import_pipeline.video_capture is not self._windows_video_capture:
+            self._release_windows()
+            self._windows_video_capture = self._import_pipeline.video_capture
+
+        if self._filepicker.follow_gps_data:
+            if self._import_pipeline.clean_gps:
+                # cleaning smooths over neighbouring rows, appended rows would not be cleaned
+                print("GPS data is cleaned on import, the gps file is not followed.")
+            else:
+                self._gps_follower.follow(self._filepicker.gps_data_path)
+
+        # video player first, the image size is needed by other windows
+        self._window("videoplayer").show()
+        QTimer.singleShot(0, lambda: self._window("linechart").show())
+        QTimer.singleShot(0, lambda: self._window("dataview").show())
+        QTimer.singleShot(0, self._initialize_keyframes)
+
+    @Slot()
+    def _initialize_keyframes(self):
+        if self._restored:
+            # restored keyframes only reference their frame, calibration is not repeated
+            self._window("videoplayer").restore_keyframe_pixmaps(self._keyframe_handler.data)
+            for keyframe in self._keyframe_handler.data:
+                self._keyframe_handler.request_keyframe(keyframe)
+            self._restored = False
+
+    @Slot(KeyFrame)
+    def _create_image_editor(self, keyframe: KeyFrame):
+        """ creates the image editor on the first requested keyframe """
+        self._keyframe_handler.keyframe_requested.disconnect(self._create_image_editor)
+        # the new window is connected after this keyframe was emitted, so it is passed on manually
+        self._window("image_editor").react_to_keyframe_change(keyframe)
+
+    def _release_windows(self):
+        """ closes all windows and disconnects them from the handlers, they are created again on next access """
+        # closed windows are only hidden, the decoder process and its shared memory have to be stopped
+        if "videoplayer" in self.active_windows:
+            self.active_windows["videoplayer"].shutdown_decoder()
+        if "image_editor" in self.active_windows:
+            # created again with the next requested keyframe
+            self._keyframe_handler.keyframe_requested.connect(self._create_image_editor)
+        for window in self.active_windows.values():
+            window.release()
+        self.active_windows.clear()
 
     def cleanup(self):
         """ cleanup to be called at closeEvent """
-        for window in self.active_windows:
-            if window is not None:
-                window.close()
-                window = None
+        self._release_windows()
 
     def closeEvent(self, event: QCloseEvent) -> None:
         """ extend innate closeEvent to cleanup windows """
+        self._import_pipeline.shutdown()
+        self._gps_follower.stop()
+        if self._stall_detector is not None:
+            self._stall_detector.stop()
         self.cleanup()
         self._session_handler.save()
+        self._session_handler.save_snapshot(self._gpsdata_handler, self._keyframe_handler)
 
         return super().closeEvent(event)
 
@@ -105,5 +200,5 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     w = MainWindow()
     w.show()
-    
+
     sys.exit(app.exec())
\ No newline at end of file
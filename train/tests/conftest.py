@@ -0,0 +1,97 @@
+""" Fixtures shared by the tests, run from the train directory with python -m pytest tests
+
+Tests import modules like the application does, relative to the train directory. The synthetic
+track heads north at about 20 m/s with one fix per second and has a stop of 60 seconds.
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+from PySide6.QtWidgets import QApplication
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# handlers are QObjects, widgets are never shown
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from tools.handler import seconds_to_tid
+
+
+# first and last row of the synthetic track with speed 0, the fix repeats from the following row on
+STOP_ROWS = (80, 140)
+
+
+@pytest.fixture
+def columns() -> dict:
+    """ gps columns as created by GPSDataHandler.to_columns, 200 rows with a stop """
+    row_count = 200
+    rng = np.random.default_rng(0)
+    timestamps = np.arange(row_count, dtype=np.float64)
+
+    speeds = np.full(row_count, 72.0)
+    speeds[STOP_ROWS[0]:STOP_ROWS[1] + 1] = 0
+    steps = speeds / 3.6 * (1 + rng.normal(0, 0.05, row_count))
+    steps[0] = 0
+    # the receiver repeats its fix while standing
+    steps[STOP_ROWS[0] + 1:STOP_ROWS[1] + 1] = 0
+    # latitude and longitude have the resolution of the csv file
+    latitudes = np.round(63.4 + np.cumsum(steps) / 111195, 5)
+    longitudes = np.round(10.4 + rng.normal(0, 2e-5, row_count), 5)
+    longitudes[STOP_ROWS[0] + 1:STOP_ROWS[1] + 1] = longitudes[STOP_ROWS[0]]
+
+    return {
+        "tid": seconds_to_tid(5 * 3600 + timestamps),
+        "timestamp": timestamps,
+        "latitude": latitudes,
+        "longitude": longitudes,
+        "speed": speeds,
+        "course": np.zeros(row_count, dtype=np.int64),
+        "altitude": np.round(10 + 0.02 * np.cumsum(steps) + rng.normal(0, 0.3, row_count), 2),
+        "gradient": np.zeros(row_count)
+    }
+
+
+def csv_lines(columns: dict) -> list:
+    """ rows of columns in the format of the gps csv files, without header """
+    return [
+        f"{tid},{round(latitude * 10**5)},{round(longitude * 10**5)},{round(speed * 100)},{course},{round(altitude * 100)}"
+        for tid, latitude, longitude, speed, course, altitude in zip(
+            columns["tid"].tolist(), columns["latitude"].tolist(), columns["longitude"].tolist(),
+            columns["speed"].tolist(), columns["course"].tolist(), columns["altitude"].tolist()
+        )
+    ]
+
+
+@pytest.fixture
+def gps_lines(columns) -> list:
+    """ rows of the synthetic track as lines of a gps csv file without header """
+    return csv_lines(columns)
+
+
+@pytest.fixture
+def gps_file(tmp_path, gps_lines) -> str:
+    """ gps csv file of the synthetic track """
+    path = tmp_path / "gps.csv"
+    path.write_text("\n".join(["tid,lat,lon,speed,course,alt"] + gps_lines) + "\n", encoding="ascii")
+    return str(path)
+
+
+@pytest.fixture
+def video_path(tmp_path) -> str:
+    """ video of 30 frames of 64x48 at 25 fps, each filled with its frame number """
+    path = str(tmp_path / "video.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("OpenCV can not write MJPG videos")
+    for frame_number in range(30):
+        writer.write(np.full((48, 64, 3), 8 * frame_number, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture(scope="session")
+def qapp() -> QApplication:
+    """ application for widgets and queued signals, events are processed explicitly """
+    return QApplication.instance() or QApplication([])
@@ -0,0 +1,77 @@
+""" persistent gps data cache """
+
+import os
+
+import numpy as np
+
+from tools.cache import GPSDataCache
+from tools.handler import GPSDataHandler
+
+
+def test_hit_returns_stored_columns(tmp_path, gps_file, columns):
+    cache = GPSDataCache(str(tmp_path / "cache"))
+    assert cache.load(gps_file, GPSDataHandler.column_names) is None
+
+    cache.store(gps_file, columns)
+    cached = cache.load(gps_file, GPSDataHandler.column_names)
+    for name in GPSDataHandler.column_names:
+        np.testing.assert_array_equal(cached[name], columns[name])
+    # variants are separate entries
+    assert cache.load(gps_file, GPSDataHandler.column_names, "cleaned") is None
+
+
+def test_handler_reads_from_cache(tmp_path, gps_file):
+    cache = GPSDataCache(str(tmp_path / "cache"))
+    parsed = GPSDataHandler(cache)
+    parsed.read_csv_data(gps_file)
+    assert cache.size() > 0
+
+    # entry is used instead of parsing the file again
+    cache.store(gps_file, {**parsed.columns, "altitude": parsed.columns["altitude"] + 1})
+    cached = GPSDataHandler(cache)
+    cached.read_csv_data(gps_file)
+    np.testing.assert_array_equal(cached.columns["altitude"], parsed.columns["altitude"] + 1)
+    assert len(cached) == len(parsed)
+
+
+def test_changed_file_and_invalidate_miss(tmp_path, gps_file, columns):
+    cache = GPSDataCache(str(tmp_path / "cache"))
+    cache.store(gps_file, columns)
+    entry_size = cache.size()
+
+    with open(gps_file, "a", encoding="ascii") as file:
+        file.write("5032000,6340000,1040000,7200,0,1000\n")
+    assert cache.load(gps_file, GPSDataHandler.column_names) is None
+
+    cache.store(gps_file, columns)
+    cache.invalidate(gps_file)
+    assert cache.load(gps_file, GPSDataHandler.column_names) is None
+    # only the entry of the old content is left
+    assert cache.size() == entry_size
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, gps_lines, columns):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"gps_{i}.csv"
+        path.write_text("\n".join(gps_lines[i:]) + "\n", encoding="ascii")
+        paths.append(str(path))
+
+    cache = GPSDataCache(str(tmp_path / "cache"))
+    cache.store(paths[0], columns)
+    entry_size = cache.size()
+    # room for two entries only
+    cache.max_size = int(2.5 * entry_size)
+
+    cache.store(paths[1], columns)
+    # mark the first entry as used after the second one
+    entry_path = os.path.join(cache.cache_dir, cache.key(paths[1]))
+    stat = os.stat(entry_path)
+    os.utime(entry_path, (stat.st_atime - 10, stat.st_mtime - 10))
+    assert cache.load(paths[0], GPSDataHandler.column_names) is not None
+
+    cache.store(paths[2], columns)
+    assert cache.size() <= cache.max_size
+    assert cache.load(paths[1], GPSDataHandler.column_names) is None
+    assert cache.load(paths[0], GPSDataHandler.column_names) is not None
+    assert cache.load(paths[2], GPSDataHandler.column_names) is not None
@@ -0,0 +1,90 @@
+""" camera parameters interpolated between keyframes """
+
+import numpy as np
+import pytest
+
+from COTdataclasses import ExtrinsicCameraParameters, IntrinsicCameraParameters, KeyFrame
+from tools.handler import CalibrationTimeline, GPSDataHandler, parse_gps_rows
+
+
+def _keyframe(gpsdatum, principal_length: float, tilt: float, pan: float) -> KeyFrame:
+    return KeyFrame(
+        gpsdatum, None, None,
+        IntrinsicCameraParameters(focal_length=0.035, principal_length=principal_length),
+        ExtrinsicCameraParameters(swing=0, tilt=tilt, pan=pan, x_offset=0, y_offset=0, z_offset=0)
+    )
+
+
+@pytest.fixture
+def gpsdata(gps_file) -> GPSDataHandler:
+    gpsdata = GPSDataHandler()
+    gpsdata.read_csv_data(gps_file)
+    return gpsdata
+
+
+def _assert_columns_equal(columns: dict, expected: dict):
+    assert columns.keys() == expected.keys()
+    for name in CalibrationTimeline.column_names:
+        np.testing.assert_allclose(columns[name], expected[name], err_msg=name)
+
+
+def test_incremental_updates_match_full_recompute(gpsdata):
+    keyframes = [
+        _keyframe(gpsdata[20], 10, 80, 170),
+        _keyframe(gpsdata[150], 14, 75, -170),
+        _keyframe(gpsdata[60], 12, 85, 0),
+        _keyframe(gpsdata[100], 11, 70, 10)
+    ]
+    incremental = CalibrationTimeline(gpsdata)
+    assert np.isnan(incremental.columns["swing"]).all()
+
+    changes = []
+    incremental.calibration_changed.connect(lambda start, end: changes.append((start, end)))
+    for keyframe in keyframes:
+        incremental.update_keyframe(keyframe)
+    # changed again
+    keyframes[2] = _keyframe(gpsdata[60], 13, 86, 5)
+    incremental.update_keyframe(keyframes[2])
+
+    full = CalibrationTimeline(gpsdata)
+    full.update_keyframes(keyframes)
+    _assert_columns_equal(incremental.columns, full.columns)
+
+    # only rows between the neighbouring keyframes were recomputed
+    assert changes[2] == (21, 150)
+    assert changes[3] == (61, 150)
+    assert changes[4] == (21, 100)
+
+
+def test_interpolation(gpsdata):
+    timeline = CalibrationTimeline(gpsdata)
+    timeline.update_keyframes([_keyframe(gpsdata[20], 10, 80, 170), _keyframe(gpsdata[60], 14, 70, -170)])
+    columns = timeline.columns
+
+    # held before the first and after the last keyframe
+    assert columns["principal_length"][0] == 10 and columns["principal_length"][199] == 14
+    assert columns["principal_length"][40] == pytest.approx(12)
+    assert columns["tilt"][40] == pytest.approx(75)
+    # pan turns along the shorter arc over 180 degrees
+    assert abs(columns["pan"][40]) == pytest.approx(180)
+    assert columns["pan"][30] == pytest.approx(175)
+
+    intrinsics, extrinsics = timeline.parameters_at(30)
+    assert intrinsics.principal_length == pytest.approx(11)
+    assert extrinsics.z_offset == pytest.approx(11 * np.sin(np.radians(77.5)))
+
+
+def test_appended_rows_match_full_recompute(gps_lines, gpsdata):
+    keyframes = [_keyframe(gpsdata[20], 10, 80, 170), _keyframe(gpsdata[60], 14, 70, -170)]
+    full = CalibrationTimeline(gpsdata)
+    full.update_keyframes(keyframes)
+
+    appended = GPSDataHandler()
+    data, first_seconds, last_timestamp = parse_gps_rows(gps_lines[:100])
+    appended.append_data(data)
+    timeline = CalibrationTimeline(appended)
+    timeline.update_keyframes(keyframes)
+    assert len(timeline.columns["swing"]) == 100
+
+    appended.append_data(parse_gps_rows(gps_lines[100:], first_seconds, last_timestamp)[0])
+    _assert_columns_equal(timeline.columns, full.columns)
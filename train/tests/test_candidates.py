@@ -0,0 +1,119 @@
+""" keyframe candidates where the track ahead is straight and level """
+
+from math import atan2, pi
+
+import numpy as np
+import pytest
+
+from tools.candidates import rank_keyframe_candidates, track_geometry
+from tools.math import cumulative_distance
+from tools.spatial import EARTH_RADIUS
+
+
+def _loop_geometry(columns: dict, distances: np.ndarray, window_length: float, spacing: float) -> dict:
+    """ window statistics of every row summed up directly, as reference for the cumulative sums """
+    latitudes = np.radians(columns["latitude"])
+    longitudes = np.radians(columns["longitude"])
+    x = (longitudes - longitudes.mean()) * np.cos(latitudes.mean()) * EARTH_RADIUS
+    y = (latitudes - latitudes.mean()) * EARTH_RADIUS
+    grid = np.arange(0, distances[-1], spacing)
+    grid_x = np.interp(grid, distances, x).tolist()
+    grid_y = np.interp(grid, distances, y).tolist()
+    grid_altitude = np.interp(grid, distances, columns["altitude"]).tolist()
+
+    segment_count = len(grid) - 1
+    headings = [atan2(grid_x[k + 1] - grid_x[k], grid_y[k + 1] - grid_y[k]) for k in range(segment_count)]
+    gradients = [(grid_altitude[k + 1] - grid_altitude[k]) / spacing for k in range(segment_count)]
+    window_segments = round(window_length / spacing)
+
+    geometry = {"turning": [], "gradient_mean": [], "gradient_deviation": []}
+    for distance in distances.tolist():
+        segment = min(int(distance / spacing), segment_count - 1)
+        if segment + window_segments > segment_count:
+            for column in geometry.values():
+                column.append(np.nan)
+            continue
+        window = range(segment, segment + window_segments)
+        turning = 0
+        for k in window[:-1]:
+            turn = headings[k + 1] - headings[k]
+            turning += abs((turn + pi) % (2 * pi) - pi)
+        window_gradients = [gradients[k] for k in window]
+        geometry["turning"].append(turning)
+        geometry["gradient_mean"].append(np.mean(window_gradients))
+        geometry["gradient_deviation"].append(np.std(window_gradients))
+    return {name: np.array(column) for name, column in geometry.items()}
+
+
+def _track(parts: list) -> dict:
+    """ columns of a track of parts (length in meters, turn in degrees per 100 m, gradient), a row every 10 m """
+    headings = []
+    gradients = []
+    for length, turn, gradient in parts:
+        steps = int(length / 10)
+        start = headings[-1] if headings else 0
+        headings.extend(start + np.radians(turn / 10) * np.arange(1, steps + 1))
+        gradients.extend([gradient] * steps)
+    headings = np.array(headings)
+    row_count = len(headings) + 1
+    north = np.concatenate(([0], np.cumsum(10 * np.cos(headings))))
+    east = np.concatenate(([0], np.cumsum(10 * np.sin(headings))))
+    return {
+        "timestamp": np.arange(row_count, dtype=np.float64),
+        "latitude": 63.4 + np.degrees(north / EARTH_RADIUS),
+        "longitude": 10.4 + np.degrees(east / (EARTH_RADIUS * np.cos(np.radians(63.4)))),
+        "altitude": 10 + np.concatenate(([0], np.cumsum(10 * np.array(gradients))))
+    }
+
+
+def _distances(columns: dict) -> np.ndarray:
+    return cumulative_distance(columns["latitude"], columns["longitude"], columns["timestamp"])
+
+
+@pytest.mark.parametrize("window_length, spacing", [(150, 10), (300, 25), (95, 10)])
+def test_window_statistics_match_loop(columns, window_length, spacing):
+    distances = _distances(columns)
+    geometry = track_geometry(columns, distances, window_length, spacing)
+    expected = _loop_geometry(columns, distances, window_length, spacing)
+
+    complete = np.isfinite(geometry["cost"])
+    assert complete.tolist() == np.isfinite(expected["turning"]).tolist()
+    # the last rows have no complete window ahead
+    assert complete[:100].all() and not complete[-1]
+    for name, column in expected.items():
+        np.testing.assert_allclose(geometry[name], column, rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+def test_short_track_has_no_candidates(columns):
+    short = {name: column[:5] for name, column in columns.items()}
+    geometry = track_geometry(short, _distances(short))
+    assert np.isinf(geometry["cost"]).all()
+    assert len(rank_keyframe_candidates(geometry["cost"], _distances(short))) == 0
+
+
+def test_candidates_are_straight_and_level():
+    # straight and level, curve, straight with a gradient, straight and level
+    columns = _track([(1000, 0, 0), (1000, 10, 0), (1000, 0, 0.02), (1000, 0, 0)])
+    distances = _distances(columns)
+    geometry = track_geometry(columns, distances)
+    candidates = rank_keyframe_candidates(geometry["cost"], distances, count=8)
+
+    assert len(candidates) == 8
+    # the window ahead of every candidate lies on one of the straight and level parts,
+    # distances along the curve are a little shorter than along the grid of 10 m
+    for distance in distances[candidates].tolist():
+        assert distance <= 1000 - 150 + 10 or 3000 - 10 <= distance <= 4000 - 150 + 10
+    curve_or_gradient = (distances > 1000) & (distances < 3000 - 150)
+    assert geometry["cost"][candidates].max() < geometry["cost"][curve_or_gradient].min()
+    assert np.all(np.diff(geometry["cost"][candidates]) >= 0)
+    chosen = np.sort(distances[candidates])
+    assert np.all(np.diff(chosen) >= 150)
+
+    assert rank_keyframe_candidates(geometry["cost"], distances, count=3).tolist() == candidates[:3].tolist()
+
+
+def test_row_blocked_in_its_stretch_is_still_chosen():
+    # the best row of 150 to 300 m is too close to the best row, the second best is not
+    cost = np.array([0, 1, 2, np.inf])
+    distances = np.array([140, 160, 295, 600])
+    assert rank_keyframe_candidates(cost, distances, separation=150).tolist() == [0, 2]
@@ -0,0 +1,64 @@
+""" cleaning of jumps, repeated fixes and altitude noise """
+
+import numpy as np
+import pytest
+
+from tools.cleaning import clean_columns, flag_duplicates, flag_jumps, savitzky_golay
+
+
+def test_clean_track_is_not_flagged(columns):
+    assert not flag_jumps(columns).any()
+    # the standing train repeats its position
+    assert not flag_duplicates(columns).any()
+
+
+def test_jumps_are_flagged(columns):
+    columns["latitude"][30] += 0.01
+    columns["longitude"][120] += 0.01
+    columns["latitude"][0] += 0.01
+    assert np.flatnonzero(flag_jumps(columns)).tolist() == [30, 120]
+
+
+def test_repeated_fixes_are_flagged(columns):
+    columns["latitude"][21] = columns["latitude"][20]
+    columns["longitude"][21] = columns["longitude"][20]
+    assert np.flatnonzero(flag_duplicates(columns)).tolist() == [21]
+
+
+def test_clean_columns_moves_flagged_rows_onto_the_track(columns):
+    expected = columns["latitude"][30]
+    columns["latitude"][30] += 0.01
+    columns["latitude"][51] = columns["latitude"][50]
+    columns["longitude"][51] = columns["longitude"][50]
+
+    cleaned, statistics = clean_columns(columns)
+    assert (statistics["jumps"], statistics["repeated fixes"]) == (1, 1)
+    assert cleaned["latitude"][30] == pytest.approx(expected, abs=1e-4)
+    assert cleaned["latitude"][50] < cleaned["latitude"][51] < cleaned["latitude"][52]
+    assert statistics["after"]["impossible steps"] == 0 < statistics["before"]["impossible steps"]
+    assert statistics["after"]["altitude roughness [m]"] < statistics["before"]["altitude roughness [m]"]
+    # input columns are not changed
+    assert columns["latitude"][30] == pytest.approx(expected + 0.01)
+
+
+def test_savitzky_golay_keeps_polynomials():
+    positions = np.arange(50, dtype=np.float64)
+    values = 3 - 0.5 * positions + 0.02 * positions**2
+    np.testing.assert_allclose(savitzky_golay(values, 11, 2), values, atol=1e-9)
+    np.testing.assert_allclose(savitzky_golay(values[:7], 11, 2), values[:7])
+
+
+def test_savitzky_golay_smooths_noise():
+    rng = np.random.default_rng(0)
+    values = np.linspace(0, 10, 200)
+    noisy = values + rng.normal(0, 0.5, 200)
+    assert np.abs(savitzky_golay(noisy) - values).std() < 0.5 * np.abs(noisy - values).std()
+
+
+def test_savitzky_golay_rejects_invalid_windows():
+    with pytest.raises(ValueError):
+        savitzky_golay(np.zeros(50), 14, 2)
+    with pytest.raises(ValueError):
+        savitzky_golay(np.zeros(50), 3, 3)
+    # too few values to fit the polynomial
+    np.testing.assert_array_equal(savitzky_golay(np.arange(3.0), 15, 2), np.arange(3.0))
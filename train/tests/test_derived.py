@@ -0,0 +1,69 @@
+""" derived gps columns """
+
+from math import atan2
+
+import numpy as np
+import pytest
+
+from tools.derived import gradients
+from tools.handler import GPSDataHandler, parse_gps_rows
+from tools.math import distance_between_geo_coordinates
+
+
+def _loop_gradients(latitudes, longitudes, altitudes) -> list:
+    """ gradients row by row, as GPSDataHandler.add_gradient computed them before """
+    row_count = len(latitudes)
+    result = []
+    for i in range(row_count):
+        if i == 0 or i == row_count - 1:
+            result.append(0)
+            continue
+        step_gradients = []
+        for j in (i - 1, i):
+            distance = distance_between_geo_coordinates(
+                latitudes[j], longitudes[j], latitudes[j + 1], longitudes[j + 1]
+            )
+            if distance > 0:
+                step_gradients.append(atan2(altitudes[j + 1] - altitudes[j], distance))
+        result.append(sum(step_gradients) / len(step_gradients) if step_gradients else 0)
+    return result
+
+
+def test_gradients_match_loop(columns):
+    latitudes, longitudes, altitudes = columns["latitude"], columns["longitude"], columns["altitude"]
+    expected = _loop_gradients(latitudes.tolist(), longitudes.tolist(), altitudes.tolist())
+
+    np.testing.assert_allclose(gradients(latitudes, longitudes, altitudes), expected, rtol=1e-9, atol=1e-12)
+    # rows of the stop have no step but the first and last one
+    assert np.count_nonzero(gradients(latitudes, longitudes, altitudes)[81:140]) == 0
+    assert gradients(latitudes[:2], longitudes[:2], altitudes[:2]).tolist() == [0, 0]
+
+
+def test_appended_rows_match_full_data(gps_lines, gps_file):
+    full = GPSDataHandler()
+    full.read_csv_data(gps_file)
+
+    appended = GPSDataHandler()
+    data, first_seconds, last_timestamp = parse_gps_rows(gps_lines[:120])
+    appended.append_data(data)
+    appended.append_data(parse_gps_rows(gps_lines[120:], first_seconds, last_timestamp)[0])
+
+    np.testing.assert_allclose(appended.columns["gradient"], full.columns["gradient"])
+    assert [datum.gradient for datum in appended.data] == pytest.approx(full.columns["gradient"].tolist())
+
+
+def test_acceleration_in_meters_per_second_squared():
+    gpsdata = GPSDataHandler()
+    gpsdata.from_columns({
+        "tid": np.arange(10) * 100 + 5000000,
+        "timestamp": np.arange(10, dtype=np.float64),
+        "latitude": np.full(10, 63.4),
+        "longitude": np.full(10, 10.4),
+        # 3.6 km/h faster every second
+        "speed": np.arange(10) * 3.6,
+        "course": np.zeros(10, dtype=np.int64),
+        "altitude": np.zeros(10),
+        "gradient": np.zeros(10)
+    }, None)
+
+    np.testing.assert_allclose(gpsdata.column("acceleration"), 1)
@@ -0,0 +1,98 @@
+""" rows appended to a gps file that is still written """
+
+import time
+
+import pytest
+
+import tools.follower
+from tools.follower import GPSFileFollower
+from tools.handler import GPSDataHandler, parse_gps_rows, seconds_to_tid
+
+
+def _row(seconds: int) -> str:
+    """ line continuing the synthetic track """
+    return f"{seconds_to_tid(5 * 3600 + seconds)},6350000,1040000,7200,0,1200\n"
+
+
+def _wait_for(qapp, condition) -> None:
+    """ processes events until condition holds, rows are appended in the gui thread """
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "rows were not appended in time"
+        qapp.processEvents()
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def parsed_line_counts(monkeypatch) -> list:
+    """ number of lines of every call of parse_gps_rows by the follower """
+    counts = []
+
+    def counting_parse_gps_rows(lines, *args):
+        counts.append(len(lines))
+        return parse_gps_rows(lines, *args)
+
+    monkeypatch.setattr(tools.follower, "parse_gps_rows", counting_parse_gps_rows)
+    return counts
+
+
+def test_imported_file_is_continued(qapp, gps_file, parsed_line_counts):
+    gpsdata = GPSDataHandler()
+    gpsdata.read_csv_data(gps_file)
+    follower = GPSFileFollower(gpsdata, interval=0.01)
+    follower.follow(gps_file)
+    try:
+        with open(gps_file, "a", encoding="ascii") as file:
+            file.write(_row(200))
+        _wait_for(qapp, lambda: len(gpsdata) == 201)
+        # the imported rows are not parsed again
+        assert parsed_line_counts[0] == 1
+        assert gpsdata[-1].timestamp == 200
+        assert gpsdata.is_current(gps_file)
+
+        # a partially written line is read once it is complete
+        line = _row(201)
+        with open(gps_file, "a", encoding="ascii") as file:
+            file.write(line[:10])
+        # a few polls pass without a complete line
+        time.sleep(0.05)
+        qapp.processEvents()
+        assert len(gpsdata) == 201 and not gpsdata.is_current(gps_file)
+        with open(gps_file, "a", encoding="ascii") as file:
+            file.write(line[10:])
+        _wait_for(qapp, lambda: len(gpsdata) == 202)
+        assert gpsdata[-1].timestamp == 201
+        assert gpsdata.is_current(gps_file)
+    finally:
+        follower.stop()
+
+
+def test_partial_line_of_import_is_read_again(qapp, gps_file):
+    gpsdata = GPSDataHandler()
+    gpsdata.read_csv_data(gps_file)
+    size = gpsdata.file_stat[0]
+    line = _row(200)
+    with open(gps_file, "a", encoding="ascii") as file:
+        file.write(line)
+    # the import ended within the appended line
+    gpsdata.file_stat = (size + 10, gpsdata.file_stat[1])
+
+    follower = GPSFileFollower(gpsdata, interval=0.01)
+    follower.follow(gps_file)
+    try:
+        _wait_for(qapp, lambda: len(gpsdata) == 201)
+        assert gpsdata.is_current(gps_file)
+    finally:
+        follower.stop()
+
+
+def test_other_file_is_read_from_the_start(qapp, gps_file):
+    gpsdata = GPSDataHandler()
+    follower = GPSFileFollower(gpsdata, interval=0.01)
+    follower.follow(gps_file)
+    try:
+        _wait_for(qapp, lambda: len(gpsdata) == 200)
+        assert gpsdata[0].timestamp == 0
+        assert gpsdata.is_current(gps_file)
+    finally:
+        follower.stop()
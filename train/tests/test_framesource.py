@@ -0,0 +1,112 @@
+""" choosing frame sources by their cost model and frame stores """
+
+import numpy as np
+
+from tools.framesource import (FFmpegPipeFrameSource, FrameSource, ImageDirectoryFrameSource, MemmapFrameSource,
+                               OpenCVFrameSource, available_frame_sources, frame_store_directory, open_frame_source,
+                               select_frame_source, write_frame_store)
+
+
+class _CostModelSource(FrameSource):
+    """ source with the costs of source_class that reads no frames """
+
+    def __init__(self, source_class: type, resolution: tuple, frame_numbers=None) -> None:
+        super().__init__(25, 1000, resolution)
+        self.name = source_class.name
+        self.sequential_cost = source_class.sequential_cost
+        self.random_access_cost = source_class.random_access_cost
+        self.seek_overhead = source_class.seek_overhead
+        self.frame_numbers = frame_numbers
+
+    def read(self, frame_number: int, out: np.ndarray = None) -> np.ndarray:
+        return None
+
+    def contains(self, frame_numbers) -> bool:
+        if self.frame_numbers is None:
+            return super().contains(frame_numbers)
+        return bool(np.all(np.isin(frame_numbers, self.frame_numbers)))
+
+
+def _selected(sources: list, *args, **kwargs) -> str:
+    source = select_frame_source(sources, *args, **kwargs)
+    return source.name if source is not None else None
+
+
+def test_decoders_by_access_pattern():
+    sources = [
+        _CostModelSource(OpenCVFrameSource, (960, 540)),
+        _CostModelSource(FFmpegPipeFrameSource, (960, 540))
+    ]
+    # OpenCV decodes sequentially faster, ffmpeg seeks faster
+    assert _selected(sources, 1) == "opencv"
+    assert _selected(sources, 5) == "opencv"
+    assert _selected(sources, 10) == "ffmpeg"
+    assert _selected(sources, None) == "ffmpeg"
+    # ties go to the first source
+    same_costs = _CostModelSource(OpenCVFrameSource, (960, 540))
+    assert select_frame_source([sources[0], same_costs], 1) is sources[0]
+
+
+def test_stores_only_for_their_frames_and_resolution():
+    frame_numbers = np.arange(0, 1000, 25)
+    sources = [
+        _CostModelSource(OpenCVFrameSource, (960, 540)),
+        _CostModelSource(ImageDirectoryFrameSource, (960, 540), frame_numbers),
+        _CostModelSource(MemmapFrameSource, (480, 270), frame_numbers)
+    ]
+    assert _selected(sources, 25, frame_numbers) == "images"
+    assert _selected(sources, 1, frame_numbers) == "opencv"
+    # not every frame is stored
+    assert _selected(sources, 25, np.arange(0, 1000, 10)) == "opencv"
+    assert _selected(sources, 25, frame_numbers, (480, 270)) == "memmap"
+    assert _selected(sources, 25, np.arange(0, 1000, 10), (480, 270)) is None
+    assert _selected([], 25) is None
+
+
+def test_max_skip_follows_costs():
+    assert _CostModelSource(OpenCVFrameSource, (1920, 1080)).max_skip() == 13
+    assert _CostModelSource(FFmpegPipeFrameSource, (1920, 1080)).max_skip() == 3
+    assert _CostModelSource(MemmapFrameSource, (1920, 1080), []).max_skip() == 1
+
+
+def test_frame_store_round_trip(video_path):
+    frame_numbers = np.arange(0, 30, 4)
+    with OpenCVFrameSource(video_path) as video:
+        expected = [video.read(frame_number) for frame_number in frame_numbers.tolist()]
+        assert write_frame_store(video, frame_store_directory(video_path), frame_numbers) == len(frame_numbers)
+
+    with MemmapFrameSource(frame_store_directory(video_path)) as store:
+        assert store.native_resolution == (64, 48)
+        assert store.contains(frame_numbers) and not store.contains([1])
+        for frame_number, frame in zip(frame_numbers.tolist(), expected):
+            np.testing.assert_array_equal(store.read(frame_number), frame)
+        assert store.read(1) is None
+
+    with open_frame_source(video_path, 4, frame_numbers) as source:
+        assert isinstance(source, MemmapFrameSource)
+    with open_frame_source(video_path, 1, np.arange(30)) as source:
+        assert not isinstance(source, MemmapFrameSource)
+
+
+def test_stores_of_every_format_are_kept(video_path):
+    directory = frame_store_directory(video_path)
+    with OpenCVFrameSource(video_path) as video:
+        write_frame_store(video, directory, np.arange(0, 30, 4), "memmap")
+        write_frame_store(video, directory, np.arange(0, 30, 2), "jpg", 0.5)
+        write_frame_store(video, directory, [3, 5], "png")
+        # writing a store again replaces its frames
+        write_frame_store(video, directory, [1, 7], "png")
+
+    sources = available_frame_sources(video_path)
+    stores = sources[-3:]
+    try:
+        assert [(store.store_format, store.native_resolution) for store in stores] == [
+            ("memmap", (64, 48)), ("jpg", (32, 24)), ("png", (64, 48))
+        ]
+        assert stores[0].frame_numbers.tolist() == list(range(0, 30, 4))
+        assert stores[1].frame_numbers.tolist() == list(range(0, 30, 2))
+        assert stores[2].frame_numbers.tolist() == [1, 7]
+        assert stores[1].read(2).shape == (24, 32, 3)
+    finally:
+        for source in sources:
+            source.close()
@@ -0,0 +1,117 @@
+""" staged import of gps data and video """
+
+import threading
+
+import pytest
+
+from tools.handler import GPSDataHandler, SessionHandler, KeyFrameHandler, seconds_to_tid
+from tools.importer import ImportPipeline
+
+
+class _BlockedVideoPipeline(ImportPipeline):
+    """ pipeline whose video stage waits until released, to cancel an import deterministically """
+
+    def __init__(self, gpsdata_handler: GPSDataHandler) -> None:
+        super().__init__(gpsdata_handler, clean_gps=False)
+        self.release_video = threading.Event()
+
+    def _open_video(self, cancel_event: threading.Event, video_file_path: str) -> tuple:
+        self.release_video.wait()
+        return super()._open_video(cancel_event, video_file_path)
+
+
+def _import(qapp, pipeline: ImportPipeline, gps_file: str, video_path: str) -> list:
+    """ runs an import to the end, returns the messages of progress """
+    messages = []
+    pipeline.progress.connect(lambda _, message: messages.append(message))
+    pipeline.start_import(gps_file, video_path)
+    pipeline.wait()
+    # results are applied with a queued signal
+    qapp.processEvents()
+    return messages
+
+
+def _append_rows(gps_file: str, count: int) -> None:
+    """ appends rows continuing the synthetic track, one per second """
+    with open(gps_file, "a", encoding="ascii") as file:
+        for i in range(count):
+            file.write(f"{seconds_to_tid(5 * 3600 + 200 + i)},6350000,1040000,7200,0,1200\n")
+
+
+@pytest.fixture
+def pipeline(qapp):
+    pipeline = ImportPipeline(GPSDataHandler(), clean_gps=False)
+    yield pipeline
+    pipeline.shutdown()
+
+
+def test_import(qapp, pipeline, gps_file, video_path):
+    gpsdata = pipeline._gpsdata_handler
+    assert _import(qapp, pipeline, gps_file, video_path)[-1] == "Done"
+    assert len(gpsdata) == 200 and gpsdata.file_path == gps_file
+    assert pipeline.video_properties == {"fps": 25, "width": 64, "height": 48, "frame_count": 30}
+    assert set(pipeline.timings) == set(ImportPipeline.stage_names)
+
+    assert _import(qapp, pipeline, gps_file, video_path)[-1] == "Unchanged"
+    assert len(gpsdata) == 200
+
+
+def test_changed_file_is_imported_again(qapp, pipeline, gps_file, video_path):
+    gpsdata = pipeline._gpsdata_handler
+    _import(qapp, pipeline, gps_file, video_path)
+
+    _append_rows(gps_file, 9)
+    assert _import(qapp, pipeline, gps_file, video_path)[-1] == "Done"
+    assert len(gpsdata) == 209
+    assert gpsdata[-1].timestamp == 208
+    assert gpsdata.is_current(gps_file)
+
+
+def test_restored_data_is_kept_until_the_file_changes(qapp, tmp_path, gps_file, video_path):
+    # snapshot of the session before the import
+    session = SessionHandler()
+    session.initialize(video_path, gps_file, 64, 48)
+    parsed = GPSDataHandler()
+    parsed.read_csv_data(gps_file)
+    path = str(tmp_path / "session_data.npz")
+    session.save_snapshot(parsed, KeyFrameHandler(), path)
+
+    gpsdata = GPSDataHandler()
+    assert session.load_snapshot(gpsdata, KeyFrameHandler(), path)
+    restored = gpsdata.data
+    pipeline = ImportPipeline(gpsdata, clean_gps=False)
+    try:
+        _import(qapp, pipeline, gps_file, video_path)
+        # the gps file was not parsed again
+        assert gpsdata.data is restored
+
+        _append_rows(gps_file, 9)
+        _import(qapp, pipeline, gps_file, video_path)
+        assert len(gpsdata) == 209
+    finally:
+        pipeline.shutdown()
+
+    # the snapshot belongs to the previous content
+    assert not session.load_snapshot(GPSDataHandler(), KeyFrameHandler(), path)
+
+
+def test_cancelled_import_keeps_previous_data(qapp, gps_file, video_path):
+    gpsdata = GPSDataHandler()
+    pipeline = _BlockedVideoPipeline(gpsdata)
+    cancelled = []
+    pipeline.cancelled.connect(lambda: cancelled.append(True))
+    try:
+        pipeline.start_import(gps_file, video_path)
+        assert pipeline.is_running()
+        pipeline.cancel()
+        pipeline.release_video.set()
+        pipeline.wait()
+        qapp.processEvents()
+        assert cancelled == [True]
+        assert len(gpsdata) == 0 and pipeline.video_capture is None
+
+        # the same files are imported, the cancelled import does not count as done
+        assert _import(qapp, pipeline, gps_file, video_path)[-1] == "Done"
+        assert len(gpsdata) == 200
+    finally:
+        pipeline.shutdown()
@@ -0,0 +1,20 @@
+""" frame numbers of timestamps """
+
+import numpy as np
+
+from tools.math import frame_number_at
+
+
+def test_frame_number_is_rounded():
+    # 1.16 s at 25 fps is 28.999999999999996 frames
+    assert frame_number_at(25, 1.16) == 29
+    assert frame_number_at(25, 0.119) == 3
+    assert frame_number_at(25, 0.1) == 2
+    assert isinstance(frame_number_at(25, 1.16), int)
+
+
+def test_arrays_match_scalars():
+    timestamps = np.round(np.arange(0, 60, 0.01), 2)
+    frame_numbers = frame_number_at(29.97, timestamps)
+    assert frame_numbers.dtype == np.int64
+    assert frame_numbers.tolist() == [frame_number_at(29.97, timestamp) for timestamp in timestamps.tolist()]
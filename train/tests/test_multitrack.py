@@ -0,0 +1,94 @@
+""" recordings of the same line aligned by distance """
+
+import os
+
+import numpy as np
+import pytest
+
+from tools.handler import GPSDataHandler, MultiTrackHandler
+from tools.math import cumulative_distance, distances_between_geo_coordinates
+from tools.spatial import SpatialIndex
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+SEASONS = ("spring", "summer", "fall", "winter")
+
+
+def _straight_track(row_count: int, lateral_noise: float, seed: int) -> dict:
+    """ columns of a track heading north with a row every 10 m, positions scattered sideways """
+    rng = np.random.default_rng(seed)
+    north = 10 * np.arange(row_count, dtype=np.float64)
+    east = rng.normal(0, lateral_noise, row_count)
+    return {
+        "tid": np.arange(row_count) + 5000000,
+        "timestamp": np.arange(row_count, dtype=np.float64),
+        "latitude": 63.4 + np.degrees(north / 6371000),
+        "longitude": 10.4 + np.degrees(east / (6371000 * np.cos(np.radians(63.4)))),
+        "speed": np.full(row_count, 36.0),
+        "course": np.zeros(row_count, dtype=np.int64),
+        "altitude": np.zeros(row_count),
+        "gradient": np.zeros(row_count)
+    }
+
+
+def test_longer_measured_track_is_aligned():
+    tracks = MultiTrackHandler()
+    for name, lateral_noise in (("reference", 0), ("noisy", 3)):
+        gpsdata = GPSDataHandler()
+        gpsdata.from_columns(_straight_track(2000, lateral_noise, 1), None)
+        tracks.tracks[name] = gpsdata
+    reference = tracks.tracks["reference"].columns
+    tracks.distances["reference"] = cumulative_distance(reference["latitude"], reference["longitude"])
+
+    noisy = tracks.tracks["noisy"].columns
+    distances = cumulative_distance(noisy["latitude"], noisy["longitude"])
+    # the zigzag makes the track measure about 8 percent longer
+    assert distances[-1] > 1.05 * tracks.distances["reference"][-1]
+    aligned = tracks._align(distances, noisy["latitude"], noisy["longitude"])
+
+    # rows at anchors every 1000 m lie next to the reference rows with the same index,
+    # between anchors the excess length of the zigzag is spread evenly
+    reference_distances = tracks.distances["reference"]
+    anchor_rows = np.searchsorted(reference_distances, np.arange(0, reference_distances[-1], 1000))
+    np.testing.assert_allclose(aligned[anchor_rows], reference_distances[anchor_rows])
+    last_anchor = anchor_rows[-1]
+    np.testing.assert_allclose(aligned[:last_anchor], reference_distances[:last_anchor], atol=25)
+    # behind the last anchor distances continue unscaled
+    np.testing.assert_allclose(aligned[last_anchor:] - aligned[last_anchor], distances[last_anchor:] - distances[last_anchor])
+    assert np.all(np.diff(aligned) >= 0)
+
+
+@pytest.mark.skipif(
+    not all(os.path.isfile(os.path.join(DATA_DIRECTORY, f"gps_{season}.csv")) for season in SEASONS),
+    reason="season recordings are not available"
+)
+def test_seasons_are_aligned():
+    tracks = MultiTrackHandler()
+    tracks.load({season: os.path.join(DATA_DIRECTORY, f"gps_{season}.csv") for season in SEASONS})
+    assert tracks.reference == "spring"
+    for distances in tracks.distances.values():
+        assert np.all(np.diff(distances) >= 0)
+
+    reference = tracks.tracks["spring"].columns
+    indices = {
+        season: SpatialIndex(tracks.tracks[season].columns["latitude"], tracks.tracks[season].columns["longitude"])
+        for season in SEASONS[1:]
+    }
+    checked = 0
+    for distance in np.arange(0, tracks.distances["spring"][-1], 5000).tolist():
+        rows = tracks.rows_at_distance(distance)
+        # within a gap of the reference recording its next row lies farther ahead
+        if tracks.distances["spring"][rows["spring"]] - distance > 50:
+            continue
+        latitude = reference["latitude"][rows["spring"]]
+        longitude = reference["longitude"][rows["spring"]]
+        for season in SEASONS[1:]:
+            # the other recordings have gaps too, there is nothing to align to without a fix close by
+            if indices[season].nearest(latitude, longitude)[1] > 50:
+                continue
+            columns = tracks.tracks[season].columns
+            gap = distances_between_geo_coordinates(
+                latitude, longitude, columns["latitude"][rows[season]], columns["longitude"][rows[season]]
+            )
+            assert gap < 150, f"{season} at {distance} m"
+            checked += 1
+    assert checked > 400
@@ -0,0 +1,41 @@
+""" parsing rows of gps csv files """
+
+import pytest
+
+from tools.handler import parse_gps_rows, seconds_to_tid, tid_to_seconds
+
+
+def test_rows_are_converted(gps_lines, columns):
+    data, first_seconds, last_timestamp = parse_gps_rows(gps_lines)
+
+    assert first_seconds == 5 * 3600
+    assert last_timestamp == 199
+    assert [datum.timestamp for datum in data] == columns["timestamp"].tolist()
+    assert data[10].latitude == pytest.approx(columns["latitude"][10])
+    assert data[10].longitude == pytest.approx(columns["longitude"][10])
+    assert data[10].speed == 72
+    assert data[10].altitude == pytest.approx(columns["altitude"][10])
+
+
+def test_repeated_and_out_of_order_fixes_are_skipped(gps_lines, capsys):
+    lines = gps_lines[:5] + [gps_lines[4], gps_lines[4], gps_lines[2]] + gps_lines[5:10]
+    data, _, last_timestamp = parse_gps_rows(lines)
+
+    assert [datum.timestamp for datum in data] == list(range(10))
+    assert last_timestamp == 9
+    assert "3 repeated or out of order fixes were skipped" in capsys.readouterr().out
+
+
+def test_parsing_continues_after_previous_lines(gps_lines, capsys):
+    head, first_seconds, last_timestamp = parse_gps_rows(gps_lines[:50])
+    # a file that is still being recorded is read again from an earlier line
+    tail, _, _ = parse_gps_rows(gps_lines[40:], first_seconds, last_timestamp, first_line=41)
+
+    assert [datum.timestamp for datum in head + tail] == list(range(200))
+    # rows that were parsed before are not reported
+    assert "skipped" not in capsys.readouterr().out
+
+
+def test_time_ids():
+    assert tid_to_seconds(12345678) == pytest.approx(12 * 3600 + 34 * 60 + 56.78)
+    assert seconds_to_tid(12 * 3600 + 34 * 60 + 56.78) == 12345678
@@ -0,0 +1,86 @@
+""" round trip of the binary session snapshot """
+
+import os
+
+import numpy as np
+
+from COTdataclasses import ExtrinsicCameraParameters, ImagePointContainer, IntrinsicCameraParameters, KeyFrame
+from tools.handler import GPSDataHandler, KeyFrameHandler, SessionHandler
+
+
+def _session(tmp_path, gps_file) -> tuple:
+    session = SessionHandler()
+    session.initialize(str(tmp_path / "video.mp4"), gps_file, 960, 540)
+    session.session_data.video_fps = 25
+    gpsdata_handler = GPSDataHandler()
+    gpsdata_handler.read_csv_data(gps_file)
+    return session, gpsdata_handler, KeyFrameHandler(None, gpsdata_handler)
+
+
+def test_round_trip(tmp_path, gps_file):
+    session, gpsdata_handler, keyframe_handler = _session(tmp_path, gps_file)
+    calibrated = KeyFrame(
+        gpsdata_handler[10], None,
+        ImagePointContainer([100, 500], [400, 300], [560, 300], [860, 500]),
+        IntrinsicCameraParameters(focal_length=0.035, principal_length=12.5),
+        ExtrinsicCameraParameters(swing=0.5, tilt=80.0, pan=-1.5, x_offset=0.2, y_offset=0, z_offset=3.1)
+    )
+    keyframe_handler.add_keyframe(calibrated)
+    keyframe_handler.add_keyframe(KeyFrame(gpsdata_handler[50], None, None, None, None))
+    path = str(tmp_path / "session_data.npz")
+    session.save_snapshot(gpsdata_handler, keyframe_handler, path)
+    with np.load(path) as snapshot:
+        assert snapshot["keyframe_rows"].tolist() == [10, 50]
+
+    restored_session = SessionHandler()
+    restored_session.initialize(session.session_data.video_file_path, gps_file, 0, 0)
+    restored_gpsdata = GPSDataHandler()
+    restored_keyframes = KeyFrameHandler(None, restored_gpsdata)
+    assert restored_session.load_snapshot(restored_gpsdata, restored_keyframes, path)
+
+    for name in GPSDataHandler.column_names:
+        np.testing.assert_array_equal(restored_gpsdata.columns[name], gpsdata_handler.columns[name])
+    assert restored_gpsdata.data == gpsdata_handler.data
+    assert (restored_session.session_data.image_width, restored_session.session_data.image_height) == (960, 540)
+    assert restored_session.session_data.video_fps == 25
+
+    restored = restored_keyframes.data
+    assert [keyframe.gps.timestamp for keyframe in restored] == [10, 50]
+    assert restored[0].image_point == calibrated.image_point
+    assert restored[0].intrinsics == calibrated.intrinsics
+    assert restored[0].extrinsics == calibrated.extrinsics
+    assert restored[1].image_point is None and restored[1].intrinsics is None and restored[1].extrinsics is None
+
+
+def test_points_are_rounded(tmp_path, gps_file):
+    session, gpsdata_handler, keyframe_handler = _session(tmp_path, gps_file)
+    # e.g. points of tracked keyframes are floats
+    keyframe_handler.add_keyframe(KeyFrame(
+        gpsdata_handler[10], None,
+        ImagePointContainer([99.6, 500.4], [400.5, 299.7], [560.2, 300.9], [859.51, 499.49]),
+        None, None
+    ))
+    path = str(tmp_path / "session_data.npz")
+    session.save_snapshot(gpsdata_handler, keyframe_handler, path)
+
+    restored_keyframes = KeyFrameHandler(None, GPSDataHandler())
+    assert session.load_snapshot(GPSDataHandler(), restored_keyframes, path)
+    assert restored_keyframes.data[0].image_point.to_list() == [[100, 500], [400, 300], [560, 301], [860, 499]]
+
+
+def test_outdated_snapshot_is_ignored(tmp_path, gps_file):
+    session, gpsdata_handler, keyframe_handler = _session(tmp_path, gps_file)
+    path = str(tmp_path / "session_data.npz")
+    session.save_snapshot(gpsdata_handler, keyframe_handler, path)
+
+    # snapshot of another gps file
+    other_session = SessionHandler()
+    other_session.initialize(session.session_data.video_file_path, str(tmp_path / "other.csv"), 960, 540)
+    assert not other_session.load_snapshot(GPSDataHandler(), KeyFrameHandler(), path)
+
+    # gps file changed since the snapshot was saved
+    with open(gps_file, "a", encoding="ascii") as file:
+        file.write("5032000,6340000,1040000,7200,0,1000\n")
+    stat = os.stat(gps_file)
+    os.utime(gps_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not session.load_snapshot(GPSDataHandler(), KeyFrameHandler(), path)
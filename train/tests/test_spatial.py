@@ -0,0 +1,54 @@
+""" spatial index queries compared with all coordinates """
+
+import numpy as np
+import pytest
+
+from tools.math import distances_between_geo_coordinates
+from tools.spatial import SpatialIndex
+
+
+@pytest.fixture
+def track() -> tuple:
+    """ winding track of about 50 km """
+    rng = np.random.default_rng(1)
+    headings = np.cumsum(rng.normal(0, 0.1, 5000))
+    latitudes = 63.4 + np.cumsum(10 * np.cos(headings)) / 111195
+    longitudes = 10.4 + np.cumsum(10 * np.sin(headings)) / (111195 * np.cos(np.radians(63.4)))
+    return latitudes, longitudes
+
+
+def _queries(latitudes, longitudes) -> np.ndarray:
+    """ coordinates close to the track, a few kilometers off and far away """
+    rng = np.random.default_rng(2)
+    rows = rng.integers(0, len(latitudes), 200)
+    offsets = np.concatenate((rng.normal(0, 0.002, 150), rng.normal(0, 0.05, 45), rng.normal(0, 5, 5)))
+    return np.column_stack((latitudes[rows] + offsets, longitudes[rows] + rng.permutation(offsets)))
+
+
+def test_nearest_matches_brute_force(track):
+    latitudes, longitudes = track
+    index = SpatialIndex(latitudes, longitudes)
+
+    for latitude, longitude in _queries(latitudes, longitudes).tolist():
+        distances = distances_between_geo_coordinates(latitude, longitude, latitudes, longitudes)
+        row, distance = index.nearest(latitude, longitude)
+        assert distance == pytest.approx(distances.min())
+        assert distances[row] == pytest.approx(distances.min())
+
+
+def test_within_matches_brute_force(track):
+    latitudes, longitudes = track
+    index = SpatialIndex(latitudes, longitudes)
+
+    for latitude, longitude in _queries(latitudes, longitudes)[:50].tolist():
+        for radius in (50, 400, 2000):
+            distances = distances_between_geo_coordinates(latitude, longitude, latitudes, longitudes)
+            rows = index.within(latitude, longitude, radius)
+            assert sorted(rows.tolist()) == np.flatnonzero(distances <= radius).tolist()
+            assert np.all(np.diff(distances[rows]) >= 0)
+
+
+def test_empty_index():
+    index = SpatialIndex(np.empty(0), np.empty(0))
+    assert index.nearest(63.4, 10.4) == (None, float("inf"))
+    assert len(index.within(63.4, 10.4, 1000)) == 0
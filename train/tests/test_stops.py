@@ -0,0 +1,49 @@
+""" detecting and skipping stops """
+
+import numpy as np
+
+from tools.stops import StopIndex
+
+
+def test_stop_is_detected(columns):
+    stops = StopIndex(columns)
+    # the stop starts with the first repeated fix
+    assert stops.starts.tolist() == [81]
+    assert stops.ends.tolist() == [141]
+    assert stops.stop_at(100) == 0 and stops.stop_at(80) is None and stops.stop_at(141) is None
+    assert [stops.is_skipped(index) for index in (81, 82, 139, 140)] == [False, True, True, False]
+
+    assert len(StopIndex(columns, min_duration=60)) == 0
+
+
+def test_next_and_previous_index_skip_the_stop(columns):
+    stops = StopIndex(columns)
+    assert stops.next_index(80) == 81
+    assert stops.next_index(81) == 140
+    assert stops.next_index(140) == 141
+    assert stops.previous_index(140) == 81
+    assert stops.previous_index(81) == 80
+
+    visited = [0]
+    while visited[-1] < 199:
+        visited.append(stops.next_index(visited[-1]))
+    assert visited == list(range(82)) + list(range(140, 200))
+
+    visited = [199]
+    while visited[-1] > 0:
+        visited.append(stops.previous_index(visited[-1]))
+    assert visited == list(range(199, 139, -1)) + list(range(81, -1, -1))
+
+
+def test_compressed_time(columns):
+    timestamps = columns["timestamp"]
+    compressed = StopIndex(columns).compressed_time(timestamps, kept=5)
+
+    assert np.all(np.diff(compressed) > 0)
+    np.testing.assert_array_equal(compressed[:82], timestamps[:82])
+    # the stop of 59 seconds lasts 5 seconds
+    np.testing.assert_allclose(compressed[140] - compressed[81], 5)
+    np.testing.assert_allclose(compressed[140:], timestamps[140:] - 54)
+
+    # stops shorter than kept stay as they are
+    np.testing.assert_array_equal(StopIndex(columns).compressed_time(timestamps, kept=60), timestamps)
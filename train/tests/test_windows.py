@@ -0,0 +1,54 @@
+""" released windows are disconnected from the handlers """
+
+from importlib import import_module
+
+import cv2
+import pytest
+from PySide6.QtCore import QCoreApplication, QEvent, SIGNAL
+
+from COTdataclasses import KeyFrame
+from main import WINDOW_CLASSES
+from tools.handler import GPSDataHandler, KeyFrameHandler, SessionHandler
+
+
+@pytest.fixture
+def handlers(qapp, gps_file, video_path) -> tuple:
+    session = SessionHandler()
+    session.initialize(video_path, gps_file, 64, 48)
+    gpsdata = GPSDataHandler()
+    gpsdata.read_csv_data(gps_file)
+    return session, gpsdata, KeyFrameHandler(None, gpsdata)
+
+
+def _receivers(gpsdata: GPSDataHandler, keyframe_handler: KeyFrameHandler) -> dict:
+    """ number of slots connected to every handler signal """
+    signals = (
+        (gpsdata, "gpsdatum_requested(PyObject)"),
+        (gpsdata, "data_appended(int)"),
+        (keyframe_handler, "keyframe_requested(PyObject)"),
+        (keyframe_handler.calibration, "calibration_changed(int,int)")
+    )
+    return {signature: handler.receivers(SIGNAL(signature)) for handler, signature in signals}
+
+
+@pytest.mark.parametrize("name", list(WINDOW_CLASSES))
+def test_released_window_is_disconnected(qapp, handlers, video_path, name):
+    session, gpsdata, keyframe_handler = handlers
+    unconnected = _receivers(gpsdata, keyframe_handler)
+
+    module_name, class_name = WINDOW_CLASSES[name]
+    window = getattr(import_module(module_name), class_name)()
+    if name == "videoplayer":
+        window.preload(cv2.VideoCapture(video_path))
+    window.initialize(session, gpsdata, keyframe_handler)
+    assert _receivers(gpsdata, keyframe_handler) != unconnected
+
+    window.release()
+    QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+    assert _receivers(gpsdata, keyframe_handler) == unconnected
+
+    # nothing reaches the deleted widgets
+    gpsdata.request_gpsdatum(gpsdata[5])
+    gpsdata.data_appended.emit(len(gpsdata) - 1)
+    keyframe_handler.keyframe_requested.emit(KeyFrame(gpsdata[5], None, None, None, None))
+    keyframe_handler.calibration.calibration_changed.emit(0, len(gpsdata))
@@ -0,0 +1,193 @@
+""" Inverse perspective mapping of frames onto the ground plane, the bird's-eye view
+
+ground_to_image_homography
+image_to_ground
+BirdsEyeView
+rectify_segment
+
+The camera model is the one determine_camera_parameters solves for: the optical axis hits the
+ground plane in the world origin at the principal length, pan turns it about the vertical axis,
+tilt lowers it below the horizon and swing turns the image about the optical axis. Image
+coordinates are pixels relative to the principal point, world coordinates are in the unit of the
+track gauge, i.e. mm.
+
+The remap tables of a view only depend on its parameters and are cached, so the views of frames
+that share a calibration are created once:
+
+    view = BirdsEyeView.from_keyframe(keyframe, image_width, image_height)
+    rectified = view.rectify(frame)
+"""
+
+from math import radians, sin, cos
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from COTdataclasses import KeyFrame, IntrinsicCameraParameters, ExtrinsicCameraParameters
+from tools.framesource import FrameSource
+
+
+def ground_to_image_homography(intrinsics: IntrinsicCameraParameters, extrinsics: ExtrinsicCameraParameters,
+                               principal_point: tuple = (0, 0)) -> np.ndarray:
+    """ 3x3 homography from ground plane coordinates (x, y, 1) to image pixels
+
+    principal_point is the pixel the image points were relative to when the camera was calibrated,
+    the image editor passes pixel coordinates, so it is the top left corner.
+    """
+    swing = radians(extrinsics.swing)
+    tilt = radians(extrinsics.tilt)
+    pan = radians(extrinsics.pan)
+
+    # axes of the camera in world coordinates, forward is the optical axis
+    forward = np.array([cos(pan) * cos(tilt), sin(pan) * cos(tilt), -sin(tilt)])
+    right = np.array([sin(pan), -cos(pan), 0])
+    down = np.cross(forward, right)
+    # image axes are turned about the optical axis by the swing angle
+    image_x = cos(swing) * right + sin(swing) * down
+    image_y = -sin(swing) * right + cos(swing) * down
+
+    rotation = np.array([image_x, image_y, forward])
+    camera_position = -intrinsics.principal_length * forward
+    translation = -rotation @ camera_position
+
+    focal_length = intrinsics.focal_length
+    camera_matrix = np.array([
+        [focal_length, 0, principal_point[0]],
+        [0, focal_length, principal_point[1]],
+        [0, 0, 1]
+    ])
+    # z of ground points is 0, the third column of the rotation drops out
+    return camera_matrix @ np.column_stack((rotation[:, 0], rotation[:, 1], translation))
+
+
+@lru_cache(maxsize=16)
+def _remap_tables(homography: tuple, image_size: tuple, region: tuple, output_size: tuple) -> tuple:
+    """ fixed point remap tables for cv2.remap, arguments are tuples to be hashable """
+    homography = np.array(homography).reshape(3, 3)
+    origin_x, origin_y, axis_x_x, axis_x_y, axis_y_x, axis_y_y = region
+    width, height = output_size
+
+    # ground coordinates of every output pixel center
+    columns, rows = np.meshgrid(np.arange(width) + 0.5, np.arange(height) + 0.5)
+    ground_x = origin_x + columns * axis_x_x + rows * axis_y_x
+    ground_y = origin_y + columns * axis_x_y + rows * axis_y_y
+
+    image = np.tensordot(homography, np.stack((ground_x, ground_y, np.ones_like(ground_x))), axes=1)
+    depth = image[2]
+    # ground behind the camera is not visible
+    behind = depth <= 0
+    depth[behind] = 1
+    map_x = (image[0] / depth).astype(np.float32)
+    map_y = (image[1] / depth).astype(np.float32)
+    map_x[behind] = -1
+    map_y[behind] = -1
+
+    # fixed point tables are about twice as fast as floating point ones
+    image_width, image_height = image_size
+    if max(image_width, image_height) < 2**15:
+        return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+    return map_x, map_y
+
+
+class BirdsEyeView:
+    """ rectifies frames of a calibrated camera onto a rectangular region of the ground plane
+
+    The region is spanned by origin and the ground vectors of one output pixel to the right and
+    one pixel down, regions created by from_keyframe show the ground ahead of the camera upwards.
+    """
+
+    def __init__(self, homography: np.ndarray, image_size: tuple, origin: tuple,
+                 axis_x: tuple, axis_y: tuple, output_size: tuple) -> None:
+        self.homography = np.asarray(homography, dtype=np.float64)
+        self.image_size = tuple(int(value) for value in image_size)
+        self.output_size = tuple(int(value) for value in output_size)
+        # ground coordinates of the top left corner and ground vectors of one output pixel
+        self.origin = tuple(float(value) for value in origin)
+        self.axis_x = tuple(float(value) for value in axis_x)
+        self.axis_y = tuple(float(value) for value in axis_y)
+
+    @classmethod
+    def from_keyframe(cls, keyframe: KeyFrame, image_width: int, image_height: int,
+                      output_length: int = 960, margin: float = 0.5, principal_point: tuple = (0, 0)):
+        """ view of the ground around the image points of a calibrated keyframe
+
+        The region covers the image points, enlarged by margin times its size on every side.
+        output_length is the longer side of the rectified image in pixels.
+        """
+        homography = ground_to_image_homography(keyframe.intrinsics, keyframe.extrinsics, principal_point)
+        ground = image_to_ground(homography, keyframe.image_point.to_list())
+        if ground is None:
+            raise ValueError("Image points are not on the ground plane of the calibration.")
+
+        # ground direction of the optical axis points up in the rectified image
+        pan = radians(keyframe.extrinsics.pan)
+        forward = np.array([cos(pan), sin(pan)])
+        lateral = np.array([sin(pan), -cos(pan)])
+
+        along = ground @ forward
+        across = ground @ lateral
+        length = along.max() - along.min()
+        width = across.max() - across.min()
+        near = along.min() - margin * length
+        far = along.max() + margin * length
+        left = across.min() - margin * max(width, length / 2)
+        right = across.max() + margin * max(width, length / 2)
+
+        # square output pixels
+        scale = max(far - near, right - left) / output_length
+        output_size = (
+            max(int(round((right - left) / scale)), 1),
+            max(int(round((far - near) / scale)), 1)
+        )
+        origin = far * forward + left * lateral
+        return cls(homography, (image_width, image_height), origin, scale * lateral, -scale * forward, output_size)
+
+    @property
+    def scale(self) -> float:
+        """ ground units, i.e. mm, per output pixel """
+        return float(np.hypot(*self.axis_x))
+
+    def maps(self) -> tuple:
+        """ remap tables, shared by all views with the same parameters """
+        return _remap_tables(
+            tuple(self.homography.ravel().tolist()), self.image_size,
+            self.origin + self.axis_x + self.axis_y, self.output_size
+        )
+
+    def rectify(self, frame: np.ndarray, dst: np.ndarray = None) -> np.ndarray:
+        """ bird's-eye view of a frame, written to dst if given """
+        map_1, map_2 = self.maps()
+        return cv2.remap(frame, map_1, map_2, cv2.INTER_LINEAR, dst=dst, borderMode=cv2.BORDER_CONSTANT)
+
+    def ground_to_output(self, points) -> np.ndarray:
+        """ output pixels of ground coordinates """
+        points = np.asarray(points, dtype=np.float64) - self.origin
+        axes = np.array([self.axis_x, self.axis_y]).T
+        return np.linalg.solve(axes, points.T).T
+
+
+def image_to_ground(homography: np.ndarray, points) -> np.ndarray:
+    """ ground coordinates of image pixels, None if any pixel is above the horizon """
+    points = np.asarray(points, dtype=np.float64)
+    ground = np.linalg.solve(homography, np.column_stack((points, np.ones(len(points)))).T)
+    # the depth of a pixel is the inverse of its homogeneous ground coordinate
+    if np.any(ground[2] <= 0):
+        return None
+    return (ground[:2] / ground[2]).T
+
+
+def rectify_segment(frame_source: FrameSource, view: BirdsEyeView, first_frame: int, last_frame: int):
+    """ yields frame number and bird's-eye view of every frame in [first_frame, last_frame)
+
+    Frames are read sequentially from frame_source, see tools.framesource, and rectified into one
+    reused array, copy it to keep it.
+    """
+    frame = None
+    rectified = None
+    for frame_number in range(first_frame, last_frame):
+        frame = frame_source.read(frame_number, frame)
+        if frame is None:
+            return
+        rectified = view.rectify(frame, rectified)
+        yield frame_number, rectified
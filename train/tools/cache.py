@@ -0,0 +1,116 @@
+""" Persistent on-disk cache for parsed gps data
+
+GPSDataCache
+
+Every entry is a directory named after the content hash of the gps file and contains
+one .npy file per column, so entries can be memory mapped on a hit. Differently processed columns
+of the same file, e.g. cleaned ones, are stored as variant with their own key.
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+
+class GPSDataCache:
+    """ caches columns of parsed gps files, keyed by the content hash of the file """
+
+    # increase if parsing or derived columns change, old entries are then never hit again
+    CACHE_VERSION = 2
+
+    def __init__(self, cache_dir: str = None, max_size: int = 256 * 1024**2) -> None:
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "cautios-octo-train", "gps")
+        self.cache_dir = cache_dir
+        # maximum size of the cache directory in bytes, least recently used entries are evicted
+        self.max_size = max_size
+
+    def key(self, file_path: str, variant: str = "") -> str:
+        """ content hash of the file combined with the cache version and variant """
+        file_hash = hashlib.blake2b(digest_size=16)
+        file_hash.update(f"v{GPSDataCache.CACHE_VERSION}{variant}".encode("ascii"))
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024**2), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    def _entry_path(self, file_path: str, variant: str = "") -> str:
+        return os.path.join(self.cache_dir, self.key(file_path, variant))
+
+    def load(self, file_path: str, column_names: tuple, variant: str = "") -> dict:
+        """ returns memory mapped columns for the file or None if it is not cached """
+        entry_path = self._entry_path(file_path, variant)
+        if not os.path.isdir(entry_path):
+            return None
+
+        try:
+            columns = {
+                name: np.load(os.path.join(entry_path, f"{name}.npy"), mmap_mode="r")
+                for name in column_names
+            }
+        except (FileNotFoundError, ValueError, OSError):
+            # incomplete or corrupted entry
+            shutil.rmtree(entry_path, ignore_errors=True)
+            return None
+
+        # remember usage for eviction
+        os.utime(entry_path)
+        return columns
+
+    def store(self, file_path: str, columns: dict, variant: str = "") -> None:
+        """ stores columns for the file and evicts old entries if the cache grew too large """
+        entry_path = self._entry_path(file_path, variant)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # write to a temporary directory first, so an entry is either complete or missing
+        temporary_path = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp")
+        try:
+            for name, column in columns.items():
+                np.save(os.path.join(temporary_path, f"{name}.npy"), np.ascontiguousarray(column))
+            shutil.rmtree(entry_path, ignore_errors=True)
+            os.replace(temporary_path, entry_path)
+        except OSError as exception:
+            print(f"{exception}: gps data of {file_path} could not be cached.")
+            shutil.rmtree(temporary_path, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def invalidate(self, file_path: str, variant: str = "") -> None:
+        """ removes the entry of the given file """
+        shutil.rmtree(self._entry_path(file_path, variant), ignore_errors=True)
+
+    def clear(self) -> None:
+        """ removes all entries """
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def size(self) -> int:
+        """ total size of all entries in bytes """
+        return sum(size for _, _, size in self._entries())
+
+    def evict(self) -> None:
+        """ removes least recently used entries until the cache fits into max_size """
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total_size = sum(size for _, _, size in entries)
+
+        for entry_path, _, size in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_size -= size
+
+    def _entries(self) -> list:
+        """ list of (path, last usage, size) of all complete entries """
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            size = sum(file.stat().st_size for file in os.scandir(entry.path))
+            entries.append((entry.path, entry.stat().st_mtime, size))
+        return entries
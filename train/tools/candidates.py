@@ -0,0 +1,114 @@
+""" Ranking of gps rows by how straight and level the track ahead of them is
+
+track_geometry
+rank_keyframe_candidates
+
+determine_camera_parameters assumes the rails in the image to be straight and to lie on a level
+plane, so keyframes are best chosen where the track ahead of the camera is straight and level.
+The track is resampled at a fixed spacing along its distance, so heading and gradient do not
+depend on the speed and noise of slow fixes is averaged out. Statistics over the window ahead of
+every row are calculated with cumulative sums, the whole track is analysed without a python loop.
+"""
+
+from bisect import bisect_left
+
+import numpy as np
+
+from tools.spatial import EARTH_RADIUS
+
+
+def track_geometry(columns: dict, distances: np.ndarray, window_length: float = 150, spacing: float = 10,
+                   max_turning: float = 0.035, max_gradient: float = 0.005,
+                   max_gradient_deviation: float = 0.01) -> dict:
+    """ heading, curvature and statistics of the window_length meters ahead of every row
+
+    columns are gps columns as created by GPSDataHandler.to_columns, distances the cumulative
+    distances along the track. Returns columns per row:
+    heading in degrees clockwise from north, curvature in radians per meter, turning in radians
+    summed over the window, mean and standard deviation of the gradient in the window and cost,
+    the sum of turning and gradients relative to their maximum, lower is straighter and more level.
+    Rows whose window exceeds the end of the track have an infinite cost.
+    """
+    row_count = len(distances)
+    geometry = {
+        name: np.full(row_count, np.nan)
+        for name in ("heading", "curvature", "turning", "gradient_mean", "gradient_deviation")
+    }
+    geometry["cost"] = np.full(row_count, np.inf)
+    if row_count < 2 or distances[-1] < window_length + spacing:
+        return geometry
+
+    # planar coordinates in meters, the track spans too little to need a projection
+    latitudes = np.radians(columns["latitude"])
+    longitudes = np.radians(columns["longitude"])
+    x = (longitudes - longitudes.mean()) * np.cos(latitudes.mean()) * EARTH_RADIUS
+    y = (latitudes - latitudes.mean()) * EARTH_RADIUS
+
+    # the track resampled every spacing meters, rows of a stop share their distance
+    grid = np.arange(0, distances[-1], spacing)
+    grid_x = np.interp(grid, distances, x)
+    grid_y = np.interp(grid, distances, y)
+    grid_altitude = np.interp(grid, distances, columns["altitude"])
+
+    # heading of every segment between grid points and the turn at every inner grid point
+    headings = np.arctan2(np.diff(grid_x), np.diff(grid_y))
+    turns = np.abs((np.diff(headings) + np.pi) % (2 * np.pi) - np.pi)
+    gradients = np.diff(grid_altitude) / spacing
+
+    # segment of every row, its window are the following segments
+    segment_count = len(headings)
+    window_segments = int(round(window_length / spacing))
+    segments = np.minimum((distances / spacing).astype(np.int64), segment_count - 1)
+    geometry["heading"] = np.degrees(headings[segments]) % 360
+    geometry["curvature"] = np.append(turns, 0)[segments] / spacing
+
+    # window sums from cumulative sums, only for rows with a complete window ahead
+    complete = segments + window_segments <= segment_count
+    first = segments[complete]
+    last = first + window_segments
+
+    turn_sums = np.concatenate(([0], np.cumsum(turns)))
+    # turns inside the window are those between its first and last segment
+    turning = turn_sums[last - 1] - turn_sums[first]
+
+    gradient_sums = np.concatenate(([0], np.cumsum(gradients)))
+    squared_gradient_sums = np.concatenate(([0], np.cumsum(gradients**2)))
+    gradient_mean = (gradient_sums[last] - gradient_sums[first]) / window_segments
+    gradient_variance = (squared_gradient_sums[last] - squared_gradient_sums[first]) / window_segments \
+        - gradient_mean**2
+    gradient_deviation = np.sqrt(np.maximum(gradient_variance, 0))
+
+    geometry["turning"][complete] = turning
+    geometry["gradient_mean"][complete] = gradient_mean
+    geometry["gradient_deviation"][complete] = gradient_deviation
+    geometry["cost"][complete] = turning / max_turning + np.abs(gradient_mean) / max_gradient \
+        + gradient_deviation / max_gradient_deviation
+    return geometry
+
+
+def rank_keyframe_candidates(cost: np.ndarray, distances: np.ndarray, count: int = 20,
+                             separation: float = 150) -> np.ndarray:
+    """ indices of the count rows with the lowest cost, at least separation meters apart along the track
+
+    Rows are chosen greedily by cost, a row is chosen if it is at least separation meters away from
+    every row chosen before. Rows with an infinite cost are never chosen, fewer rows are returned
+    if not enough remain.
+    """
+    order = np.argsort(cost, kind="stable")
+    order = order[np.isfinite(cost[order])]
+
+    chosen = []
+    # distances of the chosen rows, sorted to find the closest with bisect
+    chosen_distances = []
+    for index in order.tolist():
+        distance = distances[index]
+        position = bisect_left(chosen_distances, distance)
+        if position > 0 and distance - chosen_distances[position - 1] < separation:
+            continue
+        if position < len(chosen_distances) and chosen_distances[position] - distance < separation:
+            continue
+        chosen.append(index)
+        chosen_distances.insert(position, distance)
+        if len(chosen) == count:
+            break
+    return np.array(chosen, dtype=np.int64)
@@ -0,0 +1,174 @@
+""" Cleaning of parsed gps columns before values are derived from them
+
+clean_columns
+flag_jumps
+flag_duplicates
+savitzky_golay
+track_statistics
+
+Three kinds of errors make the gradient noisy. Single fixes, often the first after a gap in the
+recording, lie far off the track, the speed implied by the steps to and from them is impossible
+for the train. Receivers repeat their last fix while moving, the step to the repeated fix has no
+distance and the following one twice the distance. Altitude is quantised, steps of a few meters
+turn a single quantisation step into a large gradient. Jumps and repeated fixes are flagged and
+their positions are interpolated in time between the remaining fixes, the altitude is smoothed
+with a Savitzky-Golay filter. Rows are never removed, so they keep their index and timestamp.
+"""
+
+import numpy as np
+
+from tools.derived import gradients
+from tools.math import distances_between_geo_coordinates
+
+
+def _speed_ratios(columns: dict, stride: int, tolerance: float, slack: float, max_speed: float) -> np.ndarray:
+    """ speed implied by the step from every row to the row stride rows later relative to the allowed speed
+
+    Steps with a ratio above 1 are faster than the train could have been. The allowed speed in m/s
+    is tolerance times the higher reported speed of both rows plus slack, but at most max_speed.
+    """
+    latitudes = columns["latitude"]
+    longitudes = columns["longitude"]
+    speeds = columns["speed"]
+    steps = distances_between_geo_coordinates(
+        latitudes[:-stride], longitudes[:-stride], latitudes[stride:], longitudes[stride:]
+    )
+    timestamps = columns["timestamp"]
+    durations = np.maximum(timestamps[stride:] - timestamps[:-stride], 1e-3)
+    allowed = np.minimum(tolerance * np.maximum(speeds[:-stride], speeds[stride:]) / 3.6 + slack, max_speed)
+    return steps / (allowed * durations)
+
+
+def flag_jumps(columns: dict, tolerance: float = 3, slack: float = 10, max_speed: float = 70) -> np.ndarray:
+    """ True for every row whose position is physically impossible
+
+    A step is impossible if the speed it implies exceeds the reported speed, see _speed_ratios.
+    A row with impossible steps to both neighbours is flagged. Otherwise of the two rows of an
+    impossible step the one is flagged, whose neighbours are reachable from each other without it
+    with the lower speed. The first and last row are never flagged, there is no way to tell them
+    apart from an error of their only neighbour.
+    """
+    row_count = len(columns["timestamp"])
+    if row_count < 3:
+        return np.zeros(row_count, dtype=bool)
+
+    impossible = _speed_ratios(columns, 1, tolerance, slack, max_speed) > 1
+    # speed ratio of the step from the previous to the following row of every row, if it was left out
+    skipped = np.full(row_count, np.inf)
+    skipped[1:-1] = _speed_ratios(columns, 2, tolerance, slack, max_speed)
+    reachable = skipped <= 1
+
+    before = np.zeros(row_count, dtype=bool)
+    before[1:] = impossible
+    after = np.zeros(row_count, dtype=bool)
+    after[:-1] = impossible
+
+    # of the rows of an impossible step the one with the lower ratio is left out, ties the earlier one
+    better_than_next = np.append(skipped[:-1] <= skipped[1:], True)
+    better_than_previous = np.insert(skipped[1:] < skipped[:-1], 0, True)
+    flagged = (before & after) \
+        | (after & reachable & better_than_next) \
+        | (before & reachable & better_than_previous)
+    flagged[[0, -1]] = False
+    return flagged
+
+
+def flag_duplicates(columns: dict, max_standing_speed: float = 1) -> np.ndarray:
+    """ True for every row repeating the position of the previous row while the train is moving
+
+    Standing trains repeat their position as well, rows with a speed of at most max_standing_speed
+    are kept, see tools.stops.
+    """
+    latitudes = columns["latitude"]
+    longitudes = columns["longitude"]
+    flagged = np.zeros(len(latitudes), dtype=bool)
+    flagged[1:] = (np.diff(latitudes) == 0) & (np.diff(longitudes) == 0) \
+        & (columns["speed"][1:] > max_standing_speed)
+    return flagged
+
+
+def savitzky_golay(values: np.ndarray, window_length: int = 15, polynomial_order: int = 2) -> np.ndarray:
+    """ values smoothed by fitting a polynomial to the window around every value by least squares
+
+    window_length has to be odd and larger than polynomial_order, otherwise a ValueError is raised.
+    The window is shortened to the number of values, values are returned unchanged if they are
+    too few to fit the polynomial. Values within half a window of the ends take the polynomial
+    fitted to the first or last window.
+    """
+    if window_length % 2 == 0 or window_length <= polynomial_order:
+        raise ValueError(
+            f"Window length {window_length} has to be odd and larger than the polynomial order {polynomial_order}."
+        )
+    values = np.asarray(values, dtype=np.float64)
+    window_length = min(window_length, len(values) - (len(values) + 1) % 2)
+    if window_length <= polynomial_order + 1:
+        return values.copy()
+    half = window_length // 2
+
+    # projection onto polynomials over the window, row k holds the weights of the fit at position k
+    positions = np.arange(-half, half + 1, dtype=np.float64)
+    vandermonde = positions[:, np.newaxis] ** np.arange(polynomial_order + 1)
+    projection = vandermonde @ np.linalg.pinv(vandermonde)
+
+    smoothed = np.empty_like(values)
+    # the weights are symmetric, so correlation and convolution are the same
+    smoothed[half:-half] = np.convolve(values, projection[half], mode="valid")
+    smoothed[:half] = projection[:half] @ values[:window_length]
+    smoothed[-half:] = projection[-half:] @ values[-window_length:]
+    return smoothed
+
+
+def track_statistics(columns: dict, max_standing_speed: float = 1, tolerance: float = 3, slack: float = 10,
+                     max_speed: float = 70) -> dict:
+    """ measures of the noise of gps columns, compared before and after cleaning """
+    latitudes = columns["latitude"]
+    longitudes = columns["longitude"]
+    altitudes = columns["altitude"]
+    row_count = len(latitudes)
+    if row_count < 3:
+        return {}
+
+    row_gradients = gradients(latitudes, longitudes, altitudes)
+    impossible = _speed_ratios(columns, 1, tolerance, slack, max_speed) > 1
+    return {
+        "impossible steps": int(impossible.sum()),
+        "repeated fixes": int(flag_duplicates(columns, max_standing_speed).sum()),
+        "gradient deviation [rad]": float(row_gradients.std()),
+        "largest gradient [rad]": float(np.abs(row_gradients).max()),
+        # quantisation and noise show up in the second differences
+        "altitude roughness [m]": float(np.abs(np.diff(altitudes, 2)).mean())
+    }
+
+
+def clean_columns(columns: dict, window_length: int = 15, polynomial_order: int = 2,
+                  max_standing_speed: float = 1, tolerance: float = 3, slack: float = 10,
+                  max_speed: float = 70) -> tuple:
+    """ cleaned copies of the position and altitude columns and statistics before and after cleaning
+
+    columns are gps columns as created by GPSDataHandler.to_columns, returned are the same
+    columns with latitude, longitude and altitude replaced, the gradient is not recalculated.
+    Statistics contain the number of rows flagged as jump and as repeated fix and the
+    track_statistics before and after cleaning.
+    """
+    limits = {"tolerance": tolerance, "slack": slack, "max_speed": max_speed}
+    statistics = {"before": track_statistics(columns, max_standing_speed, **limits)}
+
+    duplicates = flag_duplicates(columns, max_standing_speed)
+    jumps = flag_jumps(columns, **limits) & ~duplicates
+    flagged = duplicates | jumps
+    statistics["jumps"] = int(jumps.sum())
+    statistics["repeated fixes"] = int(duplicates.sum())
+
+    cleaned = dict(columns)
+    timestamps = columns["timestamp"]
+    kept = np.flatnonzero(~flagged)
+    for name in ("latitude", "longitude", "altitude"):
+        column = np.array(columns[name], dtype=np.float64)
+        if len(kept) > 1 and len(kept) < len(column):
+            # repeated fixes and jumps are moved onto the track between the kept fixes
+            column[flagged] = np.interp(timestamps[flagged], timestamps[kept], column[kept])
+        cleaned[name] = column
+
+    cleaned["altitude"] = savitzky_golay(cleaned["altitude"], window_length, polynomial_order)
+    statistics["after"] = track_statistics(cleaned, max_standing_speed, **limits)
+    return cleaned, statistics
@@ -0,0 +1,200 @@
+""" Decoding of video frames in a separate process into a ring of shared memory slots
+
+SharedMemoryDecoder
+
+Decoding in a thread of the gui process competes with the gui for the GIL. The decoder process
+has its own interpreter and writes decoded frames directly into slots of fixed size in a
+multiprocessing.shared_memory block, the gui wraps a slot in a QImage without copying the frame.
+Only small messages go through the control pipe:
+
+    gui -> decoder  ("decode", generation, slot, frame number, gps row), ("stop",)
+    decoder -> gui  (slot, frame number, gps row, success), success is None for a skipped request
+
+Frames ahead of the shown one are requested in advance, so playback finds them decoded. A jump
+starts a new generation, the decoder skips requests of older generations it did not start yet, so
+it does not decode frames that are not wanted anymore.
+"""
+
+import multiprocessing
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _decode_frames(video_path: str, memory_name: str, slot_count: int, frame_shape: tuple, connection) -> None:
+    """ decodes requested frames into their slot, runs in the decoder process """
+    # frame sources are only needed in the decoder process
+    from tools.framesource import OpenCVFrameSource
+
+    # the gui process created the memory and unlinks it, spawned processes share its resource tracker
+    memory = shared_memory.SharedMemory(name=memory_name)
+    slots = np.ndarray((slot_count,) + tuple(frame_shape), dtype=np.uint8, buffer=memory.buf)
+
+    frame_source = OpenCVFrameSource(video_path)
+    requests = deque()
+    generation = 0
+    try:
+        while True:
+            # all waiting requests are read first to know the latest generation
+            while len(requests) == 0 or connection.poll():
+                message = connection.recv()
+                if message[0] == "stop":
+                    return
+                requests.append(message)
+                generation = max(generation, message[1])
+
+            _, request_generation, slot, frame_number, row = requests.popleft()
+            if request_generation < generation:
+                connection.send((slot, frame_number, row, None))
+                continue
+
+            frame = frame_source.read(frame_number, slots[slot])
+            # frames of another size than the slot were decoded into a new array
+            success = frame is not None and frame.shape == slots[slot].shape
+            if success and not np.shares_memory(frame, slots[slot]):
+                slots[slot] = frame
+            connection.send((slot, frame_number, row, success))
+    except (EOFError, BrokenPipeError):
+        # the gui process is gone
+        pass
+    finally:
+        frame_source.close()
+        del slots
+        memory.close()
+
+
+class SharedMemoryDecoder:
+    """ decodes frames of a video in a separate process into slots of shared memory """
+
+    # seconds to wait for a decoded frame before giving up
+    timeout = 5
+
+    def __init__(self, video_path: str, width: int, height: int, slot_count: int = 8) -> None:
+        self.video_path = video_path
+        self.frame_shape = (height, width, 3)
+        self.slot_count = slot_count
+
+        self._memory = shared_memory.SharedMemory(create=True, size=slot_count * height * width * 3)
+        self._slots = np.ndarray((slot_count,) + self.frame_shape, dtype=np.uint8, buffer=self._memory.buf)
+
+        # slots the decoder does not write to, decoded frames by frame number and requested frames
+        self._free = deque(range(slot_count))
+        self._ready = OrderedDict()
+        self._pending = {}
+        self._generation = 0
+
+        # forking a process with running Qt threads is unsafe, the decoder is spawned
+        context = multiprocessing.get_context("spawn")
+        self._connection, decoder_connection = context.Pipe()
+        self._process = context.Process(
+            target=_decode_frames,
+            args=(video_path, self._memory.name, slot_count, self.frame_shape, decoder_connection),
+            name="frame-decoder",
+            daemon=True
+        )
+        self._process.start()
+        decoder_connection.close()
+
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def frame(self, frame_number: int, row: int, ahead: list = ()) -> np.ndarray:
+        """ BGR frame in its shared memory slot or None if it could not be decoded
+
+        ahead are (frame number, gps row) of the frames likely shown next, they are requested as
+        far as slots are free. The slot is reused by later calls, its content has to be copied or
+        displayed before, e.g. by QPixmap.fromImage.
+        """
+        if not self.is_running():
+            return None
+
+        if frame_number not in self._ready and not self._is_pending(frame_number):
+            # a frame that was not requested ahead is a jump, earlier requests are not needed anymore
+            self._generation += 1
+            self._request(frame_number, row)
+
+        # the shown frame and the frames ahead are kept, older decoded frames make room for them
+        keep = {frame_number}.union(ahead_frame_number for ahead_frame_number, _ in ahead)
+        for ahead_frame_number, ahead_row in ahead:
+            if ahead_frame_number in self._ready or self._is_pending(ahead_frame_number):
+                continue
+            if len(self._free) == 0 and not self._evict(keep):
+                break
+            self._request(ahead_frame_number, ahead_row)
+
+        while frame_number not in self._ready:
+            if not self._is_pending(frame_number):
+                # requested ahead before a jump and skipped by the decoder
+                self._request(frame_number, row)
+            received = self._receive()
+            if received is None or received == (frame_number, False):
+                return None
+        self._ready.move_to_end(frame_number)
+        return self._slots[self._ready[frame_number]]
+
+    def discard(self, frame_number: int) -> None:
+        """ frees the slot of a decoded frame, e.g. after it was drawn on """
+        if frame_number in self._ready:
+            self._free.append(self._ready.pop(frame_number))
+
+    def shutdown(self) -> None:
+        """ stops the decoder process and frees the shared memory """
+        if self._process is None:
+            return
+        try:
+            self._connection.send(("stop",))
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(self.timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._process = None
+        self._connection.close()
+
+        self._slots = None
+        try:
+            self._memory.close()
+        except BufferError:
+            print("Shared memory of the decoder is still referenced, it is freed with the process.")
+        self._memory.unlink()
+
+    def _is_pending(self, frame_number: int) -> bool:
+        return frame_number in self._pending.values()
+
+    def _request(self, frame_number: int, row: int) -> None:
+        """ requests a frame into a free slot, waits for a slot if there is none """
+        while len(self._free) == 0:
+            if not self._evict(set()) and self._receive() is None:
+                return
+        slot = self._free.popleft()
+        self._pending[slot] = frame_number
+        self._connection.send(("decode", self._generation, slot, frame_number, row))
+
+    def _evict(self, keep: set) -> bool:
+        """ frees the slot of the least recently shown frame not in keep, False if there is none """
+        for frame_number in self._ready:
+            if frame_number not in keep:
+                self._free.append(self._ready.pop(frame_number))
+                return True
+        return False
+
+    def _receive(self) -> tuple:
+        """ waits for the next answer of the decoder, returns its frame number and success
+
+        None if the decoder does not answer.
+        """
+        if not self._connection.poll(self.timeout):
+            print(f"Decoder did not answer within {self.timeout}s")
+            return None
+        try:
+            slot, frame_number, _, success = self._connection.recv()
+        except EOFError:
+            return None
+        del self._pending[slot]
+        if success:
+            self._ready[frame_number] = slot
+        else:
+            self._free.append(slot)
+        return frame_number, success
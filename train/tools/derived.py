@@ -0,0 +1,138 @@
+""" Registry of columns derived from the gps columns, computed lazily by GPSDataHandler.derived
+
+DerivedColumn
+register_derived_column
+derived_column_inputs
+gradients
+
+Every derived column is a vectorized function of other columns, gps columns as created by
+GPSDataHandler.to_columns or other derived columns. GPSDataHandler keeps a version per gps column
+that changes with the column, a computed derived column is kept together with the versions of all
+columns it depends on and is only computed again once one of them changed. New columns are
+registered with a decorator, the function gets its input columns as positional arguments:
+
+    @register_derived_column("speed_ms", ("speed",), "Speed", "m/s")
+    def speed_in_meters_per_second(speed):
+        return speed / 3.6
+"""
+
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+from tools.math import cumulative_distance, distances_between_geo_coordinates
+
+
+@dataclass(frozen=True)
+class DerivedColumn:
+    """ a column computed from the input columns by function """
+    name: str
+    inputs: tuple
+    function: Callable
+    # shown e.g. as title of a chart
+    label: str
+    unit: str
+
+
+# derived columns by name, in the order they were registered
+DERIVED_COLUMNS = {}
+
+
+def register_derived_column(name: str, inputs: tuple, label: str, unit: str = ""):
+    """ decorator registering a function of the input columns as derived column """
+    def register(function: Callable) -> Callable:
+        DERIVED_COLUMNS[name] = DerivedColumn(name, tuple(inputs), function, label, unit)
+        return function
+    return register
+
+
+def derived_column_inputs(name: str) -> set:
+    """ gps columns a derived column depends on, directly or through other derived columns """
+    inputs = set()
+    for input_name in DERIVED_COLUMNS[name].inputs:
+        if input_name in DERIVED_COLUMNS:
+            inputs |= derived_column_inputs(input_name)
+        else:
+            inputs.add(input_name)
+    return inputs
+
+
+def gradients(latitudes: np.ndarray, longitudes: np.ndarray, altitudes: np.ndarray) -> np.ndarray:
+    """ gradient in radians of every row, the mean of the gradients to its previous and following row
+
+    Steps without distance are left out, the first and last row and rows without any step have 0.
+    """
+    row_count = len(latitudes)
+    result = np.zeros(row_count)
+    if row_count < 3:
+        return result
+
+    steps = distances_between_geo_coordinates(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+    moved = steps > 0
+    step_gradients = np.where(moved, np.arctan2(np.diff(altitudes), steps), 0)
+
+    # inner rows have the step from the previous row and the step to the following row
+    sums = step_gradients[:-1] + step_gradients[1:]
+    counts = moved[:-1].astype(np.int64) + moved[1:]
+    result[1:-1] = np.divide(sums, counts, out=np.zeros(row_count - 2), where=counts > 0)
+    return result
+
+
+def _window_bounds(distances: np.ndarray, half_window: float) -> tuple:
+    """ first and last row within half_window meters along the track of every row """
+    first = np.searchsorted(distances, distances - half_window, side="left")
+    last = np.searchsorted(distances, distances + half_window, side="right") - 1
+    return first, last
+
+
+@register_derived_column("distance", ("latitude", "longitude", "timestamp"), "Distance", "m")
+def _distance(latitudes, longitudes, timestamps):
+    """ distance along the track, see tools.math.cumulative_distance """
+    return cumulative_distance(latitudes, longitudes, timestamps)
+
+
+@register_derived_column("acceleration", ("speed", "timestamp"), "Acceleration", "m/s²")
+def _acceleration(speeds, timestamps):
+    """ change of the speed in m/s per second, by central differences """
+    if len(speeds) < 2:
+        return np.zeros(len(speeds))
+    return np.gradient(speeds / 3.6, timestamps)
+
+
+@register_derived_column("heading", ("latitude", "longitude"), "Heading", "°")
+def _heading(latitudes, longitudes):
+    """ direction to the next moved position clockwise from north, standing rows keep the previous one """
+    row_count = len(latitudes)
+    if row_count < 2:
+        return np.zeros(row_count)
+
+    latitudes = np.radians(latitudes)
+    longitudes = np.radians(longitudes)
+    # planar step, the track spans too little to need a projection
+    d_x = np.diff(longitudes) * np.cos(latitudes[:-1])
+    d_y = np.diff(latitudes)
+    headings = np.degrees(np.arctan2(d_x, d_y)) % 360
+
+    # steps without movement take the heading of the last step with movement
+    moved = (d_x != 0) | (d_y != 0)
+    last_moved = np.maximum.accumulate(np.where(moved, np.arange(row_count - 1), 0))
+    headings = headings[last_moved]
+    return np.append(headings, headings[-1])
+
+
+@register_derived_column("smoothed_altitude", ("altitude", "distance"), "Smoothed Altitude", "m")
+def _smoothed_altitude(altitudes, distances, half_window: float = 100):
+    """ mean altitude of all rows within half_window meters along the track """
+    first, last = _window_bounds(distances, half_window)
+    sums = np.concatenate(([0], np.cumsum(altitudes)))
+    return (sums[last + 1] - sums[first]) / (last + 1 - first)
+
+
+@register_derived_column("smoothed_gradient", ("smoothed_altitude", "distance"), "Smoothed Gradient", "rad")
+def _smoothed_gradient(smoothed_altitudes, distances, half_window: float = 100):
+    """ gradient of the smoothed altitude between the ends of a window along the track """
+    first, last = _window_bounds(distances, half_window)
+    span = distances[last] - distances[first]
+    rise = smoothed_altitudes[last] - smoothed_altitudes[first]
+    return np.arctan2(rise, span, out=np.zeros(len(span)), where=span > 0)
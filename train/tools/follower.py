@@ -0,0 +1,138 @@
+""" Following of gps files that are still written, e.g. during a recording
+
+GPSFileFollower
+"""
+
+import os
+import threading
+
+from PySide6.QtCore import QObject, Signal, Slot
+
+from tools.handler import GPSDataHandler, parse_gps_rows, tid_to_seconds, time_to_tid
+
+
+class GPSFileFollower(QObject):
+    """ polls a gps csv file for appended lines and appends them to a gps data handler
+
+    Only new bytes are read and parsed, in a thread. Parsed rows are appended in the gui thread
+    once per poll, so the handler emits one data_appended signal per batch. The file stat of the
+    handler is moved along with the parsed bytes, so an unchanged file is not imported again.
+    Rows are appended as parsed, they are not cleaned.
+    """
+
+    # parsed rows of one poll and the size and modification time of the parsed part, applied in the gui thread
+    _parsed = Signal(list, object)
+
+    def __init__(self, gpsdata_handler: GPSDataHandler, interval: float = 1, parent=None) -> None:
+        super().__init__(parent)
+        self._gpsdata_handler = gpsdata_handler
+        # seconds between polls
+        self.interval = interval
+
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread = None
+
+        self._parsed.connect(self._append)
+
+    def is_following(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def follow(self, file_path: str) -> None:
+        """ starts following file_path, data already in the handler for this file is continued """
+        self.stop()
+
+        handler = self._gpsdata_handler
+        if handler.file_path is not None and handler.file_path.lower() == file_path.lower() and len(handler) > 0:
+            # reading continues behind the bytes parsed on import, rows up to the last known timestamp are skipped
+            offset = handler.file_stat[0] if handler.file_stat is not None else 0
+            # line numbers of messages are estimated, repeated fixes are not counted
+            line_number = len(handler) + 2
+            first_seconds = tid_to_seconds(time_to_tid(handler[0].timeid))
+            previous_timestamp = handler[-1].timestamp
+        else:
+            handler.reset(file_path)
+            offset = 0
+            line_number = 1
+            first_seconds = None
+            previous_timestamp = None
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._poll,
+            args=(file_path, offset, line_number, first_seconds, previous_timestamp),
+            name="gps-follower",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """ stops following, rows parsed but not yet appended are discarded """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _poll(self, file_path: str, offset: int, line_number: int, first_seconds: float,
+              previous_timestamp: float) -> None:
+        """ reads and parses lines appended behind offset until stopped, runs in its own thread """
+        try:
+            offset = _line_start(file_path, offset)
+        except OSError as exception:
+            print(f"{exception}: {file_path} can not be followed.")
+            return
+
+        while not self._stop_event.is_set():
+            try:
+                with open(file_path, "rb") as file:
+                    stat = os.fstat(file.fileno())
+                    if stat.st_size < offset:
+                        print(f"{file_path} was truncated, following stopped.")
+                        return
+                    file.seek(offset)
+                    chunk = file.read(stat.st_size - offset)
+            except OSError as exception:
+                print(f"{exception}: {file_path} can not be followed anymore.")
+                return
+
+            if len(chunk) > 0:
+                # only complete lines are parsed, the rest is read again with the next poll,
+                # the files use carriage returns as line endings
+                end = max(chunk.rfind(b"\r"), chunk.rfind(b"\n")) + 1
+                if end > 0:
+                    lines = [line for line in chunk[:end].decode("ascii").splitlines() if line]
+                    if offset == 0:
+                        # skip the header line
+                        lines = lines[1:]
+                        line_number += 1
+                    offset += end
+
+                    data, first_seconds, previous_timestamp = parse_gps_rows(
+                        lines, first_seconds, previous_timestamp, line_number
+                    )
+                    line_number += len(lines)
+
+                    if not self._stop_event.is_set():
+                        self._parsed.emit(data, (offset, stat.st_mtime_ns))
+
+            self._stop_event.wait(self.interval)
+
+    @Slot(list, object)
+    def _append(self, data: list, parsed_stat: tuple) -> None:
+        if self.is_following():
+            self._gpsdata_handler.append_data(data)
+            # matches the stat of the file as long as nothing but the parsed lines was written
+            self._gpsdata_handler.file_stat = parsed_stat
+
+
+def _line_start(file_path: str, offset: int) -> int:
+    """ offset of the start of the line offset points into, a partially written line is read again """
+    if offset == 0:
+        return 0
+    with open(file_path, "rb") as file:
+        start = max(offset - 4096, 0)
+        file.seek(start)
+        chunk = file.read(offset - start)
+    end = max(chunk.rfind(b"\r"), chunk.rfind(b"\n"))
+    # without a line ending close by the file is read from the start
+    return start + end + 1 if end >= 0 else 0
@@ -0,0 +1,111 @@
+""" Pool of preallocated frame buffers, reused instead of allocating every frame
+
+FrameBufferPool
+
+OpenCV writes into a given output array if it has the right shape and type, e.g.
+video_capture.read(image=buffer), cv2.cvtColor(..., dst=buffer) or cv2.resize(..., dst=buffer),
+otherwise it allocates a new one. Playback needs the same few buffers for every frame, a pool hands
+them out and takes them back once a frame was displayed, so memory stays at a steady state instead of
+churning through a new array per step. Buffers are kept per shape and type, when a resized widget
+or another video needs buffers of a new shape, free buffers of shapes not used for the longest time
+are dropped.
+
+    buffer = pool.acquire((height, width, 3))
+    try:
+        ret, frame = video_capture.read(image=buffer)
+        ...
+    finally:
+        pool.release(buffer)
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from tools.profiling import profiler
+
+
+class FrameBufferPool:
+    """ hands out preallocated arrays by shape and type, released arrays are handed out again """
+
+    def __init__(self, max_free: int = 8) -> None:
+        # released buffers kept over all shapes, further ones are left to the garbage collector
+        self.max_free = max_free
+        # free buffers per shape and type, the shape released last is the last key
+        self._free = OrderedDict()
+        self._free_count = 0
+        # ids of handed out buffers, other arrays are not taken back
+        self._in_use = {}
+        self._lock = threading.Lock()
+
+        self.allocations = 0
+        self.reuses = 0
+        # bytes of all buffers owned by the pool, handed out or free
+        self.allocated_bytes = 0
+        self.peak_bytes = 0
+
+    def acquire(self, shape: tuple, dtype=np.uint8) -> np.ndarray:
+        """ a free buffer of shape and dtype, a new one if there is none, its content is undefined """
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                buffer = free.pop()
+                if len(free) == 0:
+                    del self._free[key]
+                self._free_count -= 1
+                self.reuses += 1
+            else:
+                buffer = np.empty(*key)
+                self.allocations += 1
+                self.allocated_bytes += buffer.nbytes
+                self.peak_bytes = max(self.peak_bytes, self.allocated_bytes)
+            self._in_use[id(buffer)] = buffer
+        self._report()
+        return buffer
+
+    def release(self, buffer: np.ndarray) -> None:
+        """ takes back a buffer of acquire, nothing may refer to its content anymore, e.g. a QImage """
+        with self._lock:
+            if self._in_use.pop(id(buffer), None) is None:
+                return
+            key = (buffer.shape, buffer.dtype)
+            self._free.setdefault(key, []).append(buffer)
+            self._free.move_to_end(key)
+            self._free_count += 1
+
+            # buffers of the shapes released longest ago are dropped first
+            while self._free_count > self.max_free:
+                oldest_key, oldest = next(iter(self._free.items()))
+                self.allocated_bytes -= oldest.pop().nbytes
+                self._free_count -= 1
+                if len(oldest) == 0:
+                    del self._free[oldest_key]
+        self._report()
+
+    def clear(self) -> None:
+        """ drops all free buffers, handed out buffers are still taken back """
+        with self._lock:
+            for free in self._free.values():
+                self.allocated_bytes -= sum(buffer.nbytes for buffer in free)
+            self._free.clear()
+            self._free_count = 0
+        self._report()
+
+    def statistics(self) -> dict:
+        """ number of allocations and reuses and the steady state and peak memory in bytes """
+        with self._lock:
+            in_use_bytes = sum(buffer.nbytes for buffer in self._in_use.values())
+            return {
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+                "in_use_bytes": in_use_bytes,
+                "allocated_bytes": self.allocated_bytes,
+                "peak_bytes": self.peak_bytes
+            }
+
+    def _report(self) -> None:
+        """ reports memory owned by the pool to the profiler, it keeps the peak """
+        if profiler.enabled:
+            profiler.gauge("FrameBufferPool [MB]", self.allocated_bytes / 1024**2)
@@ -0,0 +1,462 @@
+""" Sources of decoded video frames and the choice of the fastest one for an access pattern
+
+FrameSource
+OpenCVFrameSource
+FFmpegPipeFrameSource
+ImageDirectoryFrameSource
+MemmapFrameSource
+write_frame_store
+available_frame_sources
+select_frame_source
+open_frame_source
+
+Every source implements FrameSource. OpenCV and an FFmpeg pipe decode the video itself, OpenCV
+reads consecutive frames cheaply, the FFmpeg process decodes ahead of the reader and seeks faster
+for larger videos, but has to be restarted to seek. Stores hold frames extracted in advance,
+usually those of the gps rows, as images in a directory or as one memory mapped array, they read
+any of their frames at the same small cost. Stores are kept in the directory
+frame_store_directory(video_path), one store per format with its own metadata file, and written by
+write_frame_store or from the command line, run from the train directory:
+
+    python -m tools.framesource --video spring.mp4 --gps ../data/gps_spring.csv --format memmap
+
+Callers describe their access pattern by the step between the frames they read, e.g. 1 for
+playing a segment, fps for stepping through gps rows and None for random access, and take the
+source with the lowest read_cost that holds their frames, see open_frame_source.
+
+The module does not import Qt, it is used in decoder and worker processes and by batch.py.
+"""
+
+import os
+import json
+import glob
+import shutil
+import argparse
+import subprocess
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+from tools.profiling import section
+
+
+class FrameSource(ABC):
+    """ abstract base class for sources of decoded video frames
+
+    Frames are BGR arrays in the native resolution of the source, which can be lower than the one of
+    the video, e.g. for stores of downscaled frames. Sources differ in the cost of reading frames in
+    different access patterns, read_cost estimates it, so callers can pick the fastest source.
+    """
+
+    name = ""
+    # seconds to read the next frame and a frame at an arbitrary position of 1080p, scaled by the pixel count,
+    # medians of benchmarks.video
+    sequential_cost = 0.015
+    random_access_cost = 0.2
+    # seconds every seek takes independent of the resolution, e.g. to start a process
+    seek_overhead = 0
+
+    def __init__(self, fps: float, frame_count: int, native_resolution: tuple) -> None:
+        self.fps = fps
+        self.frame_count = frame_count
+        # width and height of the frames returned by read
+        self.native_resolution = native_resolution
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+        return False
+
+    @abstractmethod
+    def read(self, frame_number: int, out: np.ndarray = None) -> np.ndarray:
+        """ frame with frame_number, written into out if it has the native resolution, None if it can not be read """
+        raise NotImplementedError(
+            "Should implement"
+        )
+
+    def contains(self, frame_numbers) -> bool:
+        """ True if all frame_numbers, a frame number or an array of them, can be read """
+        frame_numbers = np.asarray(frame_numbers)
+        return bool(np.all((frame_numbers >= 0) & (frame_numbers < self.frame_count)))
+
+    def read_cost(self, step: int = None) -> float:
+        """ estimated seconds to read the frame step frames after the last one, an arbitrary frame if step is None
+
+        Frames in between are decoded, unless seeking is cheaper.
+        """
+        scale = self.native_resolution[0] * self.native_resolution[1] / (1920 * 1080)
+        random_access_cost = self.random_access_cost * scale + self.seek_overhead
+        if step is None:
+            return random_access_cost
+        return min(max(step, 1) * self.sequential_cost * scale, random_access_cost)
+
+    def max_skip(self) -> int:
+        """ frames ahead that are faster to decode and discard than to seek over """
+        sequential_cost = self.read_cost(1)
+        # sources that could not be opened have no resolution
+        return int(self.read_cost() / sequential_cost) if sequential_cost > 0 else 0
+
+    def close(self) -> None:
+        """ releases files and processes of the source """
+
+
+def frame_store_directory(video_path: str) -> str:
+    """ directory the stores of extracted frames of a video are kept in """
+    return os.path.splitext(video_path)[0] + "_frames"
+
+
+def _copy_into(frame: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """ frame copied into out if it has the same shape and is writeable, otherwise frame itself """
+    if out is None or out.shape != frame.shape or not out.flags.writeable:
+        return frame
+    np.copyto(out, frame)
+    return out
+
+
+class OpenCVFrameSource(FrameSource):
+    """ frames decoded by cv2.VideoCapture with a selectable backend and number of decoding threads """
+
+    name = "opencv"
+    sequential_cost = 0.015
+    random_access_cost = 0.2
+
+    def __init__(self, video_path: str, video_capture: cv2.VideoCapture = None, backend: int = cv2.CAP_ANY,
+                 threads: int = 0) -> None:
+        if video_capture is None:
+            # 0 threads lets the backend choose
+            parameters = [cv2.CAP_PROP_N_THREADS, threads] if threads > 0 else []
+            video_capture = cv2.VideoCapture(video_path, backend, parameters)
+        self.video_capture = video_capture
+        super().__init__(
+            video_capture.get(cv2.CAP_PROP_FPS),
+            int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+            (int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        )
+        # frame number of the next frame read would return
+        self._position = int(video_capture.get(cv2.CAP_PROP_POS_FRAMES))
+        # frames up to this far ahead are reached faster by grabbing than by seeking to the previous key frame
+        self.max_grab = self.max_skip()
+
+    def is_opened(self) -> bool:
+        return self.video_capture.isOpened()
+
+    def read(self, frame_number: int, out: np.ndarray = None) -> np.ndarray:
+        if self._position <= frame_number <= self._position + self.max_grab:
+            for _ in range(frame_number - self._position):
+                self.video_capture.grab()
+        else:
+            with section("VideoCapture.set"):
+                self.video_capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+
+        with section("VideoCapture.read"):
+            ret, frame = self.video_capture.read(image=out)
+        self._position = frame_number + 1
+        if not ret:
+            # the position after a failed read is unknown
+            self._position = -self.max_grab - 1
+            return None
+        return frame
+
+    def close(self) -> None:
+        self.video_capture.release()
+
+
+class FFmpegPipeFrameSource(FrameSource):
+    """ raw frames streamed from an ffmpeg process, restarted at the frame to seek to
+
+    The executable is taken from COT_FFMPEG or found on the path, see is_available.
+    """
+
+    name = "ffmpeg"
+    sequential_cost = 0.02
+    random_access_cost = 0.06
+    seek_overhead = 0.015
+
+    def __init__(self, video_path: str, threads: int = 0) -> None:
+        # the properties are probed with OpenCV, it is needed anyway
+        probe = cv2.VideoCapture(video_path)
+        super().__init__(
+            probe.get(cv2.CAP_PROP_FPS),
+            int(probe.get(cv2.CAP_PROP_FRAME_COUNT)),
+            (int(probe.get(cv2.CAP_PROP_FRAME_WIDTH)), int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        )
+        probe.release()
+        self.video_path = video_path
+        self.threads = threads
+        self._process: subprocess.Popen = None
+        self._position = 0
+        self._frame_size = self.native_resolution[0] * self.native_resolution[1] * 3
+        # skipped frames are read into this buffer
+        self._skipped: np.ndarray = None
+
+    @staticmethod
+    def executable() -> str:
+        return os.environ.get("COT_FFMPEG") or shutil.which("ffmpeg")
+
+    @staticmethod
+    def is_available() -> bool:
+        executable = FFmpegPipeFrameSource.executable()
+        return executable is not None and os.path.isfile(executable)
+
+    def read(self, frame_number: int, out: np.ndarray = None) -> np.ndarray:
+        if self._process is None or not self._position <= frame_number <= self._position + self.max_skip():
+            self._start(frame_number)
+
+        while self._position < frame_number:
+            if self._skipped is None:
+                self._skipped = np.empty(self.native_resolution[::-1] + (3,), dtype=np.uint8)
+            if self._read_into(self._skipped) is None:
+                return None
+
+        if out is None or out.shape != self.native_resolution[::-1] + (3,):
+            out = np.empty(self.native_resolution[::-1] + (3,), dtype=np.uint8)
+        return self._read_into(out)
+
+    def close(self) -> None:
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process.stdout.close()
+            self._process = None
+
+    def _start(self, frame_number: int) -> None:
+        """ starts streaming at frame_number, ffmpeg decodes from the previous key frame and drops the frames before """
+        self.close()
+        command = [
+            self.executable(), "-v", "error", "-nostdin",
+            "-ss", f"{frame_number / self.fps:.6f}", "-i", self.video_path,
+            "-map", "0:v:0", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"
+        ]
+        if self.threads > 0:
+            command[1:1] = ["-threads", str(self.threads)]
+        self._process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=self._frame_size)
+        self._position = frame_number
+
+    def _read_into(self, out: np.ndarray) -> np.ndarray:
+        """ next frame of the stream into out, None at the end of the video """
+        if self._process.stdout.readinto(memoryview(out).cast("B")) != self._frame_size:
+            self.close()
+            return None
+        self._position += 1
+        return out
+
+
+class _FrameStore(FrameSource):
+    """ frames extracted in advance, their frame numbers and the video properties are stored with them """
+
+    def __init__(self, directory: str, store_format: str, frame_numbers: np.ndarray) -> None:
+        with open(_FrameStore.metadata_path(directory, store_format), "r", encoding="ascii") as file:
+            metadata = json.load(file)
+        super().__init__(metadata["fps"], metadata["frame_count"], tuple(metadata["native_resolution"]))
+        self.directory = directory
+        self.store_format = store_format
+        # sorted frame numbers of the stored frames
+        self.frame_numbers = np.asarray(frame_numbers, dtype=np.int64)
+
+    @staticmethod
+    def metadata_path(directory: str, store_format: str) -> str:
+        """ file with fps, frame count and resolution of the store of store_format, e.g. source.memmap.json """
+        return os.path.join(directory, f"source.{store_format}.json")
+
+    def contains(self, frame_numbers) -> bool:
+        return bool(np.all(np.isin(frame_numbers, self.frame_numbers)))
+
+    def _index(self, frame_number: int) -> int:
+        """ position of frame_number in the store, None if it is not stored """
+        index = int(np.searchsorted(self.frame_numbers, frame_number))
+        if index < len(self.frame_numbers) and self.frame_numbers[index] == frame_number:
+            return index
+        return None
+
+
+class ImageDirectoryFrameSource(_FrameStore):
+    """ frames stored as images named by their frame number, e.g. 00001250.jpg, extension is jpg or png """
+
+    name = "images"
+    # every stored frame costs the same
+    sequential_cost = 0.02
+    random_access_cost = 0.02
+
+    def __init__(self, directory: str, extension: str = "jpg") -> None:
+        self._paths = {}
+        for path in _image_paths(directory, extension):
+            self._paths[int(os.path.splitext(os.path.basename(path))[0])] = path
+        super().__init__(directory, extension, sorted(self._paths))
+
+    def read(self, frame_number: int, out: np.ndarray = None) -> np.ndarray:
+        path = self._paths.get(frame_number)
+        if path is None:
+            return None
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        return _copy_into(frame, out)
+
+
+class MemmapFrameSource(_FrameStore):
+    """ frames stored in one memory mapped array, reading a frame is a copy from the page cache """
+
+    name = "memmap"
+    sequential_cost = 0.001
+    random_access_cost = 0.001
+
+    def __init__(self, directory: str) -> None:
+        self._frames = np.load(os.path.join(directory, "frames.npy"), mmap_mode="r")
+        super().__init__(directory, "memmap", np.load(os.path.join(directory, "frame_numbers.npy")))
+
+    def read(self, frame_number: int, out: np.ndarray = None) -> np.ndarray:
+        """ frame copied into out, without out a read only view of the store """
+        index = self._index(frame_number)
+        if index is None:
+            return None
+        return _copy_into(self._frames[index], out) if out is not None else self._frames[index]
+
+    def close(self) -> None:
+        self._frames = None
+
+
+def _image_paths(directory: str, extension: str) -> list:
+    """ paths of the images of frames with extension in directory """
+    return [
+        path for path in glob.glob(os.path.join(directory, f"*[0-9].{extension}"))
+        if os.path.splitext(os.path.basename(path))[0].isdigit()
+    ]
+
+
+def write_frame_store(source: FrameSource, directory: str, frame_numbers, store_format: str = "memmap",
+                      scale: float = 1) -> int:
+    """ writes the frames of source with frame_numbers to directory, returns the number of written frames
+
+    store_format is "memmap", "jpg" or "png", frames are resized by scale. Existing frames of the
+    format in directory are replaced, stores of the other formats are kept.
+    """
+    frame_numbers = np.unique(np.asarray(frame_numbers, dtype=np.int64))
+    frame_numbers = frame_numbers[(frame_numbers >= 0) & (frame_numbers < source.frame_count)]
+    width, height = (int(round(value * scale)) for value in source.native_resolution)
+    os.makedirs(directory, exist_ok=True)
+
+    frames = None
+    if store_format != "memmap":
+        for path in _image_paths(directory, store_format):
+            os.remove(path)
+    else:
+        frames = np.lib.format.open_memmap(
+            os.path.join(directory, "frames.npy"), mode="w+", dtype=np.uint8,
+            shape=(len(frame_numbers), height, width, 3)
+        )
+
+    written = []
+    for frame_number in frame_numbers.tolist():
+        frame = source.read(frame_number)
+        if frame is None:
+            print(f"Frame {frame_number} could not be read, the store ends before it.")
+            break
+        if scale != 1:
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        if frames is not None:
+            frames[len(written)] = frame
+        else:
+            cv2.imwrite(os.path.join(directory, f"{frame_number:08d}.{store_format}"), frame)
+        written.append(frame_number)
+
+    if frames is not None:
+        frames.flush()
+        del frames
+        if len(written) < len(frame_numbers):
+            # the array is shortened to the frames that were read
+            stored = np.load(os.path.join(directory, "frames.npy"), mmap_mode="r")[:len(written)].copy()
+            np.save(os.path.join(directory, "frames.npy"), stored)
+        np.save(os.path.join(directory, "frame_numbers.npy"), np.array(written, dtype=np.int64))
+
+    with open(_FrameStore.metadata_path(directory, store_format), "w", encoding="ascii") as file:
+        json.dump({"fps": source.fps, "frame_count": source.frame_count, "native_resolution": [width, height]}, file)
+    return len(written)
+
+
+def available_frame_sources(video_path: str, video_source: OpenCVFrameSource = None) -> list:
+    """ all sources of the video that can be opened, the OpenCV source first
+
+    video_source is used as OpenCV source instead of opening another one.
+    """
+    sources = [video_source if video_source is not None else OpenCVFrameSource(video_path)]
+    if FFmpegPipeFrameSource.is_available():
+        sources.append(FFmpegPipeFrameSource(video_path))
+
+    directory = frame_store_directory(video_path)
+    for store_format in ("memmap", "jpg", "png"):
+        if not os.path.isfile(_FrameStore.metadata_path(directory, store_format)):
+            continue
+        try:
+            if store_format == "memmap":
+                source = MemmapFrameSource(directory)
+            else:
+                source = ImageDirectoryFrameSource(directory, store_format)
+        except (OSError, ValueError, KeyError) as exception:
+            print(f"{exception}: {store_format} frame store in {directory} could not be opened.")
+            continue
+        if len(source.frame_numbers) > 0:
+            sources.append(source)
+    return sources
+
+
+def select_frame_source(sources: list, step: int = None, frame_numbers=None, resolution: tuple = None) -> FrameSource:
+    """ source with the lowest read_cost for step that holds frame_numbers in resolution
+
+    The resolution defaults to the one of the first source, the video. Returns None if no source fits.
+    """
+    if resolution is None and len(sources) > 0:
+        resolution = sources[0].native_resolution
+    candidates = [
+        source for source in sources
+        if source.native_resolution == tuple(resolution) and (frame_numbers is None or source.contains(frame_numbers))
+    ]
+    if len(candidates) == 0:
+        return None
+    # the first source wins ties
+    return min(candidates, key=lambda source: source.read_cost(step))
+
+
+def open_frame_source(video_path: str, step: int = None, frame_numbers=None, resolution: tuple = None) -> FrameSource:
+    """ fastest source of the video for reading frames step apart, see select_frame_source
+
+    The other sources are closed, OpenCV is used if no source fits.
+    """
+    sources = available_frame_sources(video_path)
+    selected = select_frame_source(sources, step, frame_numbers, resolution) or sources[0]
+    for source in sources:
+        if source is not selected:
+            source.close()
+    return selected
+
+
+def main(argv: list = None) -> int:
+    """ writes a store of the frames of all gps rows of a recording """
+    # the gps handler is only needed to write stores
+    from tools.handler import GPSDataHandler
+    from tools.math import frame_number_at
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True, help="video file")
+    parser.add_argument("--gps", required=True, help="gps csv file, the frames of its rows are stored")
+    parser.add_argument("--format", default="memmap", choices=["memmap", "jpg", "png"])
+    parser.add_argument("--scale", type=float, default=1, help="factor the frames are resized by")
+    args = parser.parse_args(argv)
+
+    gpsdata = GPSDataHandler()
+    gpsdata.read_csv_data(args.gps)
+    with OpenCVFrameSource(args.video) as source:
+        if not source.is_opened():
+            print(f"Video {args.video} could not be opened.")
+            return 1
+        frame_numbers = frame_number_at(source.fps, gpsdata.columns["timestamp"])
+        directory = frame_store_directory(args.video)
+        count = write_frame_store(source, directory, frame_numbers, args.format, args.scale)
+    print(f"{count} frames written to {directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,8 @@
 """ All handler class definitions 
 
 GPSDataHandler
+MultiTrackHandler
+CalibrationTimeline
 KeyFrameHandler
 SessionHandler
 
@@ -9,142 +11,349 @@ SessionHandler
 import json
 import csv
 import os
-from math import atan2
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import time, datetime
 
+import numpy as np
+
 from PySide6.QtWidgets import QMenuBar, QMenu
 from PySide6.QtCore import Signal, QObject
 from PySide6.QtGui import QAction
 
-from COTdataclasses import GPSDatum, SessionData, KeyFrame, IntrinsicCameraParameters, ExtrinsicCameraParameters
-from tools.math import determine_camera_parameters, distance_between_geo_coordinates
+from COTdataclasses import GPSDatum, SessionData, KeyFrame, ImagePointContainer, \
+                          IntrinsicCameraParameters, ExtrinsicCameraParameters
+from tools.math import determine_camera_parameters, distances_between_geo_coordinates, cumulative_distance
+from tools.cache import GPSDataCache
+from tools.spatial import SpatialIndex
+from tools.candidates import track_geometry, rank_keyframe_candidates
+from tools.stops import StopIndex
+from tools.derived import DERIVED_COLUMNS, gradients
+from tools.cleaning import clean_columns
+from tools.profiling import timed
+
+
+def tid_to_seconds(tid):
+    """ seconds of the day of a time id in the csv format HHMMSScc, works on numpy arrays too """
+    return 3600 * (tid // 1000000) + 60 * (tid // 10000 % 100) + tid // 100 % 100 + tid % 100 / 100
+
+
+def seconds_to_tid(seconds):
+    """ time id in the csv format HHMMSScc of seconds of the day, works on numpy arrays too """
+    hundredths = np.round(np.asarray(seconds) * 100).astype(np.int64)
+    return (
+        1000000 * (hundredths // 360000) + 10000 * (hundredths // 6000 % 60) +
+        100 * (hundredths // 100 % 60) + hundredths % 100
+    )
+
+
+def file_stat(file_path: str) -> tuple:
+    """ size and modification time of a file, None if it can not be read """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def tid_to_time(tid: int) -> time:
+    """ clock time of a time id in the csv format HHMMSScc """
+    return time(hour=tid//1000000, minute=tid//10000%100, second=tid//100%100, microsecond=tid%100*10000)
+
+
+def time_to_tid(timeid: time) -> int:
+    """ time id in the csv format HHMMSScc of a clock time """
+    return 1000000 * timeid.hour + 10000 * timeid.minute + 100 * timeid.second + timeid.microsecond // 10000
+
+
+def parse_gps_rows(lines: list, first_seconds: float = None, previous_timestamp: float = None,
+                   first_line: int = 1, progress_callback= None) -> tuple:
+    """ converts lines of a gps csv file without header to a list of GPSDatum
+
+    Timestamps are relative to first_seconds, the seconds of the day of the first row by default.
+    Fixes up to previous_timestamp are skipped silently, e.g. rows that were parsed before,
+    repeated or out of order fixes are skipped and counted.
+    Returns the data, first_seconds and the last timestamp, to continue parsing with further lines.
+    progress_callback is called with the parsed fraction, first_line is used for messages.
+    """
+    data = []
+    skipped_count = 0
+    line_count = len(lines)
+    known_timestamp = previous_timestamp
+
+    for line_number, row in enumerate(csv.reader(lines), first_line):
+        if progress_callback is not None and line_number % 1000 == 0:
+            progress_callback((line_number - first_line) / line_count)
+
+        try:
+            # catch all header values as strings
+            tid, lat, lon, speed, course, alt = row
+
+            # time id is given as a clock time with hundredths, so 12:34:56.78 is 12345678
+            tid = int(tid)
+            seconds = tid_to_seconds(tid)
+
+            # remember first t
+            if first_seconds is None:
+                first_seconds = seconds
+
+            # seconds from start, rounded to the resolution of the time id
+            timestamp = round(seconds - first_seconds, 2)
+
+            # the logger repeats fixes or writes them out of order, only increasing times are kept
+            if previous_timestamp is not None and timestamp <= previous_timestamp:
+                if known_timestamp is None or timestamp > known_timestamp:
+                    skipped_count += 1
+                continue
+
+            data.append(GPSDatum(
+                tid_to_time(tid),
+                timestamp,
+                # latitude and longitude are given in decimal geographical degrees multiplied by 100000
+                float(int(lat)) / 10**5,
+                float(int(lon)) / 10**5,
+                # speed is given in 10m/h, converted to km/h
+                float(int(speed)) / 10**2,
+                # course is not used
+                int(course),
+                # altitude is given in cm, converted to m
+                float(int(alt)) / 10**2
+                # gradient is added later
+            ))
+            previous_timestamp = timestamp
+
+        except Exception as exception:
+            print(
+                f'{exception}: Row {line_number} with values {row} could not be converted.'
+            )
+
+    if skipped_count > 0:
+        print(f"{skipped_count} repeated or out of order fixes were skipped.")
+
+    return data, first_seconds, previous_timestamp
 
 
 class GPSDataHandler(QObject):
     """Data container for GPS data from specific csv format"""
 
     gpsdatum_requested = Signal(GPSDatum)
+    # index of the first row appended by append_data, emitted once per appended batch
+    data_appended = Signal(int)
 
-    def __init__(self) -> None:
+    # names of the columns created by to_columns
+    column_names = ("tid", "timestamp", "latitude", "longitude", "speed", "course", "altitude", "gradient")
+    # columns that are interpolated linearly between fixes
+    interpolated_column_names = ("latitude", "longitude", "speed", "altitude", "gradient")
+
+    def __init__(self, cache: GPSDataCache = None) -> None:
         super().__init__()
         self.data = []
         self._file_path :str = None
+        # size and modification time of the file when data was read from it, see is_current
+        self.file_stat: tuple = None
+        # columns of data, created on first use
+        self._columns: dict = None
+        # version of every column, changed with the column, see derived
+        self._versions = dict.fromkeys(GPSDataHandler.column_names, 0)
+        # derived columns by name with the versions of the columns they were computed from
+        self._derived = {}
+        # index of coordinates for queries by location, created on first use
+        self._spatial_index: SpatialIndex = None
+        # periods the train stands still, created on first use
+        self._stops: StopIndex = None
+        # optional persistent cache of parsed columns
+        self.cache = cache
 
     def __getitem__(self, index: int) -> GPSDatum:
         return self.data[index]
 
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @timed()
     def read_csv_data(self, _file_path):
         """ Reads data from specific gps csv files and converts them to a list of tuples """
 
-        # Return if function is called with the same argument
-        if self._file_path is not None and _file_path.lower() == self._file_path.lower():
+        # Return if the file was read before and did not change since
+        if self.is_current(_file_path):
+            return
+
+        # use memory mapped columns, if the file was parsed before
+        if self.load_cached_data(_file_path):
             return
 
+        self.parse_csv_data(_file_path)
+        self.add_gradient()
+        self.store_cached_data()
+
+    def load_cached_data(self, _file_path, variant: str = "") -> bool:
+        """ loads data including gradient from cache, returns False if there is no cache or entry
+
+        variant selects differently processed data of the file, e.g. "cleaned", see clean_data.
+        """
+        if self.cache is None:
+            return False
+
+        # before hashing, a file that is still written may grow meanwhile
+        stat = file_stat(_file_path)
+        columns = self.cache.load(_file_path, GPSDataHandler.column_names, variant)
+        if columns is None:
+            return False
+
+        self.from_columns(columns, _file_path, stat)
+        return True
+
+    def store_cached_data(self, variant: str = ""):
+        """ stores data of the current file in the cache, if there is one """
+        if self.cache is not None and self._file_path is not None:
+            self.cache.store(self._file_path, self.columns, variant)
+
+    @timed()
+    def parse_csv_data(self, _file_path, progress_callback= None):
+        """ parses csv file without deriving any values, calls progress_callback with the parsed fraction """
+
         with open(_file_path, 'r', encoding='ascii') as file:
 
             # Discard data if a new file_path is provided
-            if self.data is not None:
-                del self.data
-                self.data = []
-
-            # Set file path
-            self._file_path = _file_path
-
-            # Read with csv module
-            csv_reader = csv.reader(file)
-            _ = next(csv_reader)  # skip the header line
-
-            first_timestamp: int = None
-
-            for row in csv_reader:
-                try:
-                    # catch all header values as strings
-                    tid, lat, lon, speed, course, alt = row
-
-                    # time id is given as a clock time in milliseconds, so 12:34 is 12340000
-                    # gps coordinates seem to have been created only every second
-                    # so it is converted to total amount of seconds
-                    s = int(int(tid)/100)%100
-                    m = int(int(tid)/10000)%100
-                    h = int(int(tid)/1000000)
-
-                    timestamp = 3600 * h + 60 * m + s
-
-                    # remember first t
-                    if first_timestamp is None:
-                        first_timestamp = timestamp
-
-                    row_data = GPSDatum(
-                        time(hour=h, minute=m, second=s),
-                        timestamp - first_timestamp,
-                        # latitude and longitude are given in decimal geographical degrees multiplied by 100000
-                        float(int(lat)) / 10**5,
-                        float(int(lon)) / 10**5,
-                        # speed is given in 10m/h, converted to km/h
-                        float(int(speed)) / 10**2,
-                        # course is not used
-                        int(course),
-                        # altitude is given in cm, converted to m
-                        float(int(alt)) / 10**2
-                        # gradient is added later
-                    )
-
-                    self.data.append(row_data)
-
-                except Exception as exception:
-                    print(
-                        f'{exception}: Row {csv_reader.line_num} with values {row} could not be converted.'
-                    )
-            
-            self.add_gradient()
-
-    def add_gradient(self):
-        """ adds the gradient value to all gpsdata """
+            self.reset(_file_path)
+            stat = os.fstat(file.fileno())
+            self.file_stat = (stat.st_size, stat.st_mtime_ns)
+
+            # Read all lines at once to know the progress
+            lines = file.read().splitlines()
+
+            # skip the header line
+            self.data, _, _ = parse_gps_rows(lines[1:], first_line=2, progress_callback=progress_callback)
+
+    def reset(self, _file_path: str = None):
+        """ discards all data, e.g. before a file is parsed or followed """
+        self.data = []
+        self._columns = None
+        self._touch(*GPSDataHandler.column_names)
+        self._spatial_index = None
+        self._stops = None
+        self._file_path = _file_path
+        self.file_stat = None
+
+    def is_current(self, _file_path: str) -> bool:
+        """ True if data was read from _file_path and the file did not change since """
+        return self._file_path is not None and self._file_path.lower() == _file_path.lower() \
+            and self.file_stat is not None and self.file_stat == file_stat(_file_path)
+
+    def append_data(self, data: list):
+        """ appends parsed data, e.g. of a file that is still recorded, and derives values of the new rows only """
+        if len(data) == 0:
+            return
+        start = len(self.data)
+        self.data.extend(data)
+        self._update_columns(start)
+        self._touch(*GPSDataHandler.column_names)
+
+        # the gradient of the previous last row depends on the first new row
+        self.add_gradient(max(start - 1, 0))
+        self.data_appended.emit(start)
+
+    def take_data(self, other: "GPSDataHandler"):
+        """ takes over data and file path of another handler, e.g. one that was loaded in a worker """
+        self.data = other.data
+        self._columns = other._columns
+        self._versions = other._versions
+        self._derived = other._derived
+        self._spatial_index = other._spatial_index
+        self._stops = other._stops
+        self._file_path = other.file_path
+        self.file_stat = other.file_stat
+
+    @timed()
+    def add_gradient(self, start: int = 0):
+        """ adds the gradient value to all gpsdata from index start on, see tools.derived.gradients """
         item_count = len(self.data)
         if item_count == 0:
             return
-        
-        gpsdatum: GPSDatum
-        for i, gpsdatum in enumerate(self.data):
-            # skip first and last item
-            if i == 0 or i == item_count - 1:
-                gpsdatum.gradient = 0
-                continue
 
-            gradient = 0
-            gradients = []
+        # the gradient of a row depends on the row before it
+        first = max(start - 1, 0)
+        columns = self.columns
+        values = gradients(
+            columns["latitude"][first:], columns["longitude"][first:], columns["altitude"][first:]
+        )[start - first:]
 
-            # get the preavious and following gpsdata
-            previous: GPSDatum = self.data[i-1]
-            following: GPSDatum = self.data[i+1]
+        for gpsdatum, gradient in zip(self.data[start:], values.tolist()):
+            gpsdatum.gradient = gradient
+        # cached columns may be read only
+        columns["gradient"] = np.concatenate((columns["gradient"][:start], values))
+        self._touch("gradient")
 
-            # calculate gradient from previous to current
-            distance = distance_between_geo_coordinates(
-                previous.latitude, previous.longitude,
-                gpsdatum.latitude, gpsdatum.longitude
-            )
+    @timed()
+    def clean_data(self, **options) -> dict:
+        """ replaces jumps, repeated fixes and the noisy altitude by cleaned values, see tools.cleaning
 
-            d_altitude = gpsdatum.altitude - previous.altitude
+        options are passed to clean_columns, the gradient is recalculated. Returns the statistics
+        of clean_columns.
+        """
+        if len(self.data) == 0:
+            return {}
+        cleaned, statistics = clean_columns(self.columns, **options)
+        self.from_columns(cleaned, self._file_path, self.file_stat)
+        self.add_gradient()
+        return statistics
 
-            if distance > 0:
-                gradients.append(atan2(d_altitude, distance))
+    def _update_columns(self, start: int):
+        """ recreates columns from index start on, columns before start are kept """
+        if self._columns is None or start == 0:
+            self._columns = None
+            return
 
-            # calculate gradient from current to following
-            distance = distance_between_geo_coordinates(
-                gpsdatum.latitude, gpsdatum.longitude,
-                following.latitude, following.longitude
-            )
+        tail = self.to_columns(start)
+        self._columns = {
+            name: np.concatenate([column[:start], tail[name]]) for name, column in self._columns.items()
+        }
 
-            d_altitude = following.altitude - gpsdatum.altitude
+    def to_columns(self, start: int = 0) -> dict:
+        """ converts data from index start on to a dict of numpy arrays, one per field of GPSDatum """
+        data = self.data[start:]
+        return {
+            # time id is stored in the same format as in the csv files (HHMMSScc)
+            "tid": np.array([time_to_tid(d.timeid) for d in data], dtype=np.int64),
+            "timestamp": np.array([d.timestamp for d in data], dtype=np.float64),
+            "latitude": np.array([d.latitude for d in data], dtype=np.float64),
+            "longitude": np.array([d.longitude for d in data], dtype=np.float64),
+            "speed": np.array([d.speed for d in data], dtype=np.float64),
+            "course": np.array([d.course for d in data], dtype=np.int64),
+            "altitude": np.array([d.altitude for d in data], dtype=np.float64),
+            "gradient": np.array([d.gradient for d in data], dtype=np.float64)
+        }
 
-            if distance > 0:
-                gradients.append(atan2(d_altitude, distance))
+    def from_columns(self, columns: dict, _file_path: str, _file_stat: tuple = None):
+        """ replaces data with columns as created by to_columns, gradient is not recalculated
 
-            # take mean of calculated gradients
-            if len(gradients) > 0:
-                gradient = sum(gradients)/len(gradients)
-            
-            gpsdatum.gradient = gradient
+        _file_stat is the file_stat of the file when the columns were read from it, if known.
+        """
+        self._file_path = _file_path
+        self.file_stat = _file_stat
+        self._columns = columns
+        self._touch(*GPSDataHandler.column_names)
+        self._spatial_index = None
+        self._stops = None
+
+        # convert to python types once instead of per item
+        tids = columns["tid"].tolist()
+        self.data = [
+            GPSDatum(
+                tid_to_time(tid),
+                timestamp, latitude, longitude, speed, course, altitude, gradient
+            )
+            for tid, timestamp, latitude, longitude, speed, course, altitude, gradient in zip(
+                tids,
+                columns["timestamp"].tolist(),
+                columns["latitude"].tolist(),
+                columns["longitude"].tolist(),
+                columns["speed"].tolist(),
+                columns["course"].tolist(),
+                columns["altitude"].tolist(),
+                columns["gradient"].tolist()
+            )
+        ]
 
     def request_gpsdatum(self, gpsdatum: GPSDatum):
         self.gpsdatum_requested.emit(gpsdatum)
@@ -174,17 +383,150 @@ class GPSDataHandler(QObject):
         """ provides list of timestamps"""
         return [gpsdatum.timestamp for gpsdatum in self.data]
 
-    def closest_datum_by_timestamp(self, timestamp: int) -> GPSDatum:
-        
-        # find timestamp that is closest to the sought one
-        timestamps = [*self.list_of_timestamps()]
-        closest_timestamp = min(
-            timestamps,
-            key=lambda x:abs(x-timestamp)
+    def closest_datum_by_timestamp(self, timestamp: float) -> GPSDatum:
+        """ gps datum with the timestamp closest to the sought one, the earlier one on ties """
+        timeline = self.columns["timestamp"]
+        index = int(np.searchsorted(timeline, timestamp))
+
+        # choose the closer of both neighbours
+        if index == len(timeline) or (index > 0 and timestamp - timeline[index - 1] <= timeline[index] - timestamp):
+            index -= 1
+        return self.data[index]
+
+    def index_by_timestamp(self, timestamp: float) -> int:
+        """ index of the gps datum with exactly this timestamp, by binary search """
+        index = int(np.searchsorted(self.columns["timestamp"], timestamp))
+        if index == len(self.data) or self.data[index].timestamp != timestamp:
+            raise ValueError(f"{timestamp} is not a timestamp of the gps data")
+        return index
+
+    def index_by_distance(self, distance: float) -> int:
+        """ index of the gps datum closest to distance in meters along the track, by binary search """
+        distances = self.distances
+        index = int(np.searchsorted(distances, distance))
+
+        # choose the closer of both neighbours
+        if index == len(distances) or (index > 0 and distance - distances[index - 1] <= distances[index] - distance):
+            index -= 1
+        return index
+
+    def closest_datum_by_distance(self, distance: float) -> GPSDatum:
+        """ gps datum closest to distance in meters along the track """
+        return self.data[self.index_by_distance(distance)]
+
+    def index_by_coordinate(self, latitude: float, longitude: float) -> int:
+        """ index of the gps datum closest to a coordinate in decimal degrees, see SpatialIndex """
+        index, _ = self.spatial_index.nearest(latitude, longitude)
+        return index
+
+    def closest_datum_by_coordinate(self, latitude: float, longitude: float) -> GPSDatum:
+        """ gps datum closest to a coordinate in decimal degrees """
+        return self.data[self.index_by_coordinate(latitude, longitude)]
+
+    def indices_within(self, latitude: float, longitude: float, radius: float) -> np.ndarray:
+        """ indices of all gps data within radius meters of a coordinate, closest first """
+        return self.spatial_index.within(latitude, longitude, radius)
+
+    def keyframe_candidates(self, count: int = 20, window_length: float = 150) -> np.ndarray:
+        """ indices of rows where the track ahead is straightest and most level, best first, see tools.candidates """
+        distances = self.distances
+        geometry = track_geometry(self.columns, distances, window_length)
+        return rank_keyframe_candidates(geometry["cost"], distances, count, window_length)
+
+    def interpolate(self, timestamps) -> dict:
+        """ state of the track at arbitrary timestamps in seconds, e.g. the times of video frames
+
+        Position, speed, altitude and gradient are interpolated linearly, course is taken from the
+        preceding fix. Timestamps outside of the track are clamped to its ends.
+        Returns columns like to_columns for the given timestamps.
+        """
+        columns = self.columns
+        timeline = columns["timestamp"]
+        timestamps = np.clip(np.asarray(timestamps, dtype=np.float64), timeline[0], timeline[-1])
+
+        preceding = np.searchsorted(timeline, timestamps, side="right") - 1
+        state = {
+            "tid": seconds_to_tid(tid_to_seconds(columns["tid"][0]) + timestamps),
+            "timestamp": timestamps,
+            "course": columns["course"][preceding]
+        }
+        for name in GPSDataHandler.interpolated_column_names:
+            state[name] = np.interp(timestamps, timeline, columns[name])
+        return state
+
+    def state_at(self, timestamp: float) -> GPSDatum:
+        """ interpolated gps datum at a single timestamp, see interpolate """
+        state = self.interpolate(timestamp)
+        return GPSDatum(
+            tid_to_time(int(state["tid"])),
+            float(state["timestamp"]),
+            float(state["latitude"]),
+            float(state["longitude"]),
+            float(state["speed"]),
+            int(state["course"]),
+            float(state["altitude"]),
+            float(state["gradient"])
         )
-        return self.data[timestamps.index(timestamp)]
-        
 
+    @property
+    def distances(self) -> np.ndarray:
+        """ cumulative distance in meters along the track per row, created once per loaded data
+
+        Outliers of the receiver are not counted, see tools.math.cumulative_distance.
+        """
+        return self.derived("distance")
+
+    def derived(self, name: str) -> np.ndarray:
+        """ derived column by name, computed on first access and again once one of its inputs changed
+
+        See tools.derived for the registered columns.
+        """
+        version = self._version(name)
+        cached = self._derived.get(name)
+        if cached is None or cached[0] != version:
+            derived_column = DERIVED_COLUMNS[name]
+            cached = (version, derived_column.function(*[self.column(input_name) for input_name in derived_column.inputs]))
+            self._derived[name] = cached
+        return cached[1]
+
+    def column(self, name: str) -> np.ndarray:
+        """ gps column, see to_columns, or derived column by name """
+        if name in DERIVED_COLUMNS:
+            return self.derived(name)
+        return self.columns[name]
+
+    def _version(self, name: str):
+        """ version of a gps column, for a derived column the versions of its inputs """
+        if name in DERIVED_COLUMNS:
+            return tuple(self._version(input_name) for input_name in DERIVED_COLUMNS[name].inputs)
+        return self._versions[name]
+
+    def _touch(self, *names: str):
+        """ marks columns as changed, derived columns depending on them are computed again """
+        for name in names:
+            self._versions[name] += 1
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        """ index of all coordinates for nearest neighbour and radius queries, created once per loaded data """
+        if self._spatial_index is None or len(self._spatial_index) != len(self.data):
+            columns = self.columns
+            self._spatial_index = SpatialIndex(columns["latitude"], columns["longitude"])
+        return self._spatial_index
+
+    @property
+    def stops(self) -> StopIndex:
+        """ periods the train stands still, created once per loaded data """
+        if self._stops is None or self._stops.row_count != len(self.data):
+            self._stops = StopIndex(self.columns)
+        return self._stops
+
+    @property
+    def columns(self) -> dict:
+        """ data as columns, see to_columns, created once per loaded data """
+        if self._columns is None:
+            self._columns = self.to_columns()
+        return self._columns
 
     @property
     def file_path(self):
@@ -192,16 +534,297 @@ class GPSDataHandler(QObject):
         return self._file_path
 
 
+def _load_track_columns(file_path: str, cache: GPSDataCache) -> dict:
+    """ reads a gps file and returns its columns, runs in a worker process of MultiTrackHandler """
+    gpsdata = GPSDataHandler(cache)
+    gpsdata.read_csv_data(file_path)
+    # memory mapped columns of a cache hit are copied, they can not be sent to the parent process
+    return {name: np.array(column) for name, column in gpsdata.columns.items()}
+
+
+class MultiTrackHandler:
+    """ holds recordings of the same line, e.g. of every season, aligned by distance along the track
+
+    The first track is the reference. Every track gets a distance column in meters along the
+    reference track, so the same position can be looked up in every track by distance.
+    Tracks are expected to start at the same position and to follow the same line.
+    """
+
+    # distance in meter between positions of the reference track matched in the other tracks
+    anchor_spacing = 1000
+    # anchors are not matched, if the closest sample is farther away in meter
+    anchor_tolerance = 100
+
+    def __init__(self, cache: GPSDataCache = None) -> None:
+        self.cache = cache
+        # GPSDataHandler and distances along the reference track per track name, in order of loading
+        self.tracks = {}
+        self.distances = {}
+
+    def load(self, file_paths: dict, max_workers: int = None):
+        """ loads gps files given by track name concurrently, the first one is the reference """
+        # tracks may be loaded from the gui, forking a process with running Qt threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers or len(file_paths), mp_context=context) as executor:
+            futures = {
+                name: executor.submit(_load_track_columns, file_path, self.cache)
+                for name, file_path in file_paths.items()
+            }
+
+            for name, future in futures.items():
+                gpsdata = GPSDataHandler()
+                gpsdata.from_columns(future.result(), file_paths[name])
+                self.tracks[name] = gpsdata
+
+        self.distances.clear()
+        for name, gpsdata in self.tracks.items():
+            columns = gpsdata.columns
+            distances = cumulative_distance(columns["latitude"], columns["longitude"], columns["timestamp"])
+            if len(self.distances) > 0:
+                distances = self._align(distances, columns["latitude"], columns["longitude"])
+            self.distances[name] = distances
+
+    @property
+    def reference(self) -> str:
+        """ name of the reference track """
+        return next(iter(self.tracks))
+
+    def _align(self, distances: np.ndarray, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """ maps distances along a track to distances along the reference track
+
+        Positions of the reference track every anchor_spacing meters are matched to the closest sample
+        of the track, searching forward from the last match. Distances between anchors are interpolated.
+        """
+        reference_distances = self.distances[self.reference]
+        reference_columns = self.tracks[self.reference].columns
+
+        anchor_distances = np.arange(0, reference_distances[-1], self.anchor_spacing)
+        # anchors within a gap of the reference recording fall onto the row behind it, it is matched once
+        anchor_rows = np.unique(np.searchsorted(reference_distances, anchor_distances))
+
+        matched_distances = [0.0]
+        matched_reference_distances = [0.0]
+
+        for row in anchor_rows[1:].tolist():
+            # the search window spans the reference distance since the last match and half an anchor spacing,
+            # it grows with every anchor that was not matched, e.g. after a detour or a gap of the reference
+            last = matched_distances[-1]
+            window = reference_distances[row] - matched_reference_distances[-1] + 0.5 * self.anchor_spacing
+            start = np.searchsorted(distances, last, side="right")
+            end = np.searchsorted(distances, last + window)
+            if end <= start:
+                continue
+
+            gaps = distances_between_geo_coordinates(
+                reference_columns["latitude"][row], reference_columns["longitude"][row],
+                latitudes[start:end], longitudes[start:end]
+            )
+            closest = int(np.argmin(gaps))
+            if gaps[closest] > self.anchor_tolerance:
+                continue
+
+            matched_distances.append(distances[start + closest])
+            # the anchor is the first row at or behind anchor_spacing, not its exact distance
+            matched_reference_distances.append(reference_distances[row])
+
+        # behind the last anchor distances continue unscaled
+        matched_reference_distances.append(matched_reference_distances[-1] + distances[-1] - matched_distances[-1])
+        matched_distances.append(distances[-1])
+
+        return np.interp(distances, matched_distances, matched_reference_distances)
+
+    def rows_at_distance(self, distance: float) -> dict:
+        """ row of every track at distance in meters along the reference track, by binary search """
+        return {
+            name: min(int(np.searchsorted(distances, distance)), len(distances) - 1)
+            for name, distances in self.distances.items()
+        }
+
+    def timestamps_at_distance(self, distance: float) -> dict:
+        """ timestamp of every track at distance in meters, multiply with fps for the frame of a video """
+        return {
+            name: self.tracks[name][row].timestamp for name, row in self.rows_at_distance(distance).items()
+        }
+
+    def resample(self, column: str, step: float = 10) -> tuple:
+        """ values of column of every track on a common grid of distances with step meters
+
+        Returns the grid and the values per track name, the grid ends with the shortest track.
+        """
+        grid = np.arange(0, min(distances[-1] for distances in self.distances.values()), step)
+        return grid, {
+            name: np.interp(grid, self.distances[name], gpsdata.columns[column])
+            for name, gpsdata in self.tracks.items()
+        }
+
+
+class CalibrationTimeline(QObject):
+    """ camera parameters for every gps row, interpolated between calibrated keyframes
+
+    Parameters are interpolated linearly in time between the neighbouring keyframes, angles along
+    the shorter arc, and held before the first and after the last keyframe. Offsets are derived
+    from the interpolated principal length, tilt and pan like in determine_camera_parameters.
+    A changed keyframe only recomputes the rows up to its neighbouring keyframes.
+    """
+
+    # rows [start, end) whose parameters changed
+    calibration_changed = Signal(int, int)
+
+    column_names = (
+        "focal_length", "principal_length", "swing", "tilt", "pan", "x_offset", "y_offset", "z_offset"
+    )
+    # columns interpolated between keyframes, which of them are angles in degrees
+    interpolated_column_names = column_names[:5]
+    _angles = np.array([False, False, True, True, True])
+
+    def __init__(self, gpsdata_handler: GPSDataHandler) -> None:
+        super().__init__()
+        self._gpsdata_handler = gpsdata_handler
+        # calibrated keyframes sorted by timestamp, with their interpolated columns
+        self._keyframe_timestamps = np.empty(0)
+        self._keyframe_values = np.empty((0, len(CalibrationTimeline.interpolated_column_names)))
+        self._columns: dict = None
+
+        gpsdata_handler.data_appended.connect(self._extend)
+
+    def keyframe_count(self) -> int:
+        return len(self._keyframe_timestamps)
+
+    @property
+    def columns(self) -> dict:
+        """ parameters per gps row, nan without calibrated keyframes, created once per loaded data """
+        if self._columns is None or len(self._columns["swing"]) != len(self._gpsdata_handler):
+            self._columns = self._compute(self._gpsdata_handler.columns["timestamp"])
+        return self._columns
+
+    def parameters_at(self, index: int) -> tuple:
+        """ intrinsic and extrinsic camera parameters of a row, None without calibrated keyframes """
+        if self.keyframe_count() == 0:
+            return None
+        values = {name: float(column[index]) for name, column in self.columns.items()}
+        return (
+            IntrinsicCameraParameters(values["focal_length"], values["principal_length"]),
+            ExtrinsicCameraParameters(
+                values["swing"], values["tilt"], values["pan"],
+                values["x_offset"], values["y_offset"], values["z_offset"]
+            )
+        )
+
+    def _compute(self, timestamps: np.ndarray) -> dict:
+        """ parameters at timestamps, interpolated between the keyframes """
+        count = len(timestamps)
+        if self.keyframe_count() == 0:
+            return {name: np.full(count, np.nan) for name in CalibrationTimeline.column_names}
+
+        keyframe_timestamps = self._keyframe_timestamps
+        last = len(keyframe_timestamps) - 1
+        following = np.searchsorted(keyframe_timestamps, timestamps, side="right")
+        # before the first and after the last keyframe both neighbours are the same keyframe
+        preceding = np.clip(following - 1, 0, last)
+        following = np.clip(following, 0, last)
+
+        span = keyframe_timestamps[following] - keyframe_timestamps[preceding]
+        fraction = np.divide(
+            timestamps - keyframe_timestamps[preceding], span, out=np.zeros(count), where=span > 0
+        )
+
+        start = self._keyframe_values[preceding]
+        delta = self._keyframe_values[following] - start
+        # shorter arc, e.g. from 170 to -170 degrees over 180
+        delta[:, self._angles] = (delta[:, self._angles] + 180) % 360 - 180
+        values = start + fraction[:, np.newaxis] * delta
+        values[:, self._angles] = (values[:, self._angles] + 180) % 360 - 180
+
+        columns = dict(zip(CalibrationTimeline.interpolated_column_names, values.T))
+        tilt = np.radians(columns["tilt"])
+        pan = np.radians(columns["pan"])
+        planar_distance = columns["principal_length"] * np.cos(tilt)
+        columns["x_offset"] = planar_distance * np.sin(pan)
+        columns["y_offset"] = planar_distance * np.cos(pan)
+        columns["z_offset"] = columns["principal_length"] * np.sin(tilt)
+        return columns
+
+    def update_keyframe(self, keyframe: KeyFrame) -> None:
+        """ adds or replaces the calibration of a keyframe and recomputes the rows around it """
+        self.update_keyframes([keyframe])
+
+    def update_keyframes(self, keyframes: list) -> None:
+        """ adds or replaces the calibrations of keyframes, the rows around them are recomputed once """
+        changed = [keyframe.gps.timestamp for keyframe in keyframes if self._insert(keyframe)]
+        if len(changed) == 0:
+            return
+
+        if self._columns is None or len(self._columns["swing"]) != len(self._gpsdata_handler):
+            # created on next access
+            self._columns = None
+            self.calibration_changed.emit(0, len(self._gpsdata_handler))
+            return
+
+        # only rows between the keyframes neighbouring the changed ones change
+        first = int(np.searchsorted(self._keyframe_timestamps, min(changed)))
+        last = int(np.searchsorted(self._keyframe_timestamps, max(changed)))
+        timeline = self._gpsdata_handler.columns["timestamp"]
+        start = 0
+        end = len(timeline)
+        if first > 0:
+            start = int(np.searchsorted(timeline, self._keyframe_timestamps[first - 1], side="right"))
+        if last < self.keyframe_count() - 1:
+            end = int(np.searchsorted(timeline, self._keyframe_timestamps[last + 1], side="left"))
+
+        for name, column in self._compute(timeline[start:end]).items():
+            self._columns[name][start:end] = column
+        self.calibration_changed.emit(start, end)
+
+    def _insert(self, keyframe: KeyFrame) -> bool:
+        """ adds or replaces the values of a keyframe, False if it is not calibrated or unchanged """
+        if keyframe.intrinsics is None or keyframe.extrinsics is None:
+            return False
+
+        timestamp = keyframe.gps.timestamp
+        values = np.array([
+            keyframe.intrinsics.focal_length,
+            keyframe.intrinsics.principal_length,
+            keyframe.extrinsics.swing,
+            keyframe.extrinsics.tilt,
+            keyframe.extrinsics.pan
+        ])
+
+        position = int(np.searchsorted(self._keyframe_timestamps, timestamp))
+        if position < self.keyframe_count() and self._keyframe_timestamps[position] == timestamp:
+            if np.array_equal(self._keyframe_values[position], values):
+                return False
+            self._keyframe_values[position] = values
+        else:
+            self._keyframe_timestamps = np.insert(self._keyframe_timestamps, position, timestamp)
+            self._keyframe_values = np.insert(self._keyframe_values, position, values, axis=0)
+        return True
+
+    def _extend(self, start: int) -> None:
+        """ computes the rows appended to the gps data from index start on """
+        if self._columns is None or len(self._columns["swing"]) != start:
+            self._columns = None
+            return
+
+        appended = self._compute(self._gpsdata_handler.columns["timestamp"][start:])
+        for name, column in appended.items():
+            self._columns[name] = np.concatenate((self._columns[name], column))
+        self.calibration_changed.emit(start, len(self._gpsdata_handler))
+
+
 class KeyFrameHandler(QObject):
     """ handles keyframes """
 
     keyframe_requested = Signal(KeyFrame)
 
-    def __init__(self, menubar: QMenuBar) -> None:
+    def __init__(self, menubar: QMenuBar = None, gpsdata_handler: GPSDataHandler = None) -> None:
         super().__init__()
         self.current_keyframe: KeyFrame = None
         self.data = []
-        self.menu: QMenu = menubar.addMenu("Jump to Key Frame")
+        # without menubar, e.g. headless, no menu actions are created
+        self.menu: QMenu = menubar.addMenu("Jump to Key Frame") if menubar is not None else None
+        # camera parameters of every gps row, updated before keyframe_requested is emitted
+        self.calibration: CalibrationTimeline = \
+            CalibrationTimeline(gpsdata_handler) if gpsdata_handler is not None else None
 
     def from_gpsdatum(self, gpsdatum: GPSDatum) -> KeyFrame:
         try:
@@ -210,16 +833,32 @@ class KeyFrameHandler(QObject):
         except ValueError:
             return None
 
-    def request_keyframe(self, keyframe: KeyFrame) -> None:
-        # add keyframe if its not already in there
+    def add_keyframe(self, keyframe: KeyFrame) -> None:
+        """ adds keyframe and a menu action for it, if its not already in there """
         if keyframe not in self.data:
             self.data.append(keyframe)
 
+            if self.menu is None:
+                return
+
             # create an action in the main windows menubar
             request_keyframe_action = QAction(str(keyframe.gps.timestamp))
             request_keyframe_action.triggered.connect(lambda: self.request_keyframe(keyframe))
             self.menu.addAction(request_keyframe_action)
 
+    def add_keyframes(self, keyframes: list) -> None:
+        """ adds calibrated keyframes, e.g. tracked ones, keyframes at existing timestamps are kept """
+        added = [keyframe for keyframe in keyframes if keyframe not in self.data]
+        for keyframe in added:
+            self.add_keyframe(keyframe)
+
+        if self.calibration is not None:
+            self.calibration.update_keyframes(added)
+
+    def request_keyframe(self, keyframe: KeyFrame) -> None:
+        # add keyframe if its not already in there
+        self.add_keyframe(keyframe)
+
         # if keyframe has sufficient data, apply camera calibration
         if keyframe.gps is not None and keyframe.image_point is not None and keyframe.intrinsics is None:
             intrinsics: IntrinsicCameraParameters
@@ -228,13 +867,58 @@ class KeyFrameHandler(QObject):
             keyframe.intrinsics = intrinsics
             keyframe.extrinsics = extrinsics
 
+        if self.calibration is not None:
+            self.calibration.update_keyframe(keyframe)
+
         self.current_keyframe = keyframe
         self.keyframe_requested.emit(keyframe)
     
 
+KEYFRAME_CSV_HEADER = [
+    "timestamp",
+    "altitude",
+    "gradient",
+    "focallength",
+    "principallength",
+    "swing",
+    "tilt",
+    "pan",
+    "xoffset",
+    "yoffset",
+    "zoffset"
+]
+
+
+def write_keyframes_csv(path: str, keyframes: list):
+    """ writes calibrated keyframes to csv with KEYFRAME_CSV_HEADER """
+    with open(path, "w", encoding="ascii", newline="") as file:
+        writer = csv.writer(file)
+
+        writer.writerow(KEYFRAME_CSV_HEADER)
+
+        keyframe: KeyFrame
+        for keyframe in keyframes:
+            writer.writerow([
+                keyframe.gps.timestamp,
+                keyframe.gps.altitude,
+                keyframe.gps.gradient,
+                keyframe.intrinsics.focal_length,
+                keyframe.intrinsics.principal_length,
+                keyframe.extrinsics.swing,
+                keyframe.extrinsics.tilt,
+                keyframe.extrinsics.pan,
+                keyframe.extrinsics.x_offset,
+                keyframe.extrinsics.y_offset,
+                keyframe.extrinsics.z_offset
+            ])
+
+
 class SessionHandler(QObject):
     """ wrapper for dict able to read from json"""
 
+    # version of the binary session snapshot, increase on incompatible changes
+    SNAPSHOT_VERSION = 3
+
     def __init__(self) -> None:
         super().__init__()
         self.json_data = {}
@@ -244,6 +928,11 @@ class SessionHandler(QObject):
     def initialize(self, video_file_path: str, gps_file_path: str, image_width: int, image_height: int, creation_date: datetime = datetime.now()):
         self.session_data = SessionData(video_file_path, gps_file_path, image_width, image_height, creation_date)
 
+    @property
+    def snapshot_path(self) -> str:
+        """ path of the binary session snapshot, lives next to the json file """
+        return os.path.splitext(self._path)[0] + ".npz"
+
     def load(self, _path= None):
         """load data from json in static location"""
         if _path is None:
@@ -280,35 +969,127 @@ class SessionHandler(QObject):
         """ saves key frame data to csv """
         creation_date_as_string = self.session_data.creation_date.strftime("%y-%m-%d_%X")
         path = f"{creation_date_as_string}_keyframes.csv"
-        with open(path, "w", encoding="ascii") as file:
-            writer = csv.writer(file)
-
-            writer.writerow({
-                "timestamp",
-                "altitude",
-                "gradient",
-                "focallength",
-                "principallength",
-                "swing",
-                "tilt",
-                "pan",
-                "xoffset",
-                "yoffset",
-                "zoffset"
-            })
-
-            keyframe: KeyFrame
-            for keyframe in keyframe_handler.data:
-                writer.writerow([
-                    keyframe.gps.timestamp,
-                    keyframe.gps.altitude,
-                    keyframe.gps.gradient,
-                    keyframe.intrinsics.focal_length,
-                    keyframe.intrinsics.principal_length,
+        write_keyframes_csv(path, keyframe_handler.data)
+
+    def save_snapshot(self, gpsdata_handler: GPSDataHandler, keyframe_handler: KeyFrameHandler, _path= None):
+        """ saves gps columns and keyframes to a versioned binary snapshot (uncompressed npz)
+
+        Keyframe pixmaps are not stored, only the gps row they reference, frames are read again on restore.
+        """
+        if self.session_data is None or len(gpsdata_handler.data) == 0:
+            return
+        if _path is None:
+            _path = self.snapshot_path
+
+        # stat of the file when the data was read, the snapshot is outdated once the file changed since
+        gps_file_stat = gpsdata_handler.file_stat or file_stat(gpsdata_handler.file_path)
+        if gps_file_stat is None:
+            return
+        keyframe_count = len(keyframe_handler.data)
+
+        keyframe_rows = np.zeros(keyframe_count, dtype=np.int64)
+        # missing values are stored as nan
+        image_points = np.full((keyframe_count, 4, 2), np.nan)
+        intrinsics = np.full((keyframe_count, 2), np.nan)
+        extrinsics = np.full((keyframe_count, 6), np.nan)
+
+        keyframe: KeyFrame
+        for i, keyframe in enumerate(keyframe_handler.data):
+            keyframe_rows[i] = gpsdata_handler.index_by_timestamp(keyframe.gps.timestamp)
+            if keyframe.image_point is not None:
+                image_points[i] = keyframe.image_point.to_list()
+            if keyframe.intrinsics is not None:
+                intrinsics[i] = [keyframe.intrinsics.focal_length, keyframe.intrinsics.principal_length]
+            if keyframe.extrinsics is not None:
+                extrinsics[i] = [
                     keyframe.extrinsics.swing,
                     keyframe.extrinsics.tilt,
                     keyframe.extrinsics.pan,
                     keyframe.extrinsics.x_offset,
                     keyframe.extrinsics.y_offset,
                     keyframe.extrinsics.z_offset
-                ])
+                ]
+
+        columns = {f"gps_{name}": column for name, column in gpsdata_handler.columns.items()}
+
+        with open(_path, "wb") as file:
+            np.savez(
+                file,
+                version=np.array(SessionHandler.SNAPSHOT_VERSION),
+                video_file_path=np.array(self.session_data.video_file_path),
+                gps_file_path=np.array(gpsdata_handler.file_path),
+                # used to detect changes of the gps file since the snapshot was taken
+                gps_file_stat=np.array(gps_file_stat, dtype=np.int64),
+                video_properties=np.array([
+                    self.session_data.image_width or 0,
+                    self.session_data.image_height or 0,
+                    self.session_data.video_fps or 0
+                ], dtype=np.float64),
+                keyframe_rows=keyframe_rows,
+                keyframe_image_points=image_points,
+                keyframe_intrinsics=intrinsics,
+                keyframe_extrinsics=extrinsics,
+                **columns
+            )
+
+    def load_snapshot(self, gpsdata_handler: GPSDataHandler, keyframe_handler: KeyFrameHandler, _path= None) -> bool:
+        """ restores gps data and keyframes from a snapshot created by save_snapshot
+
+        Returns False if there is no snapshot for the current session or it is outdated,
+        restored keyframes have no pixmap yet.
+        """
+        if self.session_data is None:
+            return False
+        if _path is None:
+            _path = self.snapshot_path
+
+        try:
+            snapshot = np.load(_path)
+        except (FileNotFoundError, ValueError, OSError):
+            return False
+
+        with snapshot:
+            if int(snapshot["version"]) != SessionHandler.SNAPSHOT_VERSION:
+                print(f"snapshot version {int(snapshot['version'])} is not supported")
+                return False
+
+            # snapshot has to belong to the files of this session
+            gps_file_path = str(snapshot["gps_file_path"])
+            if gps_file_path.lower() != self.session_data.gps_file_path.lower() or \
+                    str(snapshot["video_file_path"]).lower() != self.session_data.video_file_path.lower():
+                return False
+
+            gps_file_stat = file_stat(gps_file_path)
+            if gps_file_stat is None or list(gps_file_stat) != snapshot["gps_file_stat"].tolist():
+                return False
+
+            gpsdata_handler.from_columns(
+                {name: snapshot[f"gps_{name}"] for name in GPSDataHandler.column_names},
+                gps_file_path,
+                gps_file_stat
+            )
+
+            image_width, image_height, video_fps = snapshot["video_properties"].tolist()
+            if image_width > 0:
+                self.session_data.image_width = int(image_width)
+                self.session_data.image_height = int(image_height)
+            if video_fps > 0:
+                self.session_data.video_fps = video_fps
+
+            for row, image_points, intrinsics, extrinsics in zip(
+                snapshot["keyframe_rows"].tolist(),
+                snapshot["keyframe_image_points"],
+                snapshot["keyframe_intrinsics"],
+                snapshot["keyframe_extrinsics"]
+            ):
+                keyframe = KeyFrame(gpsdata_handler[row], None, None, None, None)
+                if not np.isnan(image_points).any():
+                    # points are stored as floats, truncating would move sub-pixel points towards 0
+                    keyframe.image_point = ImagePointContainer(*np.rint(image_points).astype(int).tolist())
+                if not np.isnan(intrinsics).any():
+                    keyframe.intrinsics = IntrinsicCameraParameters(*intrinsics.tolist())
+                if not np.isnan(extrinsics).any():
+                    keyframe.extrinsics = ExtrinsicCameraParameters(*extrinsics.tolist())
+                keyframe_handler.add_keyframe(keyframe)
+
+        return True
@@ -0,0 +1,257 @@
+""" Loading of session data off the gui thread
+
+ImportPipeline
+ImportCancelled
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, Signal, Slot
+
+from tools.handler import GPSDataHandler
+
+
+class ImportCancelled(Exception):
+    """ raised inside a stage when the import was cancelled """
+
+
+class ImportPipeline(QObject):
+    """ imports gps data and video in stages, independent stages run concurrently
+
+    Stages:
+        gps         parse the csv file or load it from cache
+        clean       optional, remove jumps and repeated fixes and smooth the altitude, waits for gps
+        gradient    derive gradients of the parsed gps data, waits for clean
+        video       open the video and probe fps and resolution
+
+    Results are only applied to the gps data handler if the import was not cancelled. Cleaning is
+    enabled with clean_gps or COT_CLEAN_GPS=1, cleaned data is cached separately from the parsed data.
+    """
+
+    # name of the stage
+    stage_started = Signal(str)
+    # name of the stage and its progress in percent
+    stage_progress = Signal(str, int)
+    # name of the stage and its duration in seconds
+    stage_finished = Signal(str, float)
+    # overall progress in percent and a message
+    progress = Signal(int, str)
+    finished = Signal()
+    cancelled = Signal()
+    failed = Signal(str)
+    # statistics of the clean stage, see tools.cleaning.clean_columns
+    cleaned = Signal(dict)
+
+    # emitted from the coordinating thread, results are applied in the gui thread
+    _completed = Signal(object)
+
+    stage_names = ("gps", "clean", "gradient", "video")
+
+    def __init__(self, gpsdata_handler: GPSDataHandler, parent=None, clean_gps: bool = None) -> None:
+        super().__init__(parent)
+        self._gpsdata_handler = gpsdata_handler
+        if clean_gps is None:
+            clean_gps = os.environ.get("COT_CLEAN_GPS", "0") not in ("", "0")
+        self.clean_gps = clean_gps
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="import")
+        self._cancel_event = threading.Event()
+        self._coordinator: threading.Thread = None
+        self._stage_progress = {}
+
+        # identifies the inputs of the last successful import
+        self._imported_key: tuple = None
+
+        # results of the last successful import
+        self.video_capture = None
+        self.video_properties = {}
+        self.timings = {}
+        self.cleaning_statistics = {}
+
+        self._completed.connect(self._apply_results)
+
+    def is_running(self) -> bool:
+        """ True while stages of an import, that was not cancelled, are running """
+        return self._coordinator is not None and self._coordinator.is_alive() \
+            and not self._cancel_event.is_set()
+
+    def start_import(self, gps_file_path: str, video_file_path: str) -> None:
+        """ starts importing, finished is emitted immediately if inputs did not change since the last import """
+        if self.is_running():
+            return
+
+        key = (
+            self._file_key(gps_file_path),
+            self._file_key(video_file_path)
+        )
+        if key == self._imported_key:
+            self.progress.emit(100, "Unchanged")
+            self.finished.emit()
+            return
+
+        # every import has its own event, stages of a cancelled import may still be running
+        self._cancel_event = threading.Event()
+        self._stage_progress = {name: 0 for name in ImportPipeline.stage_names}
+        self.timings = {}
+
+        self._coordinator = threading.Thread(
+            target=self._run, args=(self._cancel_event, key, gps_file_path, video_file_path), daemon=True
+        )
+        self._coordinator.start()
+
+    @Slot()
+    def cancel(self) -> None:
+        """ cancels a running import, running stages stop at their next check """
+        if not self.is_running():
+            return
+        self._cancel_event.set()
+        self.progress.emit(100, "Cancelled")
+        self.cancelled.emit()
+
+    def wait(self) -> None:
+        """ blocks until the stages of the last import are finished """
+        if self._coordinator is not None:
+            self._coordinator.join()
+
+    def shutdown(self) -> None:
+        """ cancels running imports and stops worker threads """
+        self.cancel()
+        self.wait()
+        self._executor.shutdown()
+
+    @staticmethod
+    def _file_key(file_path: str) -> tuple:
+        """ path, size and modification time identify unchanged files """
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return (file_path,)
+        return (os.path.abspath(file_path).lower(), file_stat.st_size, file_stat.st_mtime_ns)
+
+    @staticmethod
+    def _check_cancelled(cancel_event: threading.Event) -> None:
+        if cancel_event.is_set():
+            raise ImportCancelled()
+
+    def _report(self, cancel_event: threading.Event, stage: str, fraction: float) -> None:
+        """ reports progress of a stage, also checks for cancellation """
+        self._check_cancelled(cancel_event)
+        percent = int(100 * fraction)
+        if percent == self._stage_progress[stage]:
+            return
+        self._stage_progress[stage] = percent
+        self.stage_progress.emit(stage, percent)
+
+        overall = sum(self._stage_progress.values()) // len(self._stage_progress)
+        self.progress.emit(min(overall, 99), f"{stage} ({percent}%)")
+
+    def _run_stage(self, cancel_event: threading.Event, stage: str, function, *args):
+        """ runs a stage with timing and progress signals """
+        self._check_cancelled(cancel_event)
+        self.stage_started.emit(stage)
+        t_start = time.perf_counter()
+
+        result = function(cancel_event, *args)
+
+        duration = time.perf_counter() - t_start
+        self.timings[stage] = duration
+        self._report(cancel_event, stage, 1)
+        self.stage_finished.emit(stage, duration)
+        return result
+
+    def _run(self, cancel_event: threading.Event, key: tuple, gps_file_path: str, video_file_path: str) -> None:
+        """ coordinates the stages, runs in its own thread """
+        try:
+            video_future = self._executor.submit(
+                self._run_stage, cancel_event, "video", self._open_video, video_file_path
+            )
+            gps_future = self._executor.submit(
+                self._run_stage, cancel_event, "gps", self._parse_gps, gps_file_path
+            )
+
+            gpsdata, from_cache = gps_future.result()
+            self._run_stage(cancel_event, "clean", self._clean_gps, gpsdata, from_cache)
+            self._run_stage(cancel_event, "gradient", self._derive_gradient, gpsdata, from_cache)
+            video_capture, video_properties = video_future.result()
+
+            self._check_cancelled(cancel_event)
+            self._completed.emit((cancel_event, key, gpsdata, video_capture, video_properties))
+        except ImportCancelled:
+            pass
+        except Exception as exception:
+            if not cancel_event.is_set():
+                self.progress.emit(100, "Failed")
+                self.failed.emit(f"{exception}")
+
+    def _parse_gps(self, cancel_event: threading.Event, gps_file_path: str) -> tuple:
+        """ stage gps, returns parsed data and whether it came from cache
+
+        Data is None if the handler already holds the unchanged file, e.g. restored from a snapshot.
+        A changed file is parsed again, or loaded from the cache by its content.
+        """
+        if self._gpsdata_handler.is_current(gps_file_path):
+            return None, True
+
+        # load into a separate handler, so a cancelled import does not leave partial data
+        gpsdata = GPSDataHandler(self._gpsdata_handler.cache)
+        if gpsdata.load_cached_data(gps_file_path, self._cache_variant()):
+            return gpsdata, True
+
+        gpsdata.parse_csv_data(gps_file_path, lambda fraction: self._report(cancel_event, "gps", fraction))
+        return gpsdata, False
+
+    def _cache_variant(self) -> str:
+        """ cleaned and parsed data of a file are cached separately """
+        return "cleaned" if self.clean_gps else ""
+
+    def _clean_gps(self, cancel_event: threading.Event, gpsdata: GPSDataHandler, from_cache: bool) -> None:
+        """ stage clean, cached data was already cleaned """
+        if from_cache or not self.clean_gps:
+            return
+        self.cleaning_statistics = gpsdata.clean_data()
+        self._check_cancelled(cancel_event)
+        self.cleaned.emit(self.cleaning_statistics)
+
+    def _derive_gradient(self, cancel_event: threading.Event, gpsdata: GPSDataHandler, from_cache: bool) -> None:
+        """ stage gradient, cached data already contains the gradient """
+        if from_cache:
+            return
+        gpsdata.add_gradient()
+        self._check_cancelled(cancel_event)
+        gpsdata.store_cached_data(self._cache_variant())
+
+    def _open_video(self, cancel_event: threading.Event, video_file_path: str) -> tuple:
+        """ stage video, opens the video and reads its properties """
+        # OpenCV is imported here to keep it out of the application startup
+        import cv2
+
+        video_capture = cv2.VideoCapture(video_file_path)
+        if not video_capture.isOpened():
+            raise IOError(f"Video {video_file_path} could not be opened.")
+
+        video_properties = {
+            "fps": video_capture.get(cv2.CAP_PROP_FPS),
+            "width": int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "frame_count": int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        }
+        return video_capture, video_properties
+
+    @Slot(object)
+    def _apply_results(self, results: tuple) -> None:
+        """ applies results in the gui thread """
+        cancel_event, key, gpsdata, video_capture, video_properties = results
+        if cancel_event.is_set():
+            return
+
+        if gpsdata is not None:
+            self._gpsdata_handler.take_data(gpsdata)
+
+        self._imported_key = key
+        self.video_capture = video_capture
+        self.video_properties = video_properties
+
+        self.progress.emit(100, "Done")
+        self.finished.emit()
@@ -1,7 +1,11 @@
 from math import sin, asin, cos, atan2, degrees, sqrt, radians
 
+import numpy as np
+
 from COTdataclasses import KeyFrame, IntrinsicCameraParameters, ExtrinsicCameraParameters
+from tools.profiling import timed
 
+@timed()
 def determine_camera_parameters(keyframe: KeyFrame, width: int) -> (IntrinsicCameraParameters, ExtrinsicCameraParameters):
 
     a, b, c, d = assign_points_to_assumed_order(keyframe.image_point.to_list())
@@ -166,3 +170,46 @@ def distance_between_geo_coordinates(lat_1: float, lon_1: float, lat_2: float, l
     c = 2 * atan2(sqrt(a), sqrt(1-a))
 
     return earth_radius * c
+
+def distances_between_geo_coordinates(lat_1, lon_1, lat_2, lon_2) -> np.ndarray:
+    """ vectorized distance_between_geo_coordinates, arguments are arrays or floats in degrees """
+
+    # earth radius in meter
+    earth_radius = 6371000
+
+    lat_1 = np.radians(lat_1)
+    lat_2 = np.radians(lat_2)
+    d_lat = lat_2 - lat_1
+    d_lon = np.radians(lon_2) - np.radians(lon_1)
+
+    a = np.sin(d_lat/2)**2 + np.sin(d_lon/2)**2 * np.cos(lat_1) * np.cos(lat_2)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+
+    return earth_radius * c
+
+def cumulative_distance(latitudes: np.ndarray, longitudes: np.ndarray,
+                        timestamps: np.ndarray = None, max_speed: float = 70) -> np.ndarray:
+    """ distance in meter along a track from its first coordinate, for every coordinate
+
+    If timestamps are given, steps that imply more than max_speed in m/s are counted as 0,
+    they are caused by outliers of the gps receiver.
+    """
+    steps = distances_between_geo_coordinates(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+    if timestamps is not None:
+        steps[steps > max_speed * np.diff(timestamps)] = 0
+
+    distances = np.empty(len(latitudes))
+    distances[:1] = 0
+    np.cumsum(steps, out=distances[1:])
+    return distances
+
+
+def frame_number_at(fps: float, timestamp):
+    """ frame of a video with fps that is shown at timestamp in seconds, the frame starting closest to it
+
+    timestamp can be an array, an array of frame numbers is returned then. The video player, batch
+    extraction, the tracker and session snapshots all use this, so they agree on the frame of a gps row.
+    """
+    if np.ndim(timestamp) == 0:
+        return round(fps * timestamp)
+    return np.rint(fps * np.asarray(timestamp)).astype(np.int64)
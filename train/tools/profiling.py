@@ -0,0 +1,168 @@
+""" Lightweight instrumentation of hot paths
+
+Profiler
+profiler
+timed
+section
+
+Timings are only taken while the profiler is enabled, otherwise the decorator costs one
+attribute lookup per call and section returns a shared no-op context manager. Besides durations
+the profiler keeps gauges, values like the memory of a pool, with their current value and peak.
+Enable with the environment variable COT_PROFILE=1 or at runtime with profiler.enabled = True.
+
+    @timed()
+    def hot_path(): ...
+
+    with section("VideoCapture.read"):
+        video_capture.read()
+"""
+
+import os
+import json
+import time
+import threading
+from functools import wraps
+from contextlib import nullcontext
+from collections import defaultdict, deque
+
+
+class Profiler:
+    """ collects durations of named sections for rolling averages and a chrome trace, and gauges """
+
+    def __init__(self, enabled: bool = False, window: int = 100, max_events: int = 100000) -> None:
+        self.enabled = enabled
+        # number of durations per name used for rolling averages
+        self.window = window
+        self._durations = defaultdict(lambda: deque(maxlen=self.window))
+        # complete events in chrome trace format, oldest are dropped
+        self._events = deque(maxlen=max_events)
+        # current value and peak of every gauge, and its changes as counter events
+        self._gauges = {}
+        self._counters = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def add(self, name: str, start: float, duration: float) -> None:
+        """ adds a duration in seconds, start as given by time.perf_counter """
+        with self._lock:
+            self._durations[name].append(duration)
+            self._events.append((name, start, duration, threading.get_ident()))
+
+    def averages(self) -> dict:
+        """ rolling average in seconds and number of durations it is based on, per name """
+        with self._lock:
+            return {
+                name: (sum(durations) / len(durations), len(durations))
+                for name, durations in self._durations.items() if len(durations) > 0
+            }
+
+    def gauge(self, name: str, value: float) -> None:
+        """ sets the current value of a gauge, e.g. memory in use, its peak is kept """
+        with self._lock:
+            _, peak = self._gauges.get(name, (value, value))
+            self._gauges[name] = (value, max(peak, value))
+            self._counters.append((name, time.perf_counter(), value))
+
+    def gauges(self) -> dict:
+        """ current value and peak per gauge """
+        with self._lock:
+            return dict(self._gauges)
+
+    def reset(self) -> None:
+        """ discards all collected durations, gauges and events """
+        with self._lock:
+            self._durations.clear()
+            self._events.clear()
+            self._gauges.clear()
+            self._counters.clear()
+
+    def dump_chrome_trace(self, path: str) -> None:
+        """ writes collected events as json, can be opened in chrome://tracing or perfetto """
+        with self._lock:
+            events = list(self._events)
+            counters = list(self._counters)
+
+        process_id = os.getpid()
+        with open(path, "w", encoding="ascii") as file:
+            json.dump({
+                "traceEvents": [
+                    {
+                        "name": name,
+                        "ph": "X",
+                        # microseconds
+                        "ts": (start - self._origin) * 10**6,
+                        "dur": duration * 10**6,
+                        "pid": process_id,
+                        "tid": thread_id
+                    }
+                    for name, start, duration, thread_id in events
+                ] + [
+                    {
+                        "name": name,
+                        "ph": "C",
+                        "ts": (timestamp - self._origin) * 10**6,
+                        "pid": process_id,
+                        "args": {"value": value}
+                    }
+                    for name, timestamp, value in counters
+                ],
+                "displayTimeUnit": "ms"
+            }, file)
+
+    def section(self, name: str):
+        """ context manager timing its body """
+        if not self.enabled:
+            return _NO_SECTION
+        return _Section(self, name)
+
+    def timed(self, name: str = None):
+        """ decorator timing every call, name defaults to the qualified name of the function """
+        def decorator(function):
+            section_name = name if name is not None else function.__qualname__
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.add(section_name, start, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+
+class _Section:
+    """ context manager used by Profiler.section """
+
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler: Profiler, name: str) -> None:
+        self._profiler = profiler
+        self._name = name
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self._profiler.add(self._name, self._start, time.perf_counter() - self._start)
+        return False
+
+
+_NO_SECTION = nullcontext()
+
+# profiler used by the application
+profiler = Profiler(enabled=os.environ.get("COT_PROFILE", "0") not in ("", "0"))
+
+
+def timed(name: str = None):
+    """ decorator timing every call with the application profiler """
+    return profiler.timed(name)
+
+
+def section(name: str):
+    """ context manager timing its body with the application profiler """
+    return profiler.section(name)
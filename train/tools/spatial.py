@@ -0,0 +1,147 @@
+""" Spatial index over gps coordinates
+
+SpatialIndex
+
+Coordinates are projected to meters with a sinusoidal projection around the mean longitude
+and sorted into a uniform grid of square cells. Queries only look at the cells around the sought
+coordinate, distances are calculated with the haversine formula. The projection distorts distances
+by a few percent on tracks spanning several degrees, which is accounted for by distortion.
+"""
+
+from math import ceil
+
+import numpy as np
+
+from tools.math import distances_between_geo_coordinates
+
+# earth radius in meter, same as in tools.math
+EARTH_RADIUS = 6371000
+
+
+class SpatialIndex:
+    """ nearest neighbour and radius queries for coordinates given in decimal degrees """
+
+    # rings of cells searched by nearest, before all coordinates are compared
+    max_rings = 8
+    # projected distances are at least this fraction of the true distances
+    distortion = 0.9
+
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray, cell_size: float = 250) -> None:
+        # edge length of a cell in meters
+        self.cell_size = cell_size
+        self._central_longitude = float(np.mean(longitudes)) if len(longitudes) > 0 else 0
+        self._latitudes = np.asarray(latitudes, dtype=np.float64)
+        self._longitudes = np.asarray(longitudes, dtype=np.float64)
+
+        x, y = self.project(latitudes, longitudes)
+
+        # indices sorted by cell, every cell maps to its slice of the sorted indices
+        cells_x = np.floor(x / cell_size).astype(np.int64)
+        cells_y = np.floor(y / cell_size).astype(np.int64)
+        order = np.lexsort((cells_y, cells_x))
+        self._order = order
+
+        keys = np.column_stack((cells_x[order], cells_y[order]))
+        starts = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        starts = np.concatenate(([0], starts)) if len(order) > 0 else starts
+        ends = np.append(starts[1:], len(order))
+        self._cells = {
+            (int(cell_x), int(cell_y)): (int(start), int(end))
+            for (cell_x, cell_y), start, end in zip(keys[starts].tolist(), starts.tolist(), ends.tolist())
+        }
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def project(self, latitudes, longitudes) -> tuple:
+        """ x and y in meters of coordinates in decimal degrees """
+        latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+        longitudes = np.radians(np.asarray(longitudes, dtype=np.float64) - self._central_longitude)
+        return longitudes * np.cos(latitudes) * EARTH_RADIUS, latitudes * EARTH_RADIUS
+
+    def _distances(self, latitude: float, longitude: float, indices: np.ndarray = None) -> np.ndarray:
+        """ distances in meters from a coordinate to the indexed coordinates """
+        if indices is None:
+            return distances_between_geo_coordinates(latitude, longitude, self._latitudes, self._longitudes)
+        return distances_between_geo_coordinates(latitude, longitude, self._latitudes[indices], self._longitudes[indices])
+
+    def _candidates(self, cell_x: int, cell_y: int, ring: int) -> np.ndarray:
+        """ indices in all cells of the square ring with distance ring around a cell """
+        slices = []
+        for i in range(cell_x - ring, cell_x + ring + 1):
+            # inner cells of a column were visited with the smaller rings
+            step = 1 if abs(i - cell_x) == ring else 2 * ring
+            for j in range(cell_y - ring, cell_y + ring + 1, max(step, 1)):
+                cell = self._cells.get((i, j))
+                if cell is not None:
+                    slices.append(self._order[cell[0]:cell[1]])
+        if len(slices) == 0:
+            return None
+        return np.concatenate(slices)
+
+    def nearest(self, latitude: float, longitude: float) -> tuple:
+        """ index of the closest coordinate and its distance in meters, (None, inf) if empty """
+        x, y = self.project(latitude, longitude)
+        x, y = float(x), float(y)
+        cell_x = int(np.floor(x / self.cell_size))
+        cell_y = int(np.floor(y / self.cell_size))
+
+        # closest coordinate in the first ring containing any
+        for ring in range(self.max_rings + 1):
+            candidates = self._candidates(cell_x, cell_y, ring)
+            if candidates is not None:
+                break
+        else:
+            candidates = None
+
+        if candidates is not None:
+            distances = self._distances(latitude, longitude, candidates)
+
+            # coordinates in further rings can only be closer up to this ring
+            last_ring = min(int(distances.min() / (self.cell_size * self.distortion)) + 1, self.max_rings)
+            further = [self._candidates(cell_x, cell_y, i) for i in range(ring + 1, last_ring + 1)]
+            further = [indices for indices in further if indices is not None]
+            if len(further) > 0:
+                further = np.concatenate(further)
+                candidates = np.concatenate((candidates, further))
+                distances = np.concatenate((distances, self._distances(latitude, longitude, further)))
+
+            closest = int(np.argmin(distances))
+            if distances[closest] <= self.max_rings * self.cell_size * self.distortion:
+                return int(candidates[closest]), float(distances[closest])
+
+        if len(self._order) == 0:
+            return None, float("inf")
+
+        # far from all coordinates, every coordinate is compared
+        distances = self._distances(latitude, longitude)
+        closest = int(np.argmin(distances))
+        return closest, float(distances[closest])
+
+    def within(self, latitude: float, longitude: float, radius: float) -> np.ndarray:
+        """ indices of all coordinates within radius meters, sorted by distance """
+        x, y = self.project(latitude, longitude)
+        x, y = float(x), float(y)
+        cell_x = int(np.floor(x / self.cell_size))
+        cell_y = int(np.floor(y / self.cell_size))
+
+        slices = []
+        rings = ceil(radius / (self.cell_size * self.distortion))
+        if (2 * rings + 1)**2 > len(self._cells):
+            # fewer cells in the grid than in the search square
+            for (i, j), (start, end) in self._cells.items():
+                if abs(i - cell_x) <= rings and abs(j - cell_y) <= rings:
+                    slices.append(self._order[start:end])
+        else:
+            for i in range(cell_x - rings, cell_x + rings + 1):
+                for j in range(cell_y - rings, cell_y + rings + 1):
+                    cell = self._cells.get((i, j))
+                    if cell is not None:
+                        slices.append(self._order[cell[0]:cell[1]])
+        if len(slices) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        candidates = np.concatenate(slices)
+        distances = self._distances(latitude, longitude, candidates)
+        inside = distances <= radius
+        return candidates[inside][np.argsort(distances[inside], kind="stable")]
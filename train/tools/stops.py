@@ -0,0 +1,103 @@
+""" Detection of stops, periods the train stands still, and navigation around them
+
+run_lengths
+StopIndex
+
+A row is stationary if its speed is at most max_speed and its position equals the one of the
+previous row, the receiver repeats its last fix while standing. Runs of stationary rows are found
+by run-length encoding, runs lasting at least min_duration seconds are stops. Playback can skip
+the rows inside of stops and charts can show a timeline with every stop collapsed to a few seconds,
+both only use row indices, so rows keep their index everywhere.
+"""
+
+import numpy as np
+
+
+def run_lengths(values: np.ndarray) -> tuple:
+    """ start index, length and value of every run of equal consecutive values """
+    values = np.asarray(values)
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), values[:0]
+    starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1))
+    lengths = np.diff(np.append(starts, len(values)))
+    return starts, lengths, values[starts]
+
+
+class StopIndex:
+    """ stops of a gps track as [start, end) row ranges, with the rows inside of them skippable """
+
+    def __init__(self, columns: dict, min_duration: float = 30, max_speed: float = 1) -> None:
+        timestamps = columns["timestamp"]
+        self.row_count = len(timestamps)
+        self.min_duration = min_duration
+
+        # the first row counts as standing at its own position
+        same_position = np.ones(self.row_count, dtype=bool)
+        same_position[1:] = (np.diff(columns["latitude"]) == 0) & (np.diff(columns["longitude"]) == 0)
+        stationary = (columns["speed"] <= max_speed) & same_position
+
+        starts, lengths, values = run_lengths(stationary)
+        starts = starts[values]
+        ends = starts + lengths[values]
+        long_enough = timestamps[ends - 1] - timestamps[starts] >= min_duration if len(starts) > 0 \
+            else np.empty(0, dtype=bool)
+        self.starts = starts[long_enough]
+        self.ends = ends[long_enough]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def stop_at(self, index: int) -> int:
+        """ number of the stop containing row index, None if the train is moving """
+        stop = int(np.searchsorted(self.starts, index, side="right")) - 1
+        if stop >= 0 and index < self.ends[stop]:
+            return stop
+        return None
+
+    def is_skipped(self, index: int) -> bool:
+        """ True for rows inside of a stop, its first and last row are kept to show arrival and departure """
+        stop = self.stop_at(index)
+        return stop is not None and self.starts[stop] < index < self.ends[stop] - 1
+
+    def next_index(self, index: int) -> int:
+        """ row after index, rows inside of a stop are skipped """
+        index += 1
+        if self.is_skipped(index):
+            return int(self.ends[self.stop_at(index)]) - 1
+        return index
+
+    def previous_index(self, index: int) -> int:
+        """ row before index, rows inside of a stop are skipped """
+        index -= 1
+        if self.is_skipped(index):
+            return int(self.starts[self.stop_at(index)])
+        return index
+
+    def compressed_time(self, timestamps: np.ndarray, kept: float = 5) -> np.ndarray:
+        """ timestamps with every stop collapsed to kept seconds, still increasing with the row index
+
+        The rows of a stop are spread evenly over its kept seconds.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if len(self.starts) == 0:
+            return timestamps.copy()
+
+        durations = timestamps[self.ends - 1] - timestamps[self.starts]
+        removed = np.maximum(durations - kept, 0)
+
+        # every row is moved back by the time removed from the stops before it
+        shift = np.zeros(len(timestamps) + 1)
+        np.add.at(shift, self.ends, removed)
+        compressed = timestamps - np.cumsum(shift)[:-1]
+
+        # rows inside of a stop are scaled onto its kept seconds
+        lengths = self.ends - self.starts
+        stop_numbers = np.repeat(np.arange(len(self.starts)), lengths)
+        rows = np.arange(lengths.sum()) + np.repeat(self.starts - (np.cumsum(lengths) - lengths), lengths)
+        scale = np.divide(
+            np.minimum(durations, kept), durations, out=np.ones(len(durations)), where=durations > 0
+        )
+        stop_starts = timestamps[self.starts]
+        compressed[rows] = compressed[self.starts][stop_numbers] \
+            + (timestamps[rows] - stop_starts[stop_numbers]) * scale[stop_numbers]
+        return compressed
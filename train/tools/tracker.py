@@ -0,0 +1,302 @@
+""" Propagation of the image points of a keyframe through the following frames
+
+KeyFrameTracker
+track_step
+calibrate_tracked_points
+
+The camera is fixed to the train, so the rails stay close to the same image positions while
+their lateral position, e.g. in curves, changes slowly. The four image points are followed with
+pyramidal Lucas-Kanade through a few frames per second, the ground changes too much between the
+frames of consecutive gps rows. Only motion across the rail a point lies on is kept, motion along
+the rail is ambiguous for Lucas-Kanade and would let the points drift apart. Every step is refined
+against the keyframe, so the errors of the steps do not add up. A point failing the
+forward-backward check keeps its position, tracking stops once a point failed for several frames
+in a row.
+
+Decoding the frames is the expensive part, it runs in a worker pool on chunks of frames.
+Workers only return grayscale crops of the region around the points, tracking itself runs in order
+in a coordinating thread and cancels outstanding chunks when it stops.
+"""
+
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+
+import cv2
+import numpy as np
+from PySide6.QtCore import QObject, Signal, Slot
+
+from COTdataclasses import KeyFrame, ImagePointContainer
+from tools.framesource import available_frame_sources, select_frame_source
+from tools.math import determine_camera_parameters, assign_points_to_assumed_order, frame_number_at
+
+
+# frame sources opened per worker process, keyed by path
+_frame_sources = {}
+
+
+def _read_chunk(video_path: str, frame_numbers: list, roi: tuple) -> list:
+    """ grayscale crops of frames, None for frames that could not be read, runs in a worker process """
+    if video_path not in _frame_sources:
+        _frame_sources[video_path] = available_frame_sources(video_path)
+    sources = _frame_sources[video_path]
+    # frames of a chunk are evenly spaced
+    step = frame_numbers[1] - frame_numbers[0] if len(frame_numbers) > 1 else None
+    frame_source = select_frame_source(sources, step, frame_numbers) or sources[0]
+    x, y, width, height = roi
+
+    crops = []
+    frame = None
+    for frame_number in frame_numbers:
+        frame = frame_source.read(frame_number, frame)
+        if frame is None:
+            crops.append(None)
+            continue
+        crops.append(cv2.cvtColor(frame[y:y + height, x:x + width], cv2.COLOR_BGR2GRAY))
+    return crops
+
+
+def _rail_normals(points: np.ndarray) -> np.ndarray:
+    """ unit normals of the rails of the points in the order of assign_points_to_assumed_order
+
+    A and C lie on one rail, B and D on the other.
+    """
+    normals = np.empty((4, 2))
+    for first, second in ((0, 2), (1, 3)):
+        direction = points[second] - points[first]
+        normal = np.array([-direction[1], direction[0]]) / max(np.hypot(*direction), 1e-9)
+        normals[first] = normal
+        normals[second] = normal
+    return normals
+
+
+def track_step(previous: np.ndarray, current: np.ndarray, points: np.ndarray, reference: tuple = None,
+               window_size: int = 31, levels: int = 4, max_error: float = 1.0) -> tuple:
+    """ points in the current image and the forward-backward error across the rail per point in pixels
+
+    Points are float32 of shape (4, 2) in the order of assign_points_to_assumed_order, points
+    that were not found have an infinite error. reference is an image and its points, the seed
+    of the tracking, the tracked points are refined against it so small errors do not add up.
+    """
+    parameters = {
+        "winSize": (window_size, window_size),
+        "maxLevel": levels,
+        "criteria": (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01)
+    }
+    forward, status, _ = cv2.calcOpticalFlowPyrLK(previous, current, points, None, **parameters)
+    backward, back_status, _ = cv2.calcOpticalFlowPyrLK(current, previous, forward, None, **parameters)
+
+    # only the motion across the rails is kept and checked, sleepers passing along the rail disturb the rest
+    normals = _rail_normals(points.astype(np.float64))
+    across = np.sum((forward - points) * normals, axis=1)
+    errors = np.abs(np.sum((backward - points) * normals, axis=1))
+    errors[(status.ravel() == 0) | (back_status.ravel() == 0)] = np.inf
+
+    tracked = points + (across[:, np.newaxis] * normals).astype(np.float32)
+
+    if reference is not None:
+        # the points stay on the rows of the reference and move along its rail normals
+        reference_image, reference_points = reference
+        refined, refined_status, _ = cv2.calcOpticalFlowPyrLK(
+            reference_image, current, reference_points, tracked.copy(),
+            flags=cv2.OPTFLOW_USE_INITIAL_FLOW, **parameters
+        )
+        reference_normals = _rail_normals(reference_points.astype(np.float64))
+        reference_across = np.sum((refined - reference_points) * reference_normals, axis=1)
+        refined = reference_points + (reference_across[:, np.newaxis] * reference_normals).astype(np.float32)
+        found = refined_status.ravel() == 1
+        tracked[found] = refined[found]
+
+    # a failed point is not moved, its error tells the caller to stop
+    tracked[errors > max_error] = points[errors > max_error]
+    return tracked, errors
+
+
+def calibrate_tracked_points(gpsdata: list, points: list, track_gauge: int = 1435) -> list:
+    """ calibrated keyframes of gps data and their tracked points, degenerate points are left out """
+    keyframes = []
+    for gpsdatum, image_points in zip(gpsdata, points):
+        keyframe = KeyFrame(
+            gpsdatum, None, ImagePointContainer(*np.round(image_points).astype(int).tolist()), None, None
+        )
+        try:
+            keyframe.intrinsics, keyframe.extrinsics = determine_camera_parameters(keyframe, track_gauge)
+        except (ValueError, ZeroDivisionError):
+            continue
+        keyframes.append(keyframe)
+    return keyframes
+
+
+class KeyFrameTracker(QObject):
+    """ tracks the image points of a keyframe and creates calibrated candidate keyframes from them """
+
+    # progress in percent and a message
+    progress = Signal(int, str)
+    # calibrated keyframes without pixmap, emitted once before finished
+    candidates_found = Signal(list)
+    # why tracking stopped
+    finished = Signal(str)
+    failed = Signal(str)
+
+    # frames decoded per job
+    chunk_size = 50
+    # seconds between tracked frames, frames between the gps rows are tracked as well
+    max_frame_gap = 0.2
+    # gps rows between candidate keyframes
+    candidate_interval = 10
+    # maximum forward-backward error in pixels of a tracked point
+    max_error = 1.0
+    # consecutive frames a point may fail before tracking stops
+    max_lost_frames = 5
+    # part of the image size added around the points for the tracked region
+    region_margin = 0.15
+
+    def __init__(self, max_workers: int = None, parent=None) -> None:
+        super().__init__(parent)
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor = None
+        self._cancel_event = threading.Event()
+        self._coordinator: threading.Thread = None
+
+    def is_running(self) -> bool:
+        return self._coordinator is not None and self._coordinator.is_alive()
+
+    def start(self, video_path: str, video_fps: float, image_size: tuple, gpsdata: list,
+              keyframe: KeyFrame, max_rows: int = None) -> None:
+        """ tracks the points of keyframe through the frames of gpsdata, which starts with its gps datum """
+        if self.is_running():
+            return
+        if max_rows is not None:
+            gpsdata = gpsdata[:max_rows]
+
+        points = np.array(assign_points_to_assumed_order(keyframe.image_point.to_list()), dtype=np.float32)
+
+        # tracked frames and the gps row of each, None for frames between the rows
+        frame_numbers = []
+        rows = []
+        for row, gpsdatum in enumerate(gpsdata):
+            frame_number = frame_number_at(video_fps, gpsdatum.timestamp)
+            if len(frame_numbers) > 0:
+                gap = frame_number - frame_numbers[-1]
+                steps = max(int(np.ceil(gap / (video_fps * self.max_frame_gap))), 1)
+                for step in range(1, steps):
+                    frame_numbers.append(frame_numbers[-1] + round(gap * step / steps) - round(gap * (step - 1) / steps))
+                    rows.append(None)
+            frame_numbers.append(frame_number)
+            rows.append(row)
+
+        # region the points can move in, crops of it are tracked
+        image_width, image_height = image_size
+        margin = self.region_margin * np.array([image_width, image_height])
+        left, top = np.maximum(points.min(axis=0) - margin, 0).astype(int)
+        right, bottom = np.minimum(points.max(axis=0) + margin, [image_width, image_height]).astype(int)
+        region = (int(left), int(top), int(right - left), int(bottom - top))
+
+        if self._executor is None:
+            # tracking is started from the gui, forking a process with running Qt threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+        self._cancel_event = threading.Event()
+        self._coordinator = threading.Thread(
+            target=self._run,
+            args=(self._cancel_event, video_path, frame_numbers, rows, list(gpsdata), points, region),
+            name="keyframe-tracker",
+            daemon=True
+        )
+        self._coordinator.start()
+
+    @Slot()
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    def wait(self) -> None:
+        if self._coordinator is not None:
+            self._coordinator.join()
+
+    def shutdown(self) -> None:
+        """ cancels tracking and stops the worker processes """
+        self.cancel()
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _run(self, cancel_event: threading.Event, video_path: str, frame_numbers: list, rows: list,
+             gpsdata: list, points: np.ndarray, region: tuple) -> None:
+        """ coordinates decoding and tracking, runs in its own thread """
+        starts = deque(range(0, len(frame_numbers), self.chunk_size))
+        # chunks are decoded ahead of tracking, but not more than the workers can keep busy
+        lookahead = 2 * (self.max_workers or os.cpu_count() or 1)
+        chunks = deque()
+
+        offset = np.array(region[:2], dtype=np.float32)
+        points = points - offset
+        candidate_rows = []
+        candidate_points = []
+
+        reason = None
+        previous = None
+        reference = None
+        lost_frames = np.zeros(4, dtype=int)
+        index = 0
+        try:
+            while reason is None and (len(chunks) > 0 or len(starts) > 0):
+                while len(starts) > 0 and len(chunks) < lookahead:
+                    start = starts.popleft()
+                    chunks.append(self._executor.submit(
+                        _read_chunk, video_path, frame_numbers[start:start + self.chunk_size], region
+                    ))
+
+                for crop in chunks.popleft().result():
+                    if cancel_event.is_set():
+                        reason = "Cancelled"
+                        break
+                    if crop is None:
+                        reason = f"Frame {frame_numbers[index]} could not be read"
+                        break
+
+                    if previous is not None:
+                        points, errors = track_step(previous, crop, points, reference, max_error=self.max_error)
+                        lost_frames = np.where(errors > self.max_error, lost_frames + 1, 0)
+                        lost = np.flatnonzero(lost_frames > self.max_lost_frames)
+                        # points at the border of the region can not be tracked anymore
+                        outside = np.flatnonzero(np.any((points < 0) | (points >= crop.shape[::-1]), axis=1))
+                        if len(lost) > 0 or len(outside) > 0:
+                            point = "ABCD"[lost[0] if len(lost) > 0 else outside[0]]
+                            reason = f"Point {point} lost at frame {frame_numbers[index]}"
+                            break
+                        row = rows[index]
+                        # candidates only at frames all points were found in
+                        if row is not None and row % self.candidate_interval == 0 and not lost_frames.any():
+                            candidate_rows.append(row)
+                            candidate_points.append(points + offset)
+
+                    else:
+                        reference = (crop, points)
+                    previous = crop
+                    index += 1
+
+                self.progress.emit(
+                    int(100 * index / len(frame_numbers)), f"Tracked {index} of {len(frame_numbers)} frames"
+                )
+        except (CancelledError, RuntimeError) as exception:
+            # executor was shut down
+            reason = f"Tracking stopped: {exception}"
+        except Exception as exception:
+            self.failed.emit(f"{exception}")
+            return
+        finally:
+            for chunk in chunks:
+                chunk.cancel()
+
+        if reason is None:
+            reason = "End of data reached"
+
+        candidates = calibrate_tracked_points([gpsdata[i] for i in candidate_rows], candidate_points)
+        self.progress.emit(100, f"{reason}, {len(candidates)} candidate keyframes")
+        self.candidates_found.emit(candidates)
+        self.finished.emit(reason)
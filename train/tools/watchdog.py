@@ -0,0 +1,122 @@
+""" Detection of stalls of the Qt event loop
+
+StallDetector
+
+A high frequency QTimer on the gui thread acts as heartbeat. A separate thread checks the time
+since the last heartbeat and, if the gui thread is blocked longer than a threshold, captures its
+Python stack to find the slot that was running. Enable in the application with COT_WATCHDOG=1
+or COT_WATCHDOG=<threshold in ms>.
+"""
+
+import sys
+import time
+import threading
+import traceback
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from tools.profiling import profiler
+
+
+class StallDetector(QObject):
+    """ reports stalls of the event loop of the thread it is started in, usually the gui thread """
+
+    # duration in seconds and the slot that was running, emitted in the gui thread after the stall
+    stall_detected = Signal(float, str)
+
+    def __init__(self, threshold: float = 0.2, interval: float = 0.01, parent=None) -> None:
+        super().__init__(parent)
+        # stalls longer than threshold seconds are reported
+        self.threshold = threshold
+        # heartbeat interval in seconds
+        self.interval = interval
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(int(interval * 1000))
+        self._timer.timeout.connect(self._heartbeat)
+
+        self._gui_thread_id: int = None
+        self._last_beat: float = 0
+        self._running = False
+        self._monitor: threading.Thread = None
+
+        # slot captured by the monitor during the current stall, None if there is no stall
+        self._stalled_slot: str = None
+        self._lock = threading.Lock()
+
+        # maximum and rolling latency of the heartbeat against its interval, in seconds
+        self.max_latency = 0
+        self.latency = 0
+
+    def start(self) -> None:
+        """ starts heartbeat and monitor, has to be called from the thread to watch """
+        if self._running:
+            return
+        self._gui_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._running = True
+        self._timer.start()
+        self._monitor = threading.Thread(target=self._monitor_loop, name="stall-detector", daemon=True)
+        self._monitor.start()
+
+    def stop(self) -> None:
+        """ stops heartbeat and monitor """
+        self._running = False
+        self._timer.stop()
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+
+    @Slot()
+    def _heartbeat(self) -> None:
+        now = time.perf_counter()
+        gap = now - self._last_beat
+
+        # latency of the event loop is the delay of the timer beyond its interval
+        latency = max(gap - self.interval, 0)
+        self.latency = 0.9 * self.latency + 0.1 * latency
+        self.max_latency = max(self.max_latency, latency)
+
+        with self._lock:
+            stalled_slot = self._stalled_slot
+            self._stalled_slot = None
+            stall_start = self._last_beat
+            self._last_beat = now
+
+        if stalled_slot is not None:
+            print(f"GUI thread was blocked for {gap * 1000:.0f} ms in {stalled_slot}")
+            if profiler.enabled:
+                profiler.add(f"stall:{stalled_slot}", stall_start, gap)
+            self.stall_detected.emit(gap, stalled_slot)
+
+    def _monitor_loop(self) -> None:
+        """ checks the heartbeat, runs in its own thread """
+        while self._running:
+            time.sleep(self.threshold / 4)
+
+            with self._lock:
+                blocked_for = time.perf_counter() - self._last_beat
+                # capture once per stall
+                if blocked_for < self.threshold or self._stalled_slot is not None:
+                    continue
+
+                frame = sys._current_frames().get(self._gui_thread_id)
+                if frame is None:
+                    continue
+                stack = traceback.extract_stack(frame)
+                self._stalled_slot = self._slot_of(stack)
+
+            print(
+                f"GUI thread blocked for {blocked_for * 1000:.0f} ms in {self._stalled_slot}, stack:\n"
+                + "".join(traceback.format_list(stack))
+            )
+
+    @staticmethod
+    def _slot_of(stack: traceback.StackSummary) -> str:
+        """ name of the function called by the event loop
+
+        Qt is not visible to Python, so the frame after the one that entered the event loop
+        is the slot called by Qt.
+        """
+        entry = stack[1] if len(stack) > 1 else stack[0]
+        return f"{entry.name} ({entry.filename.split('/')[-1]}:{entry.lineno})"